@@ -230,6 +230,7 @@ class BitHistory(object):
     bitHistory = object.__new__(cls)
 
     bitHistory._id = proto.id
+    bitHistory._stats = array.array("f")
 
     for statProto in proto.stats:
       statsLen = len(bitHistory._stats) - 1
@@ -244,6 +245,76 @@ class BitHistory(object):
 
 
 
+class PatternNZHistory(object):
+  """
+  Ring buffer holding the activation patterns of the last iterations,
+  addressed by learning iteration. The pattern of iteration N is kept in slot
+  N % size until the pattern of a later iteration lands in the same slot, so
+  looking up the pattern from n steps ago does not need to scan the history.
+  """
+
+
+  def __init__(self, size):
+    """
+    Parameters:
+    --------------------------------------------------------------------
+    size:       number of iterations to keep
+    """
+    self._iterations = [None] * size
+    self._patterns = [None] * size
+
+
+  def append(self, iteration, patternNZ):
+    """Store the activation pattern of an iteration.
+
+    Parameters:
+    --------------------------------------------------------------------
+    iteration:  the learning iteration number
+    patternNZ:  list of the active indices from the output below
+    """
+    slot = iteration % len(self._iterations)
+    self._iterations[slot] = iteration
+    self._patterns[slot] = patternNZ
+
+
+  def get(self, iteration):
+    """Return the activation pattern stored for an iteration, or None if the
+    history has no pattern for it.
+
+    Parameters:
+    --------------------------------------------------------------------
+    iteration:  the learning iteration number
+    """
+    slot = iteration % len(self._iterations)
+    if self._iterations[slot] != iteration:
+      return None
+    return self._patterns[slot]
+
+
+  def __iter__(self):
+    """Iterate over the (iteration, patternNZ) pairs, oldest first."""
+    entries = [(iteration, pattern) for (iteration, pattern)
+               in itertools.izip(self._iterations, self._patterns)
+               if iteration is not None]
+    entries.sort(key=lambda entry: entry[0])
+    return iter(entries)
+
+
+  def __len__(self):
+    return len(self._iterations) - self._iterations.count(None)
+
+
+  def __eq__(self, other):
+    return (isinstance(other, PatternNZHistory) and
+            len(self._iterations) == len(other._iterations) and
+            list(self) == list(other))
+
+
+  def __ne__(self, other):
+    return not self == other
+
+
+
 class CLAClassifier(object):
   """
   A CLA classifier accepts a binary input from the level below (the
@@ -302,10 +373,10 @@ class CLAClassifier(object):
     # TODO: Do we need the +1?
     maxSteps = max(self.steps) + 1
 
-    # History of the last _maxSteps activation patterns. We need to keep
-    # these so that we can associate the current iteration's classification
-    # with the activationPattern from N steps ago
-    self._patternNZHistory = deque(maxlen=maxSteps)
+    # History of the activation patterns of the last maxSteps iterations. We
+    # need to keep these so that we can associate the current iteration's
+    # classification with the activationPattern from N steps ago
+    self._patternNZHistory = PatternNZHistory(maxSteps)
 
     # These are the bit histories. Each one is a BitHistory instance, stored in
     # this dict, where the key is (bit, nSteps). The 'bit' is the index of the
@@ -380,7 +451,7 @@ class CLAClassifier(object):
       print "  classificationIn:", classification
 
     # Store pattern in our history
-    self._patternNZHistory.append((self._learnIteration, patternNZ))
+    self._patternNZHistory.append(self._learnIteration, patternNZ)
 
     # ------------------------------------------------------------------------
     # Inference:
@@ -404,21 +475,8 @@ class CLAClassifier(object):
       # For each n-step prediction...
       for nSteps in self.steps:
 
-        # Accumulate bucket index votes and actValues into these arrays
-        sumVotes = numpy.zeros(self._maxBucketIdx+1)
-        bitVotes = numpy.zeros(self._maxBucketIdx+1)
-
-        # For each active bit, get the votes
-        for bit in patternNZ:
-          key = (bit, nSteps)
-          history = self._activeBitHistory.get(key, None)
-          if history is None:
-            continue
-
-          bitVotes.fill(0)
-          history.infer(iteration=self._learnIteration, votes=bitVotes)
-
-          sumVotes += bitVotes
+        # Accumulate the votes of each active bit
+        sumVotes = self._sumBitVotes(patternNZ, nSteps)
 
         # Return the votes for each bucket, normalized
         total = sumVotes.sum()
@@ -469,28 +527,14 @@ class CLAClassifier(object):
 
         # Do we have the pattern that should be assigned to this classification
         # in our pattern history? If not, skip it
-        found = False
-        for (iteration, learnPatternNZ) in self._patternNZHistory:
-          if iteration == self._learnIteration - nSteps:
-            found = True;
-            break
-        if not found:
+        learnPatternNZ = self._patternNZHistory.get(
+          self._learnIteration - nSteps)
+        if learnPatternNZ is None:
           continue
 
         # Store classification info for each active bit from the pattern
         # that we got nSteps time steps ago.
-        for bit in learnPatternNZ:
-
-          # Get the history structure for this bit and step #
-          key = (bit, nSteps)
-          history = self._activeBitHistory.get(key, None)
-          if history is None:
-            history = self._activeBitHistory[key] = BitHistory(self,
-                        bitNum=bit, nSteps=nSteps)
-
-          # Store new sample
-          history.store(iteration=self._learnIteration,
-                        bucketIdx=bucketIdx)
+        self._storeBitHistories(learnPatternNZ, nSteps, bucketIdx)
 
     # ------------------------------------------------------------------------
     # Verbose print
@@ -509,6 +553,63 @@ class CLAClassifier(object):
     return retval
 
 
+  def _sumBitVotes(self, patternNZ, nSteps):
+    """
+    Sum the normalized bucket votes of each active bit for one n-step
+    prediction.
+
+    Parameters:
+    --------------------------------------------------------------------
+    patternNZ:  list of the active indices from the output below
+    nSteps:     number of steps of prediction
+
+    retval:     numpy array with the (unnormalized) sum of the votes for each
+                bucketIdx starting from bucketIdx 0
+    """
+    # Accumulate bucket index votes and actValues into these arrays
+    sumVotes = numpy.zeros(self._maxBucketIdx+1)
+    bitVotes = numpy.zeros(self._maxBucketIdx+1)
+
+    # For each active bit, get the votes
+    for bit in patternNZ:
+      key = (bit, nSteps)
+      history = self._activeBitHistory.get(key, None)
+      if history is None:
+        continue
+
+      bitVotes.fill(0)
+      history.infer(iteration=self._learnIteration, votes=bitVotes)
+
+      sumVotes += bitVotes
+
+    return sumVotes
+
+
+  def _storeBitHistories(self, learnPatternNZ, nSteps, bucketIdx):
+    """
+    Store a classification in the histories of each bit of an activation
+    pattern for one n-step prediction.
+
+    Parameters:
+    --------------------------------------------------------------------
+    learnPatternNZ: list of the active indices of the pattern from nSteps ago
+    nSteps:         number of steps of prediction
+    bucketIdx:      the bucket index to store
+    """
+    for bit in learnPatternNZ:
+
+      # Get the history structure for this bit and step #
+      key = (bit, nSteps)
+      history = self._activeBitHistory.get(key, None)
+      if history is None:
+        history = self._activeBitHistory[key] = BitHistory(self,
+                    bitNum=bit, nSteps=nSteps)
+
+      # Store new sample
+      history.store(iteration=self._learnIteration,
+                    bucketIdx=bucketIdx)
+
+
   def __getstate__(self):
     return self.__dict__
 
@@ -539,6 +640,13 @@ class CLAClassifier(object):
     else:
       pass
 
+    # The pattern history used to be a deque of (iteration, patternNZ)
+    if isinstance(self._patternNZHistory, deque):
+      patternNZHistory = PatternNZHistory(max(self.steps) + 1)
+      for (iteration, pattern) in self._patternNZHistory:
+        patternNZHistory.append(iteration, pattern)
+      self._patternNZHistory = patternNZHistory
+
     self._version = CLAClassifier.__VERSION__
 
 
@@ -555,22 +663,15 @@ class CLAClassifier(object):
     classifier._learnIteration = proto.learnIteration
     classifier._recordNumMinusLearnIteration = proto.recordNumMinusLearnIteration
 
-    classifier._patternNZHistory = deque(maxlen=max(classifier.steps) + 1)
+    classifier._patternNZHistory = PatternNZHistory(max(classifier.steps) + 1)
     patternNZHistoryProto = proto.patternNZHistory
     learnIteration = classifier._learnIteration - len(patternNZHistoryProto) + 1
     for i in xrange(len(patternNZHistoryProto)):
-      classifier._patternNZHistory.append((learnIteration, list(patternNZHistoryProto[i])))
+      classifier._patternNZHistory.append(learnIteration,
+                                          list(patternNZHistoryProto[i]))
       learnIteration += 1
 
-    classifier._activeBitHistory = dict()
-    activeBitHistoryProto = proto.activeBitHistory
-    for i in xrange(len(activeBitHistoryProto)):
-      stepBitHistories = activeBitHistoryProto[i]
-      nSteps = stepBitHistories.steps
-      for indexBitHistoryProto in stepBitHistories.bitHistories:
-        bit = indexBitHistoryProto.index
-        bitHistory = BitHistory.read(indexBitHistoryProto.history)
-        classifier._activeBitHistory[(bit, nSteps)] = bitHistory
+    classifier._readBitHistories(proto.activeBitHistory)
 
     classifier._maxBucketIdx = proto.maxBucketIdx
 
@@ -602,6 +703,34 @@ class CLAClassifier(object):
       patternNZHistory.append(learnPatternNZ)
     proto.patternNZHistory = patternNZHistory
 
+    self._writeBitHistories(proto)
+
+    proto.maxBucketIdx = self._maxBucketIdx
+
+    actualValuesProto = proto.init("actualValues", len(self._actualValues))
+    for i in xrange(len(self._actualValues)):
+      if self._actualValues[i] is not None:
+        actualValuesProto[i] = self._actualValues[i]
+      else:
+        actualValuesProto[i] = 0
+
+    proto.version = self._version
+    proto.verbosity = self.verbosity
+
+
+  def _readBitHistories(self, activeBitHistoryProto):
+    self._activeBitHistory = dict()
+    for i in xrange(len(activeBitHistoryProto)):
+      stepBitHistories = activeBitHistoryProto[i]
+      nSteps = stepBitHistories.steps
+      for indexBitHistoryProto in stepBitHistories.bitHistories:
+        bit = indexBitHistoryProto.index
+        bitHistory = BitHistory.read(indexBitHistoryProto.history)
+        bitHistory._classifier = self
+        self._activeBitHistory[(bit, nSteps)] = bitHistory
+
+
+  def _writeBitHistories(self, proto):
     i = 0
     activeBitHistoryProtos = proto.init("activeBitHistory", len(self._activeBitHistory))
     if len(self._activeBitHistory) > 0:
@@ -620,15 +749,3 @@ class CLAClassifier(object):
           stepBitHistory[indexBitHistory].write(bitHistoryProto)
           j += 1
         i += 1
-
-    proto.maxBucketIdx = self._maxBucketIdx
-
-    actualValuesProto = proto.init("actualValues", len(self._actualValues))
-    for i in xrange(len(self._actualValues)):
-      if self._actualValues[i] is not None:
-        actualValuesProto[i] = self._actualValues[i]
-      else:
-        actualValuesProto[i] = 0
-
-    proto.version = self._version
-    proto.verbosity = self.verbosity
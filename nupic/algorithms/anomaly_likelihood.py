@@ -50,6 +50,17 @@ while still_have_data:
   anomalyProbability = anomalyLikelihood.anomalyProbability(
       value, anomalyScore, timestamp)
 
+For long running streams, pass historicWindowSize to keep only the most recent
+records in a fixed size window instead of the whole history:
+
+anomalyLikelihood = AnomalyLikelihood(historicWindowSize=8640)
+
+To score many metrics in one process, MultiStreamAnomalyLikelihood keeps the
+same state for all of them in arrays and scores a batch of streams per call:
+
+engine = MultiStreamAnomalyLikelihood(numStreams)
+likelihoods = engine.update(streamIds, anomalyScores, values)
+
 
 Raw functions
 -------------
@@ -71,7 +82,8 @@ class AnomalyLikelihood(object):
   """
 
 
-  def __init__(self, claLearningPeriod=300, estimationSamples=300):
+  def __init__(self, claLearningPeriod=300, estimationSamples=300,
+               historicWindowSize=None):
     """
     :param claLearningPeriod: the number of iterations required for the CLA to
     learn the basic patterns in the dataset and for the anomaly score to 'settle
@@ -85,9 +97,22 @@ class AnomalyLikelihood(object):
     the Gaussian. It's unlikely you will need to tune this since the Gaussian is
     re-estimated every 100 iterations.
     
+    :param historicWindowSize: (optional) the number of most recent records
+    the distribution is estimated from. By default (None) every record is
+    kept and the Gaussian is re-estimated from the whole history. If set, the
+    records are kept in a fixed size ring buffer and the moving average as well
+    as the mean and variance of the records in the window are updated
+    incrementally, so memory and time per record stay constant. Must be at
+    least estimationSamples.
+    
     Anomaly likelihood scores are reported at a flat 0.5 for claLearningPeriod +
     estimationSamples iterations.
     """
+    if historicWindowSize is not None and historicWindowSize < max(
+        estimationSamples, 1):
+      raise ValueError("historicWindowSize must be at least estimationSamples "
+                       "(%d), got %r" % (estimationSamples, historicWindowSize))
+
     self._iteration = 0
     self._historicalScores = []
     self._distribution = None
@@ -100,15 +125,52 @@ class AnomalyLikelihood(object):
     # relative to the total number of records processed.
     self._reestimationPeriod = 100 
 
+    # State of the bounded mode: averaged anomaly scores and metric values of
+    # the records in the window, indexed by iteration % historicWindowSize,
+    # and the running moments of the records used for the estimate
+    self._historicWindowSize = historicWindowSize
+    if historicWindowSize is not None:
+      self._historicalScores = None
+      self._movingAverage = MovingAverage(windowSize=_AVERAGING_WINDOW)
+      self._averagedScores = numpy.zeros(historicWindowSize)
+      self._metricValues = numpy.zeros(historicWindowSize)
+      self._scoreMoments = _RunningMoments()
+      self._metricMoments = _RunningMoments()
+
 
   def __eq__(self, o):
-    return (isinstance(o, AnomalyLikelihood) and
+    if not (isinstance(o, AnomalyLikelihood) and
             self._iteration == o._iteration and
             self._historicalScores == o._historicalScores and
             self._distribution == o._distribution and
             self._probationaryPeriod == o._probationaryPeriod and
             self._claLearningPeriod == o._claLearningPeriod and
-            self._reestimationPeriod == o._reestimationPeriod)
+            self._reestimationPeriod == o._reestimationPeriod and
+            self._historicWindowSize == o._historicWindowSize):
+      return False
+
+    if self._historicWindowSize is None:
+      return True
+
+    return (self._movingAverage == o._movingAverage and
+            numpy.array_equal(self._averagedScores, o._averagedScores) and
+            ((self._metricValues == o._metricValues) |
+             (numpy.isnan(self._metricValues) &
+              numpy.isnan(o._metricValues))).all() and
+            self._scoreMoments == o._scoreMoments and
+            self._metricMoments == o._metricMoments)
+
+
+  def __ne__(self, o):
+    return not self == o
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+
+    # Instances pickled before the bounded mode existed keep every record
+    if not hasattr(self, "_historicWindowSize"):
+      self._historicWindowSize = None
 
 
   def __str__(self):
@@ -147,6 +209,9 @@ class AnomalyLikelihood(object):
                        default (None) results in using iteration step.
     @return theanomalyLikelihood for this record.
     """
+    if self._historicWindowSize is not None:
+      return self._boundedAnomalyProbability(value, anomalyScore)
+
     if timestamp is None:
       timestamp = self._iteration
       
@@ -177,6 +242,474 @@ class AnomalyLikelihood(object):
     return likelihood
 
 
+  def _boundedAnomalyProbability(self, value, anomalyScore):
+    """
+    anomalyProbability for the bounded mode. Follows the same steps as
+    estimateAnomalyLikelihoods / updateAnomalyLikelihoods, but on the records
+    of the window and with running moments instead of the full history.
+    """
+    windowSize = self._historicWindowSize
+    slot = self._iteration % windowSize
+
+    # The moving average runs over the whole stream, as it does when it is
+    # continued by updateAnomalyLikelihoods
+    averagedScore = self._movingAverage.next(anomalyScore)
+
+    if self._iteration < self._probationaryPeriod:
+      likelihood = 0.5
+    else:
+      if ( (self._distribution is None) or
+           (self._iteration % self._reestimationPeriod == 0) ):
+        self._distribution = self._estimateDistribution()
+
+      # Filter against the likelihood of the previous record
+      likelihoods = [normalProbability(averagedScore, self._distribution)]
+      if self._iteration > 0:
+        previousScore = self._averagedScores[(slot - 1) % windowSize]
+        likelihoods.insert(0, normalProbability(previousScore,
+                                                self._distribution))
+      likelihood = 1.0 - _filterLikelihoods(likelihoods)[-1]
+
+    # Replace the oldest record of the window by this one
+    if self._iteration >= windowSize:
+      self._removeFromEstimate(slot, self._iteration - windowSize)
+
+    self._averagedScores[slot] = averagedScore
+    self._metricValues[slot] = _metricValue(value)
+    if self._iteration >= self._claLearningPeriod:
+      self._scoreMoments.add(self._averagedScores[slot])
+      self._metricMoments.add(self._metricValues[slot])
+
+    self._iteration += 1
+
+    # Recompute the moments from scratch whenever the window wraps around so
+    # that rounding errors of the running sums don't accumulate
+    if self._iteration % windowSize == 0:
+      estimated = slice(max(self._claLearningPeriod - self._iteration +
+                            windowSize, 0), None)
+      self._scoreMoments.reset(self._averagedScores[estimated])
+      self._metricMoments.reset(self._metricValues[estimated])
+
+    return likelihood
+
+
+  def _removeFromEstimate(self, slot, iteration):
+    """
+    Remove the record stored in a slot of the window from the running moments,
+    if it is one the distribution is estimated from.
+    """
+    if iteration >= self._claLearningPeriod:
+      self._scoreMoments.remove(self._averagedScores[slot])
+      self._metricMoments.remove(self._metricValues[slot])
+
+
+  def _estimateDistribution(self):
+    """
+    Estimate the distribution of averaged anomaly scores from the running
+    moments of the window, like estimateAnomalyLikelihoods does from the
+    scores.
+    """
+    if self._scoreMoments.count == 0:
+      return nullDistribution()
+
+    # Flat metric values are reported as not anomalous, see
+    # estimateAnomalyLikelihoods
+    if (self._metricMoments.count > 0 and
+        self._metricMoments.variance() < 1.5e-5):
+      return nullDistribution()
+
+    return _normalDistribution(self._scoreMoments.mean(),
+                               self._scoreMoments.variance())
+
+
+
+# Number of records the anomaly scores are averaged over
+_AVERAGING_WINDOW = 10
+
+
+
+def _metricValue(value):
+  """
+  Return a metric value as a float, or NaN if it is not a number.
+  """
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return numpy.nan
+
+
+
+class _RunningMoments(object):
+  """
+  Mean and variance of a changing set of values, kept as running sums.
+  The sums are taken over the values minus the first value seen, which keeps
+  the variance of large but nearly constant values accurate. NaN values are
+  ignored.
+  """
+
+
+  def __init__(self):
+    self.count = 0
+    self.shift = None
+    self.total = 0.0
+    self.totalSquares = 0.0
+
+
+  def add(self, value):
+    if math.isnan(value):
+      return
+    if self.shift is None:
+      self.shift = value
+    value -= self.shift
+    self.count += 1
+    self.total += value
+    self.totalSquares += value * value
+
+
+  def remove(self, value):
+    if math.isnan(value):
+      return
+    value -= self.shift
+    self.count -= 1
+    self.total -= value
+    self.totalSquares -= value * value
+
+
+  def reset(self, values):
+    """Recompute the sums from a numpy array of values."""
+    values = values[~numpy.isnan(values)]
+    self.count = len(values)
+    self.shift = values[0] if self.count > 0 else None
+    if self.count > 0:
+      values = values - self.shift
+    self.total = float(numpy.sum(values))
+    self.totalSquares = float(numpy.dot(values, values))
+
+
+  def mean(self):
+    return self.shift + self.total / self.count
+
+
+  def variance(self):
+    mean = self.total / self.count
+    return max(self.totalSquares / self.count - mean * mean, 0.0)
+
+
+  def __eq__(self, o):
+    return (isinstance(o, _RunningMoments) and
+            self.count == o.count and
+            self.shift == o.shift and
+            self.total == o.total and
+            self.totalSquares == o.totalSquares)
+
+
+  def __ne__(self, o):
+    return not self == o
+
+
+class MultiStreamAnomalyLikelihood(object):
+  """
+  Computes anomaly likelihoods for many metric streams at once.
+
+  Each stream behaves like an AnomalyLikelihood with a historicWindowSize, but
+  the state of all streams is kept in NumPy arrays with one row per stream, and
+  a batch of anomaly scores for different streams is processed with a few
+  array operations instead of one Python object and call per stream:
+
+  engine = MultiStreamAnomalyLikelihood(numStreams=10000)
+  while still_have_data:
+    # Anomaly scores of the streams that got a record in this tick
+    likelihoods = engine.update(streamIds, anomalyScores, values)
+
+  The windows take 16 bytes per record per stream, e.g. 160 MB for 10k streams
+  with the default window of 1000 records.
+  """
+
+
+  def __init__(self, numStreams, claLearningPeriod=300, estimationSamples=300,
+               historicWindowSize=1000):
+    """
+    :param numStreams: the initial number of streams, see addStreams()
+
+    :param claLearningPeriod: see AnomalyLikelihood
+
+    :param estimationSamples: see AnomalyLikelihood
+
+    :param historicWindowSize: see AnomalyLikelihood. Must be at least
+    estimationSamples.
+    """
+    if historicWindowSize < max(estimationSamples, 1):
+      raise ValueError("historicWindowSize must be at least estimationSamples "
+                       "(%d), got %r" % (estimationSamples, historicWindowSize))
+
+    self._probationaryPeriod = claLearningPeriod + estimationSamples
+    self._claLearningPeriod = claLearningPeriod
+    self._reestimationPeriod = 100
+    self._historicWindowSize = historicWindowSize
+
+    self.numStreams = 0
+
+    # Per stream state, one row per stream
+    self._iterations = numpy.zeros(0, dtype="int64")
+    self._rawScores = numpy.zeros((0, _AVERAGING_WINDOW))
+    self._rawTotals = numpy.zeros(0)
+    self._averagedScores = numpy.zeros((0, historicWindowSize))
+    self._metricValues = numpy.zeros((0, historicWindowSize))
+
+    # Running moments of the averaged scores and metric values the
+    # distributions are estimated from, see _RunningMoments. A NaN shift means
+    # no value was added yet.
+    self._scoreMoments = _RunningMomentsArrays(0)
+    self._metricMoments = _RunningMomentsArrays(0)
+
+    # Estimated distributions. A NaN mean means none was estimated yet.
+    self._distributionMeans = numpy.zeros(0)
+    self._distributionStdevs = numpy.zeros(0)
+
+    self.addStreams(numStreams)
+
+
+  def addStreams(self, count):
+    """
+    Add streams to the engine.
+
+    :param count: number of streams to add
+
+    :returns: numpy array with the ids of the new streams
+    """
+    newIds = numpy.arange(self.numStreams, self.numStreams + count)
+    self.numStreams += count
+
+    def grow(array, fill=0.0):
+      rows = numpy.empty((count,) + array.shape[1:], dtype=array.dtype)
+      rows.fill(fill)
+      return numpy.concatenate((array, rows))
+
+    self._iterations = grow(self._iterations, 0)
+    self._rawScores = grow(self._rawScores)
+    self._rawTotals = grow(self._rawTotals)
+    self._averagedScores = grow(self._averagedScores)
+    self._metricValues = grow(self._metricValues)
+    self._scoreMoments.grow(count)
+    self._metricMoments.grow(count)
+    self._distributionMeans = grow(self._distributionMeans, numpy.nan)
+    self._distributionStdevs = grow(self._distributionStdevs, numpy.nan)
+
+    return newIds
+
+
+  def update(self, streamIds, anomalyScores, values=None):
+    """
+    Compute the probability that the current anomaly scores of some streams
+    represent anomalies, like AnomalyLikelihood.anomalyProbability does for a
+    single stream.
+
+    :param streamIds: ids of the streams, each stream at most once
+    :param anomalyScores: the current anomaly score of each stream
+    :param values: (optional) the current metric value of each stream, used to
+                   detect flat metrics. Non numeric values are ignored.
+
+    :returns: numpy array with the anomaly likelihood of each stream
+    """
+    streams = numpy.asarray(streamIds, dtype="int64")
+    scores = numpy.asarray(anomalyScores, dtype=float)
+    if values is None:
+      metricValues = numpy.empty(len(streams))
+      metricValues.fill(numpy.nan)
+    else:
+      metricValues = numpy.array([_metricValue(value) for value in values])
+
+    if not len(streams) == len(scores) == len(metricValues):
+      raise ValueError("streamIds, anomalyScores and values must have the "
+                       "same length")
+    if len(streams) == 0:
+      return numpy.zeros(0)
+    if streams.min() < 0 or streams.max() >= self.numStreams:
+      raise IndexError("Invalid stream id")
+    if len(numpy.unique(streams)) != len(streams):
+      raise ValueError("Each stream can be updated at most once per batch")
+
+    windowSize = self._historicWindowSize
+    iterations = self._iterations[streams]
+    slots = iterations % windowSize
+
+    # Moving average of the raw anomaly scores
+    averagingSlots = iterations % _AVERAGING_WINDOW
+    full = iterations >= _AVERAGING_WINDOW
+    self._rawTotals[streams[full]] -= self._rawScores[streams[full],
+                                                      averagingSlots[full]]
+    self._rawScores[streams, averagingSlots] = scores
+    self._rawTotals[streams] += scores
+    averagedScores = (self._rawTotals[streams] /
+                      numpy.minimum(iterations + 1, _AVERAGING_WINDOW))
+
+    # Likelihoods of the streams past their probationary period
+    likelihoods = numpy.empty(len(streams))
+    likelihoods.fill(0.5)
+
+    scored = iterations >= self._probationaryPeriod
+    reestimate = scored & (
+      numpy.isnan(self._distributionMeans[streams]) |
+      (iterations % self._reestimationPeriod == 0))
+    if reestimate.any():
+      self._estimateDistributions(streams[reestimate])
+
+    if scored.any():
+      scoredStreams = streams[scored]
+      means = self._distributionMeans[scoredStreams]
+      stdevs = self._distributionStdevs[scoredStreams]
+      current = _normalProbabilities(averagedScores[scored], means, stdevs)
+
+      # Filter against the likelihood of the previous record
+      previousSlots = (slots[scored] - 1) % windowSize
+      previous = _normalProbabilities(
+        self._averagedScores[scoredStreams, previousSlots], means, stdevs)
+      redThreshold = 1.0 - 0.99999
+      yellowThreshold = 1.0 - 0.999
+      keepYellow = ((current <= redThreshold) & (previous <= redThreshold) &
+                    (iterations[scored] > 0))
+      current[keepYellow] = yellowThreshold
+
+      likelihoods[scored] = 1.0 - current
+
+    # Replace the oldest record of each window by the new one
+    evict = iterations - windowSize >= self._claLearningPeriod
+    evictStreams = streams[evict]
+    self._scoreMoments.remove(evictStreams,
+                              self._averagedScores[evictStreams, slots[evict]])
+    self._metricMoments.remove(evictStreams,
+                               self._metricValues[evictStreams, slots[evict]])
+
+    self._averagedScores[streams, slots] = averagedScores
+    self._metricValues[streams, slots] = metricValues
+    estimated = iterations >= self._claLearningPeriod
+    self._scoreMoments.add(streams[estimated], averagedScores[estimated])
+    self._metricMoments.add(streams[estimated], metricValues[estimated])
+
+    iterations += 1
+    self._iterations[streams] = iterations
+
+    # Recompute the moments from scratch whenever a window wraps around so that
+    # rounding errors of the running sums don't accumulate
+    wrapped = iterations % windowSize == 0
+    if wrapped.any():
+      wrappedStreams = streams[wrapped]
+      firstEstimated = numpy.maximum(
+        self._claLearningPeriod - iterations[wrapped] + windowSize, 0)
+      mask = numpy.arange(windowSize) >= firstEstimated[:, numpy.newaxis]
+      self._scoreMoments.reset(wrappedStreams,
+                               self._averagedScores[wrappedStreams], mask)
+      self._metricMoments.reset(wrappedStreams,
+                                self._metricValues[wrappedStreams], mask)
+
+    return likelihoods
+
+
+  def _estimateDistributions(self, streams):
+    """
+    Estimate the distributions of averaged anomaly scores of some streams from
+    their running moments, see AnomalyLikelihood._estimateDistribution.
+    """
+    nullParams = nullDistribution()
+    means = numpy.empty(len(streams))
+    means.fill(nullParams["mean"])
+    stdevs = numpy.empty(len(streams))
+    stdevs.fill(nullParams["stdev"])
+
+    scoreCounts = self._scoreMoments.counts[streams]
+    metricCounts = self._metricMoments.counts[streams]
+    normal = scoreCounts > 0
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+      flat = (metricCounts > 0) & (
+        self._metricMoments.variances(streams) < 1.5e-5)
+      normal &= ~flat
+
+      # Same lower bounds as estimateNormal
+      means[normal] = numpy.maximum(
+        self._scoreMoments.means(streams)[normal], 0.03)
+      stdevs[normal] = numpy.sqrt(numpy.maximum(
+        self._scoreMoments.variances(streams)[normal], 0.0003))
+
+    self._distributionMeans[streams] = means
+    self._distributionStdevs[streams] = stdevs
+
+
+
+class _RunningMomentsArrays(object):
+  """
+  _RunningMoments of many streams, one entry per stream.
+  """
+
+
+  def __init__(self, numStreams):
+    self.counts = numpy.zeros(numStreams, dtype="int64")
+    self.shifts = numpy.empty(numStreams)
+    self.shifts.fill(numpy.nan)
+    self.totals = numpy.zeros(numStreams)
+    self.totalSquares = numpy.zeros(numStreams)
+
+
+  def grow(self, count):
+    """Add count streams without values."""
+    numStreams = len(self.counts)
+    grown = _RunningMomentsArrays(numStreams + count)
+    for name in ("counts", "shifts", "totals", "totalSquares"):
+      getattr(grown, name)[:numStreams] = getattr(self, name)
+    self.__dict__.update(grown.__dict__)
+
+
+  def add(self, streams, values):
+    valid = ~numpy.isnan(values)
+    streams = streams[valid]
+    values = values[valid]
+
+    unset = numpy.isnan(self.shifts[streams])
+    self.shifts[streams[unset]] = values[unset]
+    values = values - self.shifts[streams]
+    self.counts[streams] += 1
+    self.totals[streams] += values
+    self.totalSquares[streams] += values * values
+
+
+  def remove(self, streams, values):
+    valid = ~numpy.isnan(values)
+    streams = streams[valid]
+    values = values[valid] - self.shifts[streams]
+    self.counts[streams] -= 1
+    self.totals[streams] -= values
+    self.totalSquares[streams] -= values * values
+
+
+  def reset(self, streams, values, mask):
+    """
+    Recompute the sums of some streams from the values in their rows of a 2D
+    array where mask is set.
+    """
+    mask = mask & ~numpy.isnan(values)
+    counts = mask.sum(axis=1)
+    shifts = numpy.empty(len(streams))
+    shifts.fill(numpy.nan)
+    nonEmpty = counts > 0
+    shifts[nonEmpty] = values[nonEmpty, mask[nonEmpty].argmax(axis=1)]
+
+    shifted = numpy.where(mask, values - shifts[:, numpy.newaxis], 0.0)
+    self.counts[streams] = counts
+    self.shifts[streams] = shifts
+    self.totals[streams] = shifted.sum(axis=1)
+    self.totalSquares[streams] = (shifted * shifted).sum(axis=1)
+
+
+  def means(self, streams):
+    return self.shifts[streams] + self.totals[streams] / self.counts[streams]
+
+
+  def variances(self, streams):
+    means = self.totals[streams] / self.counts[streams]
+    return numpy.maximum(
+      self.totalSquares[streams] / self.counts[streams] - means * means, 0.0)
+
+
+
 #
 # USAGE FOR LOW-LEVEL FUNCTIONS
 # -----------------------------
@@ -530,10 +1063,20 @@ def estimateNormal(sampleData, performLowerBoundCheck=True):  # pylint: disable=
   :returns: A dict containing the parameters of a normal distribution based on
       the ``sampleData``.
   """
+  return _normalDistribution(numpy.mean(sampleData), numpy.var(sampleData),
+                             performLowerBoundCheck)
+
+
+
+def _normalDistribution(mean, variance, performLowerBoundCheck=True):
+  """
+  :returns: A dict containing the parameters of a normal distribution with the
+      given ``mean`` and ``variance``, see ``estimateNormal``.
+  """
   params = {
       "name": "normal",
-      "mean": numpy.mean(sampleData),
-      "variance": numpy.var(sampleData),
+      "mean": mean,
+      "variance": variance,
   }
 
   if performLowerBoundCheck:
@@ -593,7 +1136,24 @@ def normalProbability(x, distributionParams):
   if xs > 70:
     return 0.0
   else:
-    return Q[xs]
+    return Q[int(xs)]
+
+
+
+def _normalProbabilities(x, means, stdevs):
+  """
+  Vectorized normalProbability: the probability of getting samples > x for
+  arrays of samples and the means and standard deviations of their normal
+  distributions.
+  """
+  # Distribution is symmetrical around mean
+  below = x < means
+  xp = numpy.where(below, 2 * means - x, x)
+
+  # Round half away from zero like round(), and look up 0.0 above the table
+  xs = numpy.floor(10 * (xp - means) / stdevs + 0.5)
+  probabilities = _Q_OR_ZERO[numpy.minimum(xs, len(Q)).astype("int64")]
+  return numpy.where(below, 1.0 - probabilities, probabilities)
 
 
 
@@ -695,3 +1255,6 @@ Q[67] = 0.000000000010644
 Q[68] = 0.000000000005340
 Q[69] = 0.000000000002653
 Q[70] = 0.000000000001305
+
+# Q with a trailing 0.0 for values beyond the table
+_Q_OR_ZERO = numpy.append(Q, 0.0)
@@ -0,0 +1,229 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""CLA classifier that keeps its bit histories in dense per-step arrays."""
+
+import numpy
+
+from nupic.algorithms.CLAClassifier import (CLAClassifier,
+                                            DUTY_CYCLE_UPDATE_INTERVAL)
+
+
+
+class DenseCLAClassifier(CLAClassifier):
+  """
+  CLA classifier with the same behavior as `CLAClassifier`, but instead of one
+  `BitHistory` object per (bit, nSteps) it keeps, for each nSteps, a single
+  float32 array of bucket duty cycles (bits x buckets) plus the iteration of
+  the last total update of each bit. Both grow on demand.
+
+  Inference for a step is then a gather of the rows of the active bits, and
+  learning a scatter update into the same rows, instead of a Python loop over
+  the active bits. The duty cycles are updated with the same float64 formulas
+  and float32 storage as `BitHistory`, so the predictions match those of
+  `CLAClassifier`, and the classifier is serialized into the same proto.
+  """
+
+
+  def __init__(self, steps=(1,), alpha=0.001, actValueAlpha=0.3, verbosity=0):
+    super(DenseCLAClassifier, self).__init__(steps=steps,
+                                             alpha=alpha,
+                                             actValueAlpha=actValueAlpha,
+                                             verbosity=verbosity)
+
+    # The duty cycles are kept in the arrays below instead
+    del self._activeBitHistory
+
+    # Bucket duty cycles for each nSteps. Each one is a float32 array where
+    # row N holds the duty cycles of bit N, and column M those of bucket M.
+    self._dutyCycles = dict()
+
+    # Iteration of the last total update of each bit, for each nSteps. NaN
+    # means the bit has no history yet.
+    self._lastTotalUpdates = dict()
+
+
+  def _sumBitVotes(self, patternNZ, nSteps):
+    numBuckets = self._maxBucketIdx + 1
+    sumVotes = numpy.zeros(numBuckets)
+
+    dutyCycles = self._dutyCycles.get(nSteps)
+    if dutyCycles is None:
+      return sumVotes
+
+    # Only bits that have a history vote
+    bits = numpy.asarray(patternNZ, dtype="int64")
+    bits = bits[bits < dutyCycles.shape[0]]
+    bits = bits[~numpy.isnan(self._lastTotalUpdates[nSteps][bits])]
+
+    numStored = min(numBuckets, dutyCycles.shape[1])
+    votes = numpy.zeros((bits.size, numBuckets))
+    votes[:, :numStored] = dutyCycles[bits, :numStored]
+
+    # Normalize the votes from each bit
+    totals = votes.sum(axis=1)
+    voted = totals > 0
+    votes[voted] /= totals[voted, numpy.newaxis]
+
+    sumVotes += votes.sum(axis=0)
+    return sumVotes
+
+
+  def _storeBitHistories(self, learnPatternNZ, nSteps, bucketIdx):
+    bits = numpy.asarray(learnPatternNZ, dtype="int64")
+    if bits.size == 0:
+      return
+
+    self._growDutyCycles(nSteps, bits.max() + 1, bucketIdx + 1)
+
+    # A bit that occurs more than once in the pattern is stored once per
+    # occurrence, like the BitHistory path does
+    while bits.size > 0:
+      uniqueBits, firstIndices = numpy.unique(bits, return_index=True)
+      self._storeRows(nSteps, uniqueBits, bucketIdx)
+      bits = numpy.delete(bits, firstIndices)
+
+
+  def _storeRows(self, nSteps, bits, bucketIdx):
+    """
+    Store a new sample for a bucket in the histories of distinct bits. Mirrors
+    `BitHistory.store`.
+
+    Parameters:
+    --------------------------------------------------------------------
+    nSteps:     number of steps of prediction
+    bits:       numpy array of distinct bit indices
+    bucketIdx:  the bucket index to store
+    """
+    dutyCycles = self._dutyCycles[nSteps]
+    lastTotalUpdates = self._lastTotalUpdates[nSteps]
+    iteration = self._learnIteration
+
+    # If lastTotalUpdate has not been set, set it to the current iteration.
+    lastTotalUpdate = lastTotalUpdates[bits]
+    lastTotalUpdate[numpy.isnan(lastTotalUpdate)] = iteration
+    lastTotalUpdates[bits] = lastTotalUpdate
+
+    denom = (1.0 - self.alpha) ** (iteration - lastTotalUpdate)
+    dc = dutyCycles[bits, bucketIdx].astype(numpy.float64)
+    with numpy.errstate(divide="ignore"):
+      dcNew = dc + (self.alpha / denom)
+
+    # Rescale the bits whose duty cycles would get too large
+    rescale = (denom == 0) | (dcNew > DUTY_CYCLE_UPDATE_INTERVAL)
+    if rescale.any():
+      rescaled = bits[rescale]
+      dutyCycles[rescaled] = (dutyCycles[rescaled].astype(numpy.float64) *
+                              denom[rescale, numpy.newaxis])
+      lastTotalUpdates[rescaled] = iteration
+      dcNew[rescale] = (dutyCycles[rescaled, bucketIdx].astype(numpy.float64) +
+                        self.alpha)
+
+    dutyCycles[bits, bucketIdx] = dcNew
+
+
+  def _growDutyCycles(self, nSteps, numBits, numBuckets):
+    """
+    Makes sure the arrays for nSteps can hold at least numBits bits and
+    numBuckets buckets, doubling their size when they can't.
+
+    Parameters:
+    --------------------------------------------------------------------
+    nSteps:     number of steps of prediction
+    numBits:    required number of bits
+    numBuckets: required number of buckets
+    """
+    dutyCycles = self._dutyCycles.get(nSteps)
+    if dutyCycles is None:
+      dutyCycles = numpy.zeros((0, 0), dtype=numpy.float32)
+      lastTotalUpdates = numpy.zeros(0)
+    else:
+      lastTotalUpdates = self._lastTotalUpdates[nSteps]
+
+    (oldBits, oldBuckets) = dutyCycles.shape
+    if numBits <= oldBits and numBuckets <= oldBuckets:
+      return
+
+    newBits = max(numBits, 2 * oldBits) if numBits > oldBits else oldBits
+    newBuckets = (max(numBuckets, 2 * oldBuckets) if numBuckets > oldBuckets
+                  else oldBuckets)
+
+    grown = numpy.zeros((newBits, newBuckets), dtype=numpy.float32)
+    grown[:oldBits, :oldBuckets] = dutyCycles
+    self._dutyCycles[nSteps] = grown
+
+    grownLastTotalUpdates = numpy.empty(newBits)
+    grownLastTotalUpdates.fill(numpy.nan)
+    grownLastTotalUpdates[:oldBits] = lastTotalUpdates
+    self._lastTotalUpdates[nSteps] = grownLastTotalUpdates
+
+
+  def _readBitHistories(self, activeBitHistoryProto):
+    self._dutyCycles = dict()
+    self._lastTotalUpdates = dict()
+
+    for i in xrange(len(activeBitHistoryProto)):
+      stepBitHistories = activeBitHistoryProto[i]
+      nSteps = stepBitHistories.steps
+      for indexBitHistoryProto in stepBitHistories.bitHistories:
+        bit = indexBitHistoryProto.index
+        historyProto = indexBitHistoryProto.history
+        stats = [(statProto.index, statProto.dutyCycle)
+                 for statProto in historyProto.stats]
+        numBuckets = max([index for (index, _) in stats] + [0]) + 1
+
+        self._growDutyCycles(nSteps, bit + 1, numBuckets)
+        for (index, dutyCycle) in stats:
+          self._dutyCycles[nSteps][bit, index] = dutyCycle
+        self._lastTotalUpdates[nSteps][bit] = historyProto.lastTotalUpdate
+
+
+  def _writeBitHistories(self, proto):
+    stepsWithHistory = [nSteps for nSteps in self.steps
+                        if nSteps in self._dutyCycles]
+    activeBitHistoryProtos = proto.init("activeBitHistory",
+                                        len(stepsWithHistory))
+
+    for (i, nSteps) in enumerate(stepsWithHistory):
+      dutyCycles = self._dutyCycles[nSteps]
+      lastTotalUpdates = self._lastTotalUpdates[nSteps]
+      bits = numpy.flatnonzero(~numpy.isnan(lastTotalUpdates))
+
+      stepBitHistoryProto = activeBitHistoryProtos[i]
+      stepBitHistoryProto.steps = nSteps
+      indexBitHistoryListProto = stepBitHistoryProto.init("bitHistories",
+                                                          len(bits))
+      for (j, bit) in enumerate(bits):
+        indexBitHistoryProto = indexBitHistoryListProto[j]
+        indexBitHistoryProto.index = int(bit)
+
+        # Write the duty cycles up to the last bucket stored for this bit
+        stats = dutyCycles[bit]
+        numStats = numpy.flatnonzero(stats)[-1] + 1 if stats.any() else 0
+
+        bitHistoryProto = indexBitHistoryProto.history
+        bitHistoryProto.id = "%d[%d]" % (bit, nSteps)
+        statsProto = bitHistoryProto.init("stats", numStats)
+        for bucketIdx in xrange(numStats):
+          statsProto[bucketIdx].index = bucketIdx
+          statsProto[bucketIdx].dutyCycle = float(stats[bucketIdx])
+        bitHistoryProto.lastTotalUpdate = int(lastTotalUpdates[bit])
+        bitHistoryProto.learnIteration = 0
@@ -22,6 +22,7 @@
 """Module providing a factory for instantiating a CLA classifier."""
 
 from nupic.algorithms.CLAClassifier import CLAClassifier
+from nupic.algorithms.cla_classifier_dense import DenseCLAClassifier
 from nupic.algorithms.cla_classifier_diff import CLAClassifierDiff
 from nupic.bindings.algorithms import FastCLAClassifier
 from nupic.support.configuration import Configuration
@@ -41,8 +42,10 @@ class CLAClassifierFactory(object):
       return CLAClassifier(*args, **kwargs)
     elif impl == 'cpp':
       return FastCLAClassifier(*args, **kwargs)
+    elif impl == 'dense':
+      return DenseCLAClassifier(*args, **kwargs)
     elif impl == 'diff':
       return CLAClassifierDiff(*args, **kwargs)
     else:
       raise ValueError('Invalid classifier implementation (%r). Value must be '
-                       '"py" or "cpp".' % impl)
+                       '"py", "cpp" or "dense".' % impl)
@@ -25,10 +25,12 @@ import time
 import datetime
 from collections import defaultdict
 
+import numpy
 from pkg_resources import resource_filename
 
 from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.record_stream import valuesToColumn
 
 
 """The aggregator aggregates PF datasets
@@ -49,6 +51,11 @@ slices to a temp storage or use incremental aggregation techniques.
 
 
 
+# Number of input records generateDataset() aggregates at once
+_BLOCK_SIZE = 10000
+
+
+
 def initFilter(input, filterInfo = None):
   """ Initializes internal filter variables for further processing.
   Returns a tuple (function to call,parameters for the filter call)
@@ -232,6 +239,329 @@ def _aggr_weighted_mean(inList, params):
 
 
 
+# ----------------------------------------------------------------------------
+# Aggregation of consecutive groups of values (the slices of a block of
+#  records) with NumPy. Each _aggr_groups_* function returns the same values as
+#  the matching _aggr_* function applied to each group, or None if it can't
+#  handle the values, which are then aggregated one group at a time.
+
+def _concatenate(arrays):
+  """ Concatenate arrays of the values of a field into a new array. Arrays of
+  different types are concatenated as object arrays, so that the values keep
+  their own type.
+  """
+  if len(set(array.dtype for array in arrays)) > 1:
+    arrays = [array.astype(object) for array in arrays]
+  return numpy.concatenate(arrays)
+
+
+
+def _groupLengths(values, starts):
+  """ Returns the lengths of the groups of values starting at starts """
+  return numpy.diff(numpy.append(starts, len(values)))
+
+
+
+def _missingMask(values):
+  """ Returns a bool array, True for the values that are missing """
+  if values.dtype != object:
+    return numpy.zeros(len(values), dtype=bool)
+  return numpy.asarray(values == SENTINEL_VALUE_FOR_MISSING_DATA, dtype=bool)
+
+
+
+def _withMissing(values, defined):
+  """ Returns the values as a list, with None where defined is False """
+  return [value if isDefined else None
+          for (value, isDefined) in zip(values.tolist(), defined.tolist())]
+
+
+
+def _numericValues(values):
+  """ Returns (numbers, missing): the values as an int or float array, with 0
+  in place of the missing values, and the mask of missing values.
+
+  Returns (None, None) if the values are not all numbers of the same type, or
+  if their sums could overflow 64 bit integers, where Python uses longs.
+  """
+  missing = _missingMask(values)
+  if values.dtype == object:
+    present = values[~missing].tolist()
+    if len(set(map(type, present))) > 1:
+      return (None, None)
+    presentNumbers = numpy.array(present)
+    if presentNumbers.ndim != 1:
+      return (None, None)
+    numbers = numpy.zeros(len(values), dtype=presentNumbers.dtype)
+    numbers[~missing] = presentNumbers
+  else:
+    numbers = values
+
+  if numbers.dtype.kind == 'b':
+    numbers = numbers.astype(numpy.int64)
+  elif numbers.dtype.kind in 'iu':
+    if (len(numbers) and
+        numpy.abs(numbers.astype(float)).max() * len(numbers) >= 2.0 ** 62):
+      return (None, None)
+    numbers = numbers.astype(numpy.int64)
+  elif numbers.dtype.kind != 'f':
+    return (None, None)
+
+  return (numbers, missing)
+
+
+
+def _groupSums(numbers, starts):
+  """ Returns the sum of each group of numbers. Floats are added in order, for
+  the same rounding as when adding them one at a time in Python.
+  """
+  if numbers.dtype.kind != 'f':
+    return numpy.add.reduceat(numbers, starts)
+
+  lengths = _groupLengths(numbers, starts)
+  sums = numpy.zeros(len(starts))
+  if len(starts) <= lengths.max():
+    # Few long groups: add the numbers of each group at once. Adding 0.0 to
+    #  the sums turns -0.0 into 0.0, as Python's sum starting at 0 does
+    for (i, (start, length)) in enumerate(zip(starts.tolist(),
+                                              lengths.tolist())):
+      sums[i] = numpy.add.accumulate(numbers[start:start + length])[-1]
+    return sums + 0.0
+
+  # Many short groups: add the k-th number of all the groups at once, with the
+  #  longest groups first
+  order = numpy.argsort(-lengths, kind='mergesort')
+  sortedStarts = starts[order]
+  numLonger = numpy.searchsorted(-lengths[order], -numpy.arange(lengths.max()))
+  sortedSums = numpy.zeros(len(starts))
+  for (k, count) in enumerate(numLonger.tolist()):
+    sortedSums[:count] += numbers[sortedStarts[:count] + k]
+  sums[order] = sortedSums
+  return sums
+
+
+
+def _groupMeans(numbers, missing, starts):
+  """ Returns (means, defined): the mean of the non-missing numbers of each
+  group, and whether the group had any. Means of ints are floored, as Python 2
+  int division does.
+  """
+  counts = numpy.add.reduceat((~missing).astype(numpy.int64), starts)
+  sums = _groupSums(numpy.where(missing, 0, numbers), starts)
+  divisors = numpy.maximum(counts, 1)
+  if numbers.dtype.kind == 'f':
+    means = sums / divisors
+  else:
+    means = sums // divisors
+  return (means, counts > 0)
+
+
+
+def _aggr_groups_first(values, starts, params):
+  missing = _missingMask(values)
+  indices = numpy.where(missing, len(values), numpy.arange(len(values)))
+  firsts = numpy.minimum.reduceat(indices, starts)
+  defined = firsts < len(values)
+  return _withMissing(values[numpy.where(defined, firsts, 0)], defined)
+
+
+
+def _aggr_groups_last(values, starts, params):
+  missing = _missingMask(values)
+  indices = numpy.where(missing, -1, numpy.arange(len(values)))
+  lasts = numpy.maximum.reduceat(indices, starts)
+  defined = lasts >= 0
+  return _withMissing(values[numpy.where(defined, lasts, 0)], defined)
+
+
+
+def _aggr_groups_sum(values, starts, params):
+  (numbers, missing) = _numericValues(values)
+  if numbers is None:
+    return None
+
+  # Missing numbers count as the mean of their group
+  (means, defined) = _groupMeans(numbers, missing, starts)
+  filled = numpy.where(missing,
+                       numpy.repeat(means, _groupLengths(values, starts)),
+                       numbers)
+  return _withMissing(_groupSums(filled, starts), defined)
+
+
+
+def _aggr_groups_mean(values, starts, params):
+  (numbers, missing) = _numericValues(values)
+  if numbers is None:
+    return None
+
+  return _withMissing(*_groupMeans(numbers, missing, starts))
+
+
+
+def _groupExtremes(values, starts, ufunc):
+  """ Returns the maximum or minimum (depending on ufunc) of each group """
+  if values.dtype.kind not in 'iufbM':
+    return None
+  if values.dtype.kind == 'f' and numpy.isnan(values).any():
+    return None
+
+  # Python's max() and min() return the first of equal values (e.g. of 0.0
+  #  and -0.0)
+  extremes = ufunc.reduceat(values, starts)
+  isExtreme = values == numpy.repeat(extremes, _groupLengths(values, starts))
+  firsts = numpy.minimum.reduceat(
+    numpy.where(isExtreme, numpy.arange(len(values)), len(values)), starts)
+  return values[firsts].tolist()
+
+
+
+def _aggr_groups_max(values, starts, params):
+  return _groupExtremes(values, starts, numpy.maximum)
+
+
+
+def _aggr_groups_min(values, starts, params):
+  return _groupExtremes(values, starts, numpy.minimum)
+
+
+
+def _aggr_groups_mode(values, starts, params):
+  missing = _missingMask(values)
+  present = numpy.flatnonzero(~missing)
+  numGroups = len(starts)
+  if not len(present):
+    return [None] * numGroups
+
+  # Number the distinct values. Values of object arrays are told apart by a
+  #  dict, as in _aggr_mode()
+  if values.dtype == object:
+    valueCodes = dict()
+    try:
+      codes = numpy.array([valueCodes.setdefault(value, len(valueCodes))
+                           for value in values[present].tolist()],
+                          dtype=numpy.int64)
+    except TypeError:
+      return None
+    numCodes = len(valueCodes)
+  elif values.dtype.kind not in 'iufbM':
+    return None
+  elif values.dtype.kind == 'f' and numpy.isnan(values).any():
+    return None
+  else:
+    (uniques, codes) = numpy.unique(values[present], return_inverse=True)
+    numCodes = len(uniques)
+
+  # Count the occurrences of each value in each group. The sort is stable, so
+  #  each run of equal (group, value) keys starts with the first occurrence
+  groupIds = numpy.repeat(numpy.arange(numGroups),
+                          _groupLengths(values, starts))[present]
+  keys = groupIds * numCodes + codes
+  order = numpy.argsort(keys, kind='mergesort')
+  sortedKeys = keys[order]
+  runStarts = numpy.flatnonzero(
+    numpy.append(True, sortedKeys[1:] != sortedKeys[:-1]))
+  runCounts = _groupLengths(sortedKeys, runStarts)
+  runGroups = sortedKeys[runStarts] // numCodes
+  runFirsts = present[order[runStarts]]
+
+  maxCounts = numpy.zeros(numGroups, dtype=numpy.int64)
+  numpy.maximum.at(maxCounts, runGroups, runCounts)
+  isMode = runCounts == maxCounts[runGroups]
+  numModes = numpy.bincount(runGroups[isMode], minlength=numGroups)
+  modes = numpy.zeros(numGroups, dtype=numpy.int64)
+  modes[runGroups[isMode]] = runFirsts[isMode]
+  result = _withMissing(values[modes], numModes > 0)
+
+  # Ties are broken by the order of the values in a dict, as _aggr_mode() does
+  ends = numpy.append(starts[1:], len(values))
+  for group in numpy.flatnonzero(numModes > 1).tolist():
+    result[group] = _aggr_mode(values[starts[group]:ends[group]].tolist())
+  return result
+
+
+
+def _aggr_groups_weighted_mean(values, starts, params):
+  (numbers, missing) = _numericValues(values)
+  (weights, weightsMissing) = _numericValues(params)
+  if numbers is None or weights is None:
+    return None
+  if missing.any() or weightsMissing.any():
+    return None
+  if (numbers.dtype.kind == weights.dtype.kind == 'i' and len(numbers) and
+      (numpy.abs(numbers.astype(float)).max() *
+       numpy.abs(weights.astype(float)).max() * len(numbers) >= 2.0 ** 62)):
+    return None
+
+  # If all weights are 0, then the value is not defined
+  weightsSums = _groupSums(weights, starts)
+  weightedSums = _groupSums(numbers * weights, starts)
+  defined = weightsSums != 0
+  divisors = numpy.where(defined, weightsSums, 1)
+  if weightedSums.dtype.kind == 'f':
+    means = weightedSums / divisors
+  else:
+    means = weightedSums // divisors
+  return _withMissing(means, defined)
+
+
+
+_GROUP_AGGREGATORS = {_aggr_first: _aggr_groups_first,
+                      _aggr_last: _aggr_groups_last,
+                      _aggr_sum: _aggr_groups_sum,
+                      _aggr_mean: _aggr_groups_mean,
+                      max: _aggr_groups_max,
+                      min: _aggr_groups_min,
+                      _aggr_mode: _aggr_groups_mode,
+                      _aggr_weighted_mean: _aggr_groups_weighted_mean}
+
+
+
+def _aggregateGroups(funcPtr, values, starts, params=None):
+  """ Apply an aggregation function to consecutive groups of values
+
+  Parameters:
+  ------------------------------------------------------------------------
+  funcPtr:  the aggregation function, as returned by
+            Aggregator._getFuncPtrAndParams()
+  values:   array of values of a field
+  starts:   int array of the index of the first value of each group
+  params:   array of the values of the function's param field (the weights of
+            wmean), or None
+  retval:   list of the aggregated value of each group
+  """
+  groupFunc = _GROUP_AGGREGATORS.get(funcPtr)
+  if groupFunc is not None:
+    result = groupFunc(values, starts, params)
+    if result is not None:
+      return result
+
+  # Aggregate one group at a time
+  bounds = zip(starts.tolist(), starts[1:].tolist() + [len(values)])
+  valueList = values.tolist()
+  if params is None:
+    return [funcPtr(valueList[start:end]) for (start, end) in bounds]
+  paramList = params.tolist()
+  return [funcPtr(valueList[start:end], paramList[start:end])
+          for (start, end) in bounds]
+
+
+
+def _toMicroseconds(delta):
+  """ Returns the number of microseconds of a timedelta """
+  return (delta.days * 24 * 60 * 60 + delta.seconds) * 1000000 + \
+         delta.microseconds
+
+
+
+def _splitMonths(times):
+  """ Returns (months, offsets): the index of the month of each datetime64
+  time, and the time elapsed since the start of that month.
+  """
+  months = times.astype('datetime64[M]')
+  return (months.astype(numpy.int64), times - months.astype(times.dtype))
+
+
+
 class Aggregator(object):
   """
   This class provides context and methods for aggregating records. The caller
@@ -348,6 +678,11 @@ class Aggregator(object):
     self._inIdx = -1
     self._slice = defaultdict(list)
 
+    # The records of the slice in progress that nextBlock() keeps, as a list
+    #  of blocks, each a list of arrays with the values of each field. Only
+    #  one of self._slice and self._blockSlice holds records at any time.
+    self._blockSlice = []
+
     
     # ========================================================================
     # Get aggregation params
@@ -558,6 +893,9 @@ class Aggregator(object):
   
     """
     
+    # Pick up the slice in progress if nextBlock() was called before
+    self._blockSliceToLists()
+
     # This will hold the aggregated record we return
     outRecord = None
     
@@ -718,6 +1056,304 @@ class Aggregator(object):
     return (outRecord, retInputBookmark)
 
 
+  def nextBlock(self, batch):
+    """ Aggregate a block of input records at once. This returns the same
+    aggregated records as calling next() with each input record, but assigns
+    the records to their aggregation periods and aggregates the values of each
+    period with NumPy operations over the whole block. Calls to next() and
+    nextBlock() can be mixed; nextBlock() does not track bookmarks.
+
+    Parameters:
+    ------------------------------------------------------------------------
+    batch:    the input records as a RecordsBatch (see
+              RecordStreamIface.getNextRecordsBatch()), or None if the input
+              has reached EOF (this will force completion of and return any
+              partially aggregated time period)
+    retval:   list of the aggregated records completed by this block
+
+    The caller should generally do a loop like this:
+      while True:
+        inBatch = reader.getNextRecordsBatch(numRecords)
+        for aggRecord in aggregator.nextBlock(inBatch):
+          processRecord(aggRecord)
+
+        # reached EOF?
+        if inBatch is None:
+          break
+
+    Records that next() handles in ways that can't be computed in bulk, like
+    out of order records, are passed to next() one at a time.
+    """
+
+    # ---------------------------------------------------------------------
+    # Input reached EOF
+    # Aggregate one last time in the end if necessary
+    if batch is None:
+      self._sliceToBlock()
+      if not self._blockSlice:
+        return []
+
+      columns = [_concatenate([block[j] for block in self._blockSlice])
+                 for j in xrange(len(self._fields))]
+      self._blockSlice = []
+      self._aggrInputBookmark = None
+      return self._createAggregateRecords(
+        columns, numpy.zeros(1, dtype=numpy.int64),
+        numpy.array([self._startTime], dtype='datetime64[us]'))
+
+    columns = [batch[name] for (name, _, _) in self._inputFields]
+    numRecords = len(batch)
+    firstInIdx = self._inIdx
+
+    # Apply the filter, ignore the records with any unacceptable field
+    positions = numpy.arange(numRecords)
+    if self._filter != None:
+      accepted = self._getAcceptedRecords(columns)
+      columns = [column[accepted] for column in columns]
+      positions = positions[accepted]
+
+    # If no aggregation info just return as-is
+    if self._nullAggregation:
+      self._inIdx = firstInIdx + numRecords
+      return [list(record)
+              for record in zip(*[column.tolist() for column in columns])]
+
+    self._sliceToBlock()
+    newSequences = self._getNewSequences(columns)
+
+    outRecords = []
+    pos = 0
+    while pos < len(positions):
+      if self._canAggregateRun(columns):
+        pos = self._aggregateRun(columns, newSequences, pos, outRecords)
+        if pos == len(positions):
+          break
+
+      # Let next() handle this record
+      self._inIdx = firstInIdx + int(positions[pos])
+      (outRecord, _) = self.next([column.item(pos) for column in columns],
+                                 None)
+      self._sliceToBlock()
+      if outRecord is not None:
+        outRecords.append(outRecord)
+      pos += 1
+
+    self._inIdx = firstInIdx + numRecords
+    return outRecords
+
+
+  def _getAcceptedRecords(self, columns):
+    """ Returns a bool array, True for the records of a block that pass the
+    filter
+    """
+    accepted = numpy.ones(len(columns[0]), dtype=bool)
+    for (fieldIdx, fp, params) in self._filter[1]:
+      x = dict(params)
+      for (i, value) in enumerate(columns[fieldIdx].tolist()):
+        x['value'] = value
+        if not fp(x):
+          accepted[i] = False
+    return accepted
+
+
+  def _getNewSequences(self, columns):
+    """ Returns a bool array, True for the records of a block that start a new
+    sequence (see next()). The first record of the input is not included.
+    """
+    newSequences = numpy.zeros(len(columns[0]), dtype=bool)
+
+    if self._resetFieldIdx is not None:
+      resets = columns[self._resetFieldIdx]
+      if resets.dtype.kind in 'iufb':
+        newSequences |= resets == 1
+      else:
+        newSequences |= numpy.array([reset == 1 for reset in resets.tolist()],
+                                    dtype=bool)
+
+    if self._sequenceIdFieldIdx is not None:
+      sequenceIds = columns[self._sequenceIdFieldIdx].tolist()
+      previous = [self._sequenceId] + sequenceIds[:-1]
+      newSequences |= numpy.array([sequenceId != prev for (sequenceId, prev)
+                                   in zip(sequenceIds, previous)], dtype=bool)
+
+    return newSequences
+
+
+  def _canAggregateRun(self, columns):
+    """ Returns True if the periods of the next records can be computed in
+    bulk from the current period: the timestamps are datetime64 values, and
+    the current period is regular (months periods must start on a day that
+    exists in every month).
+    """
+    if columns[self._timeFieldIdx].dtype != numpy.dtype('datetime64[us]'):
+      return False
+    if self._startTime is None:
+      return False
+    if not self._aggTimeDelta and self._startTime.day > 28:
+      return False
+    return self._endTime == self._getEndTime(self._startTime)
+
+
+  def _aggregateRun(self, columns, newSequences, pos, outRecords):
+    """ Aggregate the records of a block from pos on, up to the first record
+    that must be handled by next(): one earlier than the period in progress, or
+    starting a sequence in months periods on a day that doesn't exist in every
+    month.
+
+    Parameters:
+    ------------------------------------------------------------------------
+    columns:      arrays of the values of each field of the block's records
+    newSequences: bool array, True for the records that start a new sequence
+    pos:          index of the first record to aggregate
+    outRecords:   list the completed aggregated records are appended to
+    retval:       index of the first record that was not aggregated
+    """
+    times = columns[self._timeFieldIdx][pos:]
+    newSequences = newSequences[pos:]
+    indices = numpy.arange(len(times))
+
+    # The periods of each record are counted from the start of the period in
+    #  progress, or from the first record of its sequence
+    sequenceStarts = numpy.maximum.accumulate(
+      numpy.where(newSequences, indices, -1))
+    anchors = numpy.where(sequenceStarts >= 0, times[sequenceStarts],
+                          numpy.datetime64(self._startTime, 'us'))
+    periods = self._getPeriods(times, anchors)
+    previous = numpy.append(0, periods[:-1])
+
+    irregular = ~newSequences & (periods < previous)
+    if not self._aggTimeDelta:
+      days = times.astype('datetime64[D]') - times.astype('datetime64[M]')
+      irregular |= newSequences & (days.astype(numpy.int64) >= 28)
+    irregularIndices = numpy.flatnonzero(irregular)
+    stop = irregularIndices[0] if len(irregularIndices) else len(times)
+    if stop == 0:
+      return pos
+
+    # Each new sequence or period starts a new slice
+    breaks = numpy.flatnonzero(newSequences[:stop] |
+                               (periods[:stop] != previous[:stop]))
+    runColumns = [column[pos:pos + stop] for column in columns]
+    if not len(breaks):
+      self._blockSlice.append(runColumns)
+      return pos + stop
+
+    # The slice in progress ends at the first break, and the slice started by
+    #  each break at the next one
+    sliceStartTimes = self._getPeriodStarts(anchors[breaks], periods[breaks])
+    numPending = sum(len(block[0]) for block in self._blockSlice)
+    starts = numpy.append(0, numPending + breaks[:-1])
+    startTimes = numpy.append(numpy.datetime64(self._startTime, 'us'),
+                              sliceStartTimes[:-1])
+    if numPending == 0 and breaks[0] == 0:
+      starts = starts[1:]
+      startTimes = startTimes[1:]
+
+    if len(starts):
+      sliceColumns = [
+        _concatenate([block[j] for block in self._blockSlice] +
+                     [runColumns[j][:breaks[-1]]])
+        for j in xrange(len(self._fields))]
+      outRecords.extend(self._createAggregateRecords(sliceColumns, starts,
+                                                     startTimes))
+
+    self._blockSlice = [[column[breaks[-1]:] for column in runColumns]]
+    self._aggrInputBookmark = None
+    self._startTime = sliceStartTimes[-1].item()
+    self._endTime = self._getEndTime(self._startTime)
+
+    lastSequenceStart = sequenceStarts[stop - 1]
+    if lastSequenceStart >= 0 and self._sequenceIdFieldIdx is not None:
+      self._sequenceId = columns[self._sequenceIdFieldIdx].item(
+        pos + lastSequenceStart)
+
+    return pos + stop
+
+
+  def _getPeriods(self, times, anchors):
+    """ Returns the index of the aggregation period of each datetime64 time,
+    counting from the period that starts at the matching anchor time (see
+    _getEndTime())
+    """
+    if self._aggTimeDelta:
+      return ((times - anchors).astype(numpy.int64) //
+              _toMicroseconds(self._aggTimeDelta))
+
+    # Months periods: the months elapsed since the anchor, minus one if the
+    #  time is earlier in its month than the anchor in its own
+    (timeMonths, timeOffsets) = _splitMonths(times)
+    (anchorMonths, anchorOffsets) = _splitMonths(anchors)
+    elapsed = (timeMonths - anchorMonths -
+               (timeOffsets < anchorOffsets).astype(numpy.int64))
+    return elapsed // (self._aggYears * 12 + self._aggMonths)
+
+
+  def _getPeriodStarts(self, anchors, periods):
+    """ Returns the datetime64 start times of the aggregation periods with the
+    given indices, counting from the matching anchor times
+    """
+    if self._aggTimeDelta:
+      return anchors + periods * numpy.timedelta64(
+        _toMicroseconds(self._aggTimeDelta), 'us')
+
+    (anchorMonths, anchorOffsets) = _splitMonths(anchors)
+    months = anchorMonths + periods * (self._aggYears * 12 + self._aggMonths)
+    return months.astype('datetime64[M]').astype(anchors.dtype) + anchorOffsets
+
+
+  def _createAggregateRecords(self, columns, starts, startTimes):
+    """ Generate the aggregated output records of consecutive slices
+
+    Parameters:
+    ------------------------------------------------------------------------
+    columns:    arrays of the values of each field of the slices' records.
+                The time field array is modified.
+    starts:     int array of the index of the first record of each slice
+    startTimes: datetime64 array of the start time of each slice's period
+    retval:     list of output records
+    """
+
+    # Make first record timestamp as the beginning of the time period, in case
+    #  the first record wasn't falling on the beginning of the period
+    timeColumn = columns[self._timeFieldIdx]
+    timeColumn[starts] = startTimes.astype(timeColumn.dtype)
+
+    fieldValues = []
+    for (fieldIdx, aggFP, paramIdx) in self._fields:
+      if aggFP is None: # this field is not supposed to be aggregated.
+        continue
+
+      params = columns[paramIdx] if paramIdx is not None else None
+      fieldValues.append(_aggregateGroups(aggFP, columns[fieldIdx], starts,
+                                          params))
+
+    if not fieldValues:
+      return [[] for _ in xrange(len(starts))]
+    return [list(record) for record in zip(*fieldValues)]
+
+
+  def _sliceToBlock(self):
+    """ Move the records of the slice in progress from self._slice, where
+    next() keeps them, to self._blockSlice
+    """
+    if self._slice:
+      self._blockSlice = [[valuesToColumn(self._inputFields[j][1],
+                                          self._slice[j])
+                           for j in xrange(len(self._fields))]]
+      self._slice = defaultdict(list)
+
+
+  def _blockSliceToLists(self):
+    """ Move the records of the slice in progress from self._blockSlice, where
+    nextBlock() keeps them, to self._slice
+    """
+    if self._blockSlice:
+      for j in xrange(len(self._fields)):
+        self._slice[j] = _concatenate(
+          [block[j] for block in self._blockSlice]).tolist()
+      self._blockSlice = []
+
+
 
 def generateDataset(aggregationInfo, inputFilename, outputFilename=None):
   """Generate a dataset of aggregated values
@@ -821,17 +1457,15 @@ def generateDataset(aggregationInfo, inputFilename, outputFilename=None):
 
 
   # -------------------------------------------------------------------------
-  # Write all aggregated records to the output
+  # Write all aggregated records to the output, aggregating blocks of input
+  #  records at once
   while True:
-    inRecord = inputObj.getNextRecord()
-    
-    (aggRecord, aggBookmark) = aggregator.next(inRecord, None)
-    
-    if aggRecord is None and inRecord is None:
+    inBatch = inputObj.getNextRecordsBatch(_BLOCK_SIZE)
+
+    outputObj.appendRecords(aggregator.nextBlock(inBatch))
+
+    if inBatch is None:
       break
-    
-    if aggRecord is not None:
-      outputObj.appendRecord(aggRecord)
 
   return outputFilename
 
@@ -0,0 +1,738 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Columnar binary file based implementation of a record stream
+
+BinaryRecordStream reads and writes the same records as FileRecordStream, but
+stores them in a binary file with one typed array per field instead of CSV
+text, so reading doesn't parse and convert every field of every record.
+
+The file layout is:
+
+  magic (8 bytes)
+  header length (unsigned 64 bit little endian integer)
+  header (JSON)
+  column arrays, each aligned to 64 bytes
+
+The header holds the field descriptors, the number of records, the min and max
+stats of the fields, and the location of the arrays of every column:
+
+  int:        int64 values
+  float:      float64 values
+  bool:       bool values
+  datetime:   int64 microseconds since 1970-01-01
+  string:     the bytes of all the values, and an int64 array of the N+1
+              offsets of the values in the bytes
+  sdr, list:  like string, holding the CSV text of the values
+
+Columns with missing values (None) also have a bool array flagging them.
+
+The arrays are memory-mapped when reading and converted to Python values a
+block of records at a time. getStats() returns the stats saved in the header,
+so it doesn't read the file.
+
+Use convertCsvToBinary() to convert a FileRecordStream CSV file. StreamReader
+opens files with the BINARY_FILE_EXTENSION extension as binary record streams.
+
+Like FileRecordStream, BinaryRecordStream supports the context manager and the
+iteration protocols. The records appended to a stream opened for writing are
+spooled to temporary files, one per array, and the binary file is written when
+the stream is closed.
+"""
+
+import copy
+import json
+import os
+import struct
+import tempfile
+
+import numpy
+
+from nupic.data.fieldmeta import FieldMetaInfo
+from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.record_stream import RecordStreamIface, valuesToColumn
+from nupic.data.utils import parseSdr, parseStringList, serializeSdr, stripList
+
+
+
+# File name extension of binary record files
+BINARY_FILE_EXTENSION = '.nbin'
+
+_MAGIC = 'NUPICREC'
+
+_VERSION = 1
+
+_HEADER_LENGTH_FORMAT = '<Q'
+
+_ALIGNMENT = 64
+
+# Number of records converted to and from arrays at a time
+_BLOCK_SIZE = 4096
+
+_DTYPES = {
+  'int': '<i8',
+  'float': '<f8',
+  'bool': '|b1',
+  'datetime': '<i8',
+}
+
+# Types stored as the bytes of their CSV text, and their text adapters
+_TEXT_ENCODERS = {'string': str, 'sdr': serializeSdr, 'list': stripList}
+_TEXT_DECODERS = {'sdr': parseSdr, 'list': parseStringList}
+
+
+
+def _toNumpyDatetimes(values):
+  """ Convert datetimes to int64 microseconds since 1970-01-01. """
+  return numpy.array(values, dtype='datetime64[us]').astype('<i8')
+
+
+
+def _fromNumpyDatetimes(values):
+  """ Convert an array of int64 microseconds since 1970-01-01 to a list of
+  datetimes.
+  """
+  return values.astype('datetime64[us]').astype(object).tolist()
+
+
+
+class _ColumnWriter(object):
+  """ Spools the values of one field to temporary files, a block at a time,
+  and collects the min and max of numeric fields.
+  """
+
+  def __init__(self, fieldType):
+    self._fieldType = fieldType
+    self._values = []
+    self.numMissing = 0
+    self.min = None
+    self.max = None
+
+    self._arrays = {'values': tempfile.TemporaryFile(),
+                    'missing': tempfile.TemporaryFile()}
+    if fieldType in _TEXT_ENCODERS:
+      self._arrays['offsets'] = tempfile.TemporaryFile()
+      self._textLength = 0
+      self._writeArray('offsets', numpy.zeros(1, dtype='<i8'))
+
+
+  def append(self, value):
+    self._values.append(value)
+    if len(self._values) >= _BLOCK_SIZE:
+      self.flush()
+
+
+  def flush(self):
+    values = self._values
+    if not values:
+      return
+    self._values = []
+
+    missing = numpy.array([value is None for value in values], dtype='|b1')
+    self.numMissing += int(missing.sum())
+    self._writeArray('missing', missing)
+
+    fieldType = self._fieldType
+    if fieldType in _TEXT_ENCODERS:
+      encode = _TEXT_ENCODERS[fieldType]
+      texts = ['' if value is None else encode(value) for value in values]
+      texts = [text.encode('utf-8') if isinstance(text, unicode) else text
+               for text in texts]
+      offsets = numpy.cumsum([len(text) for text in texts], dtype='<i8')
+      self._writeArray('offsets', offsets + self._textLength)
+      self._textLength += int(offsets[-1])
+      self._arrays['values'].write(''.join(texts))
+      return
+
+    present = [value for value in values if value is not None]
+    if fieldType in ('int', 'float') and present:
+      (low, high) = (min(present), max(present))
+      if self.min is None or low < self.min:
+        self.min = low
+      if self.max is None or high > self.max:
+        self.max = high
+
+    if fieldType == 'datetime':
+      array = _toNumpyDatetimes(values)
+    else:
+      array = numpy.array([0 if value is None else value for value in values],
+                          dtype=_DTYPES[fieldType])
+    self._writeArray('values', array)
+
+
+  def _writeArray(self, name, array):
+    self._arrays[name].write(array.tostring())
+
+
+  def getArrays(self):
+    """ Returns: a list of (name, dtype, spool file) of the arrays to save """
+    if self._fieldType in _TEXT_ENCODERS:
+      arrays = [('offsets', '<i8'), ('values', '|u1')]
+    else:
+      arrays = [('values', _DTYPES[self._fieldType])]
+    if self.numMissing:
+      arrays.append(('missing', '|b1'))
+    return [(name, dtype, self._arrays[name]) for (name, dtype) in arrays]
+
+
+  def close(self):
+    for spool in self._arrays.itervalues():
+      spool.close()
+    self._arrays = {}
+
+
+
+class BinaryRecordStream(RecordStreamIface):
+  """ Columnar binary file based RecordStream implementation
+  """
+
+
+  def __init__(self, streamID, write=False, fields=None, bookmark=None,
+               firstRecord=None):
+    """ Constructor
+
+    streamID:
+        binary record file name, input or output
+    write:
+        True or False, open for writing if True
+    fields:
+        a list of nupic.data.fieldmeta.FieldMetaInfo field descriptors, only
+        applicable when write==True
+    bookmark:
+        a bookmark returned by getBookmark(); reading starts at the record it
+        refers to. Either bookmark or firstRecord can be specified, not both.
+    firstRecord:
+        0-based index of the first record to start reading from. Either
+        bookmark or firstRecord can be specified, not both.
+
+    The fields are described like those of FileRecordStream.
+    """
+
+    # Call superclass constructor
+    super(BinaryRecordStream, self).__init__()
+
+    # Only bookmark or firstRow can be specified, not both
+    if bookmark is not None and firstRecord is not None:
+      raise RuntimeError("Only bookmark or firstRecord can be specified, "
+                         "not both")
+
+    self._filename = streamID
+    self._write = write
+    self._file = None
+    self._columns = None
+    self.rewindAtEOF = False
+    self._block = []
+    self._blockPos = 0
+
+    if write:
+      assert fields is not None
+      assert isinstance(fields, (tuple, list))
+      # Verify all fields are 3-tuple
+      assert all(isinstance(f, (tuple, FieldMetaInfo)) and len(f) == 3
+                 for f in fields)
+      self._fields = [FieldMetaInfo(*f) for f in fields]
+      self._file = open(self._filename, 'wb')
+      self._columnWriters = [_ColumnWriter(f.type) for f in self._fields]
+      self._numRecords = 0
+      self._recordCount = 0
+      return
+
+    self._openForRead()
+
+    if bookmark is not None:
+      self._recordCount = self._getStartRow(bookmark)
+    elif firstRecord is not None:
+      self._recordCount = firstRecord
+
+
+  def _openForRead(self):
+    """ Read the header and memory-map the column arrays """
+    with open(self._filename, 'rb') as inFile:
+      magic = inFile.read(len(_MAGIC))
+      if magic != _MAGIC:
+        raise Exception('%s is not a binary record file' % self._filename)
+      (headerLength,) = struct.unpack(
+        _HEADER_LENGTH_FORMAT,
+        inFile.read(struct.calcsize(_HEADER_LENGTH_FORMAT)))
+      header = json.loads(inFile.read(headerLength))
+      dataStart = inFile.tell() + (-inFile.tell() % _ALIGNMENT)
+
+    if header['version'] != _VERSION:
+      raise Exception('Binary record file %s has version %r, expected %r' % (
+        self._filename, header['version'], _VERSION))
+
+    self._fields = [FieldMetaInfo(*[str(item) for item in field])
+                    for field in header['fields']]
+    self._numRecords = header['numRecords']
+    self._stats = header['stats']
+
+    self._columns = []
+    for column in header['columns']:
+      arrays = dict()
+      for (name, array) in column.iteritems():
+        if array['length'] == 0:
+          arrays[name] = numpy.zeros(0, dtype=array['dtype'])
+        else:
+          arrays[name] = numpy.memmap(self._filename, dtype=array['dtype'],
+                                      mode='r',
+                                      offset=dataStart + array['offset'],
+                                      shape=(array['length'],))
+      self._columns.append(arrays)
+
+    self._recordCount = 0
+
+
+  def __getstate__(self):
+    d = dict()
+    d.update(self.__dict__)
+    del d['_columns']
+    del d['_block']
+    return d
+
+
+  def __setstate__(self, state):
+    self.__dict__ = state
+    self._openForRead()
+    self.rewind()
+
+
+  def close(self):
+    if self._file is not None:
+      try:
+        self._writeFile()
+      finally:
+        for columnWriter in self._columnWriters:
+          columnWriter.close()
+        self._file.close()
+        self._file = None
+
+    self._columns = None
+    self._block = []
+
+
+  def _writeFile(self):
+    for columnWriter in self._columnWriters:
+      columnWriter.flush()
+
+    # Lay out the arrays after the header, each aligned
+    columns = []
+    spools = []
+    offset = 0
+    for columnWriter in self._columnWriters:
+      column = dict()
+      for (name, dtype, spool) in columnWriter.getArrays():
+        offset += -offset % _ALIGNMENT
+        numBytes = spool.tell()
+        column[name] = {'offset': offset,
+                        'dtype': dtype,
+                        'length': numBytes // numpy.dtype(dtype).itemsize}
+        spools.append((offset, spool, numBytes))
+        offset += numBytes
+      columns.append(column)
+
+    header = json.dumps({
+      'version': _VERSION,
+      'fields': [list(f) for f in self._fields],
+      'numRecords': self._numRecords,
+      'stats': {'min': [w.min for w in self._columnWriters],
+                'max': [w.max for w in self._columnWriters]},
+      'columns': columns,
+    })
+
+    outFile = self._file
+    outFile.write(_MAGIC)
+    outFile.write(struct.pack(_HEADER_LENGTH_FORMAT, len(header)))
+    outFile.write(header)
+    dataStart = outFile.tell() + (-outFile.tell() % _ALIGNMENT)
+
+    for (offset, spool, numBytes) in spools:
+      outFile.write('\0' * (dataStart + offset - outFile.tell()))
+      spool.seek(0)
+      _copyFile(spool, outFile, numBytes)
+
+
+  def rewind(self):
+    """Put us back at the beginning of the file again)
+    """
+
+    # Superclass rewind
+    super(BinaryRecordStream, self).rewind()
+
+    self._recordCount = 0
+    self._block = []
+    self._blockPos = 0
+
+
+  def getNextRecord(self, useCache=True):
+    """ Returns next available data record from the file.
+
+    retval: a data row (a list) if available; None, if no more records in the
+             table (End of Stream - EOS)
+    """
+    assert self._columns is not None
+
+    if self._blockPos >= len(self._block):
+      if self._recordCount >= self._numRecords:
+        if not self.rewindAtEOF:
+          return None
+        if self._numRecords == 0:
+          raise Exception("The source configured to reset at EOF but "
+                          "'%s' appears to be empty" % self._filename)
+        self.rewind()
+
+      self._block = self._readBlock(self._recordCount,
+                                    self._recordCount + _BLOCK_SIZE)
+      self._blockPos = 0
+
+    record = self._block[self._blockPos]
+    self._blockPos += 1
+    self._recordCount += 1
+    return record
+
+
+  def _readBlock(self, start, end):
+    """ Convert records start to end of the arrays to a list of records. """
+    columns = [self._readValues(field, arrays, start, end)
+               for (field, arrays) in zip(self._fields, self._columns)]
+    return [list(values) for values in zip(*columns)]
+
+
+  def _readValues(self, field, arrays, start, end):
+    """ Convert records start to end of the arrays of a field to a list of
+    values. """
+    if field.type in _TEXT_ENCODERS:
+      offsets = arrays['offsets'][start:min(end, self._numRecords) + 1]
+      text = arrays['values'][offsets[0]:offsets[-1]].tostring()
+      offsets = (offsets - offsets[0]).tolist()
+      values = [text[offsets[i]:offsets[i + 1]]
+                for i in xrange(len(offsets) - 1)]
+      decode = _TEXT_DECODERS.get(field.type)
+      if decode is not None:
+        values = [decode(value) for value in values]
+    elif field.type == 'datetime':
+      values = _fromNumpyDatetimes(arrays['values'][start:end])
+    else:
+      values = arrays['values'][start:end].tolist()
+
+    missing = arrays.get('missing')
+    if missing is not None:
+      values = [None if isMissing else value
+                for (value, isMissing) in zip(values,
+                                              missing[start:end].tolist())]
+    return values
+
+
+  def _getNextColumns(self, numRecords):
+    """ Slices the arrays of the fields for getNextRecordsBatch(), without
+    converting the values of numeric and datetime fields to Python objects.
+    The batch ends at the end of the file, even when auto-rewinding.
+    """
+    assert self._columns is not None
+
+    if self._recordCount >= self._numRecords:
+      if not self.rewindAtEOF:
+        return None
+      if self._numRecords == 0:
+        raise Exception("The source configured to reset at EOF but "
+                        "'%s' appears to be empty" % self._filename)
+      self.rewind()
+
+    start = self._recordCount
+    end = min(start + numRecords, self._numRecords)
+    self._recordCount = end
+    self._block = []
+    self._blockPos = 0
+
+    columns = []
+    for (field, arrays) in zip(self._fields, self._columns):
+      missing = arrays.get('missing')
+      if (field.type in _TEXT_ENCODERS or
+          (missing is not None and missing[start:end].any())):
+        columns.append(valuesToColumn(
+          field.type, self._readValues(field, arrays, start, end)))
+      elif field.type == 'datetime':
+        columns.append(arrays['values'][start:end].astype('datetime64[us]'))
+      else:
+        columns.append(numpy.array(arrays['values'][start:end]))
+    return columns
+
+
+  def getRecordsRange(self, bookmark=None, range=None):
+    """ Returns a range of records, starting from the bookmark. If 'bookmark'
+    is None, then records read from the first available. If 'range' is
+    None, all available records will be returned (caution: this could be
+    a lot of records and require a lot of memory).
+    """
+    raise Exception('getRecordsRange() is not supported for the file storage')
+
+
+  def getLastRecords(self, numRecords):
+    """ Returns a tuple (successCode, recordsArray), where
+        successCode - if the stream had enough records to return, True/False
+        recordsArray - an array of last numRecords records available when
+                       the call was made. Records appended while in the
+                       getLastRecords will be not returned until the next
+                       call to either getNextRecord() or getLastRecords()
+    """
+    raise Exception('getLastRecords() is not supported for the file storage')
+
+
+  def removeOldData(self):
+    raise Exception('removeOldData is not supported in this class.')
+
+
+  def appendRecord(self, record, inputBookmark=None):
+    """ Saves the record in the underlying file.
+
+        record: a list of Python objects, one per field
+
+        Returns: nothing
+    """
+    assert self._file is not None
+    assert self._write
+    assert isinstance(record, (list, tuple)), \
+      "unexpected record type: " + repr(type(record))
+
+    assert len(record) == len(self._fields), \
+      "len(record): %s, fieldCount: %s" % (len(record), len(self._fields))
+
+    for (columnWriter, value) in zip(self._columnWriters, record):
+      columnWriter.append(value)
+    self._numRecords += 1
+    self._recordCount += 1
+
+
+  def appendRecords(self, records, inputRef=None, progressCB=None):
+    """ Saves multiple records in the underlying storage.
+
+        Params: records - array of records as in 'appendRecord'
+                inputRef - reference to the corresponding input (not applicable
+                  in case of a file storage)
+                progressCB - callback to report progress
+
+        Returns: nothing
+    """
+    for record in records:
+      self.appendRecord(record, None)
+      if progressCB is not None:
+        progressCB()
+
+
+  def getBookmark(self):
+    """ Returns an anchor to the current position in the data. Passing this
+    anchor to a constructor makes the current position to be the first
+    returned record.
+    """
+    if self._write and self._recordCount == 0:
+      return None
+
+    rowDict = dict(filepath=os.path.realpath(self._filename),
+                   currentRow=self._recordCount)
+    return json.dumps(rowDict)
+
+
+  def recordsExistAfter(self, bookmark):
+    """Returns True iff there are records left after the  bookmark."""
+    return self._numRecords > self._getStartRow(bookmark)
+
+
+  def seekFromEnd(self, numRecords):
+    """Seeks to numRecords from the end and returns a bookmark to the new
+    position.
+    """
+    self._recordCount = max(0, self._numRecords - numRecords)
+    self._block = []
+    self._blockPos = 0
+    return self.getBookmark()
+
+
+  def setAutoRewind(self, autoRewind):
+    """
+    Controls whether getNext() should automatically rewind the source when EOF
+    is reached.
+
+    autoRewind: True = getNext() will automatically rewind the source on EOF;
+                False = getNext() will not automatically rewind the source
+                on EOF
+    """
+    self.rewindAtEOF = autoRewind
+
+
+  def getStats(self):
+    """ Returns the stats saved in the file header: the min and max of each
+    int and float field, like FileRecordStream.getStats(), e.g.:
+
+             {
+               'min' : [f1_min, f2_min, None, None, fn_min],
+               'max' : [f1_max, f2_max, None, None, fn_max]
+             }
+    """
+    assert not self._write
+    return copy.deepcopy(self._stats)
+
+
+  def clearStats(self):
+    """ Resets stats collected so far. The stats of a binary record file are
+    computed when it is written, so there is nothing to reset.
+    """
+    pass
+
+
+  def getError(self):
+    """ Returns errors saved in the stream.
+    """
+    return None
+
+
+  def setError(self, error):
+    """ Saves specified error in the stream.
+    """
+    return
+
+
+  def isCompleted(self):
+    """ Returns True if all records are already in the stream or False
+    if more records is expected.
+    """
+    return True
+
+
+  def setCompleted(self, completed=True):
+    """ Marks the stream completed (True or False)
+    """
+    return
+
+
+  def getFieldNames(self):
+    """ Returns an array of field names associated with the data.
+    """
+    return [f[0] for f in self._fields]
+
+
+  def getFields(self):
+    """ Returns a sequence of nupic.data.fieldmeta.FieldMetaInfo
+    name/type/special tuples for each field in the stream.
+    """
+    return copy.copy(self._fields)
+
+
+  def _getStartRow(self, bookmark):
+    """ Extracts start row from the bookmark information
+    """
+    bookMarkDict = json.loads(bookmark)
+
+    realpath = os.path.realpath(self._filename)
+
+    bookMarkFile = bookMarkDict.get('filepath', None)
+
+    if bookMarkFile != realpath:
+      print ("Ignoring bookmark due to mismatch between File's "
+             "filename realpath vs. bookmark; realpath: %r; bookmark: %r") % (
+        realpath, bookMarkDict)
+      return 0
+    else:
+      return bookMarkDict['currentRow']
+
+
+  def getNextRecordIdx(self):
+    """Returns the index of the record that will be read next from
+    getNextRecord()
+    """
+    return self._recordCount
+
+
+  def getDataRowCount(self):
+    """
+    Returns:  count of data rows in dataset
+    """
+    return self._numRecords
+
+
+  def setTimeout(self, timeout):
+    """ Set the read timeout """
+    pass
+
+
+  def flush(self):
+    """ The file is written when the stream is closed """
+    pass
+
+
+  def __enter__(self):
+    """Context guard - enter
+
+    Just return the object
+    """
+    return self
+
+
+  def __exit__(self, yupe, value, traceback):
+    """Context guard - exit
+
+    Ensures that the file is always closed at the end of the 'with' block.
+    Lets exceptions propagate.
+    """
+    self.close()
+
+
+  def __iter__(self):
+    """Support for the iterator protocol. Return itself"""
+    return self
+
+
+  def next(self):
+    """Implement the iterator protocol """
+    record = self.getNextRecord()
+    if record is None:
+      raise StopIteration
+
+    return record
+
+
+
+def _copyFile(inFile, outFile, numBytes):
+  while numBytes > 0:
+    chunk = inFile.read(min(numBytes, 1 << 20))
+    if not chunk:
+      raise IOError('Unexpected end of file')
+    outFile.write(chunk)
+    numBytes -= len(chunk)
+
+
+
+def convertCsvToBinary(csvPath, binaryPath, progressCB=None):
+  """ Convert a FileRecordStream CSV file to a binary record file.
+
+  The records are read with FileRecordStream, so a BinaryRecordStream on the
+  binary file returns the same records.
+
+  csvPath:      path of the CSV file, with the 3 header rows
+  binaryPath:   path of the binary record file to write
+  progressCB:   called after every record, if not None
+
+  Returns: the number of records converted
+  """
+  with FileRecordStream(csvPath) as reader:
+    with BinaryRecordStream(binaryPath, write=True,
+                            fields=reader.getFields()) as writer:
+      writer.appendRecords(reader, progressCB=progressCB)
+      return writer.getNextRecordIdx()
@@ -0,0 +1,418 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Cache of the records produced by a StreamReader.
+
+The first process that needs the records of a stream definition reads them
+once through a StreamReader, so parsing, filtering and aggregation happen only
+once, and saves every key of the record dicts, meta-fields included, as a
+NumPy array in a cache directory. Every other process memory-maps the same
+arrays with a CachedRecordStream, so the operating system shares one copy of
+the data between all the models of a swarm.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+
+from nupic.data.fieldmeta import FieldMetaInfo
+from nupic.data.stream_reader import StreamReader
+
+
+
+# Bump when the layout of the cache directory changes
+CACHE_VERSION = 1
+
+_HEADER_FILE_NAME = "header.json"
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Number of records converted back to Python objects at a time
+_BLOCK_SIZE = 1024
+
+
+
+class RecordCacheError(Exception):
+  """ Raised when a stream can't be cached, or a cache can't be read. """
+  pass
+
+
+
+def _toMicroseconds(value):
+  delta = value - _EPOCH
+  return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+
+def _fromMicroseconds(value):
+  return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+
+def _getColumnKind(values):
+  """ Return the kind of a column of record values: "bool", "int", "float",
+  "string" or "datetime". Missing values (None) are ignored.
+
+  Raises RecordCacheError if the values don't all have the same supported
+  type, e.g. lists, or ints mixed with floats.
+  """
+  kinds = set()
+  for value in values:
+    if value is None:
+      continue
+    # bool is a subclass of int, so it must be tested first
+    if isinstance(value, bool):
+      kinds.add("bool")
+    elif isinstance(value, (int, long)):
+      kinds.add("int")
+    elif isinstance(value, float):
+      kinds.add("float")
+    elif isinstance(value, str):
+      kinds.add("string")
+    elif isinstance(value, datetime.datetime) and value.tzinfo is None:
+      kinds.add("datetime")
+    else:
+      raise RecordCacheError("Values of type %s can't be cached" %
+                             type(value).__name__)
+    if len(kinds) > 1:
+      raise RecordCacheError("Values of types %s can't be cached in the "
+                             "same column" % sorted(kinds))
+
+  # A column of missing values only
+  return kinds.pop() if kinds else "int"
+
+
+
+def _encodeColumn(values, kind):
+  """ Return (array, missing) for a column of record values, where missing is
+  a boolean array flagging the None values, or None if there are none.
+  """
+  missing = numpy.array([value is None for value in values], dtype=bool)
+  if not missing.any():
+    missing = None
+
+  if kind == "datetime":
+    values = [0 if value is None else _toMicroseconds(value)
+              for value in values]
+    return numpy.array(values, dtype=numpy.int64), missing
+
+  if kind == "string":
+    values = ["" if value is None else value for value in values]
+    for value in values:
+      if value.endswith("\0"):
+        # NumPy strips trailing NULs from fixed width strings
+        raise RecordCacheError("Strings ending with NUL can't be cached")
+    return numpy.array(values, dtype=str), missing
+
+  dtype = {"bool": bool, "int": numpy.int64, "float": numpy.float64}[kind]
+  values = [0 if value is None else value for value in values]
+  try:
+    return numpy.array(values, dtype=dtype), missing
+  except OverflowError:
+    raise RecordCacheError("Integers out of the int64 range can't be cached")
+
+
+
+def getCacheKey(streamDef):
+  """ Return the name of the cache entry of a stream definition. It changes
+  with the stream definition and with the size and modification time of the
+  source file, so a cache never outlives the data it was made from.
+  """
+  key = {"version": CACHE_VERSION, "streamDef": streamDef}
+
+  source = streamDef["streams"][0].get("source", "")
+  if source.startswith("file://"):
+    path = source[len("file://"):]
+    if os.path.exists(path):
+      stat = os.stat(path)
+      key["source"] = [stat.st_size, stat.st_mtime]
+
+  return hashlib.sha1(json.dumps(key, sort_keys=True)).hexdigest()
+
+
+
+def buildRecordCache(streamDef, cacheDir):
+  """ Read all the records of a stream definition and save them in cacheDir.
+
+  The cache is written to a temporary directory and renamed to cacheDir when
+  complete, so concurrent builders never see a partial cache; the first one to
+  finish wins and the others discard their copy. If the stream can't be
+  cached, a header recording the reason is saved instead so other processes
+  don't read the stream again only to fail the same way.
+
+  streamDef:  stream definition, as passed to StreamReader
+  cacheDir:   directory of the cache entry, see getCacheKey()
+  """
+  parentDir = os.path.dirname(os.path.abspath(cacheDir))
+  if not os.path.isdir(parentDir):
+    try:
+      os.makedirs(parentDir)
+    except OSError:
+      # Created by a concurrent builder
+      if not os.path.isdir(parentDir):
+        raise
+
+  tmpDir = tempfile.mkdtemp(prefix=os.path.basename(cacheDir) + ".",
+                            dir=parentDir)
+  try:
+    header = {"version": CACHE_VERSION}
+    try:
+      header.update(_writeColumns(streamDef, tmpDir))
+    except RecordCacheError as e:
+      header["error"] = str(e)
+
+    with open(os.path.join(tmpDir, _HEADER_FILE_NAME), "w") as headerFile:
+      json.dump(header, headerFile)
+
+    try:
+      os.rename(tmpDir, cacheDir)
+    except OSError:
+      if not os.path.isdir(cacheDir):
+        raise
+  finally:
+    if os.path.isdir(tmpDir):
+      shutil.rmtree(tmpDir)
+
+
+
+def _writeColumns(streamDef, outDir):
+  """ Save the records of a stream definition as one array per record dict
+  key in outDir.
+
+  Returns: the header entries that describe the arrays
+  """
+  reader = StreamReader(streamDef, isBlocking=False, maxTimeout=0)
+  try:
+    records = []
+    while True:
+      record = reader.getNextRecordDict()
+      if record is None:
+        break
+      if not record:
+        raise RecordCacheError("Stream timed out before its end")
+      records.append(record)
+
+    header = {
+      "numRecords": len(records),
+      "fields": [list(field) for field in reader.getFields()],
+      "stats": reader.getStats(),
+      "aggregation": reader.getAggregationMonthsAndSeconds(),
+      "columns": [],
+    }
+  finally:
+    reader.close()
+
+  keys = sorted(records[0].keys()) if records else []
+  for record in records:
+    if len(record) != len(keys):
+      raise RecordCacheError("Records don't all have the same keys")
+
+  for (i, key) in enumerate(keys):
+    values = [record[key] for record in records]
+    kind = _getColumnKind(values)
+    (array, missing) = _encodeColumn(values, kind)
+
+    numpy.save(os.path.join(outDir, "column%d.npy" % i), array)
+    if missing is not None:
+      numpy.save(os.path.join(outDir, "column%d.missing.npy" % i), missing)
+
+    header["columns"].append({"name": key,
+                              "kind": kind,
+                              "hasMissing": missing is not None})
+
+  return header
+
+
+
+def openRecordCache(streamDef, cacheRoot):
+  """ Return a CachedRecordStream over the records of a stream definition,
+  building its cache entry under cacheRoot first if no process did yet.
+
+  Raises RecordCacheError if the stream can't be cached, or if the cache
+  can't be built or read, e.g. because another process deleted it meanwhile;
+  callers should then read the stream with a StreamReader.
+  """
+  cacheDir = os.path.join(cacheRoot, getCacheKey(streamDef))
+  try:
+    if not os.path.isdir(cacheDir):
+      buildRecordCache(streamDef, cacheDir)
+    return CachedRecordStream(cacheDir)
+  except (IOError, OSError) as e:
+    raise RecordCacheError("Can't open record cache %r: %s" % (cacheDir, e))
+
+
+
+class CachedRecordStream(object):
+  """ Reads the records of a cache entry written by buildRecordCache().
+
+  Provides the read methods of a StreamReader that the model runners use, and
+  returns the same record dicts the StreamReader returned when the cache was
+  built.
+  """
+
+  def __init__(self, cacheDir):
+    headerPath = os.path.join(cacheDir, _HEADER_FILE_NAME)
+    try:
+      with open(headerPath) as headerFile:
+        header = json.load(headerFile)
+    except (IOError, ValueError) as e:
+      raise RecordCacheError("Can't read record cache header %r: %s" %
+                             (headerPath, e))
+
+    if header.get("version") != CACHE_VERSION:
+      raise RecordCacheError("Record cache %r has version %r, expected %r" %
+                             (cacheDir, header.get("version"), CACHE_VERSION))
+    if "error" in header:
+      raise RecordCacheError("Stream was not cached: %s" % header["error"])
+
+    self._cacheDir = cacheDir
+    self._numRecords = header["numRecords"]
+    self._fields = [FieldMetaInfo(*[str(item) for item in field])
+                    for field in header["fields"]]
+    self._fieldNames = [field.name for field in self._fields]
+    self._stats = header["stats"]
+    self._aggMonthsAndSeconds = header["aggregation"]
+
+    self._keys = []
+    self._kinds = []
+    self._arrays = []
+    self._missing = []
+    try:
+      for (i, column) in enumerate(header["columns"]):
+        self._keys.append(str(column["name"]))
+        self._kinds.append(column["kind"])
+        self._arrays.append(numpy.load(
+            os.path.join(cacheDir, "column%d.npy" % i), mmap_mode="r"))
+        if column["hasMissing"]:
+          self._missing.append(numpy.load(
+              os.path.join(cacheDir, "column%d.missing.npy" % i),
+              mmap_mode="r"))
+        else:
+          self._missing.append(None)
+    except (IOError, OSError) as e:
+      raise RecordCacheError("Can't read record cache %r: %s" % (cacheDir, e))
+
+    self._nextRecordIdx = 0
+    self._block = []
+    self._blockPos = 0
+
+
+  def close(self):
+    self._arrays = []
+    self._missing = []
+    self._block = []
+
+
+  def rewind(self):
+    self._nextRecordIdx = 0
+    self._block = []
+    self._blockPos = 0
+
+
+  def getNextRecordDict(self):
+    """ Returns the next record dict, or None at the end of the stream. """
+    if self._blockPos >= len(self._block):
+      if self._nextRecordIdx >= self._numRecords:
+        return None
+      self._block = self._readBlock(self._nextRecordIdx,
+                                    self._nextRecordIdx + _BLOCK_SIZE)
+      self._blockPos = 0
+
+    record = self._block[self._blockPos]
+    self._blockPos += 1
+    self._nextRecordIdx += 1
+    return record
+
+
+  def _readBlock(self, start, end):
+    """ Convert records start to end of the arrays to a list of record dicts.
+    """
+    columns = []
+    for (kind, array, missing) in zip(self._kinds, self._arrays,
+                                      self._missing):
+      values = array[start:end].tolist()
+      if kind == "datetime":
+        values = [_fromMicroseconds(value) for value in values]
+      if missing is not None:
+        values = [None if isMissing else value
+                  for (value, isMissing) in zip(values,
+                                                missing[start:end].tolist())]
+      columns.append(values)
+
+    keys = self._keys
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+  def getNextRecordIdx(self):
+    return self._nextRecordIdx
+
+
+  def getNumRecords(self):
+    return self._numRecords
+
+
+  def setTimeout(self, timeout):
+    """ The cache is complete, so reads never wait. """
+    pass
+
+
+  def getFieldNames(self):
+    return list(self._fieldNames)
+
+
+  def getFields(self):
+    return list(self._fields)
+
+
+  def getStats(self):
+    """ Returns the stats the StreamReader reported when the cache was built.
+    """
+    return self._stats
+
+
+  def getFieldMin(self, fieldName):
+    """ Returns the minimum value of the field, or None if there is none, as
+    RecordStreamIface.getFieldMin() does.
+    """
+    return self._getFieldStat("min", fieldName)
+
+
+  def getFieldMax(self, fieldName):
+    """ Returns the maximum value of the field, or None if there is none, as
+    RecordStreamIface.getFieldMax() does.
+    """
+    return self._getFieldStat("max", fieldName)
+
+
+  def _getFieldStat(self, statName, fieldName):
+    if not self._stats or self._stats.get(statName) is None:
+      return None
+    return self._stats[statName][self._fieldNames.index(fieldName)]
+
+
+  def getAggregationMonthsAndSeconds(self):
+    return self._aggMonthsAndSeconds
@@ -24,6 +24,96 @@
 from abc import ABCMeta, abstractmethod
 import datetime
 
+import numpy
+
+
+
+# Seconds from 0001-01-01, the origin of the timestamp record indices, to the
+# NumPy datetime64 epoch
+_EPOCH_SECONDS = ((datetime.datetime(1970, 1, 1) -
+                   datetime.datetime(1, 1, 1)).days * 24 * 60 * 60)
+
+# Kinds of NumPy arrays accepted for the values of each field type
+_COLUMN_KINDS = {'int': 'iuf', 'float': 'iuf', 'bool': 'b'}
+
+
+
+def valuesToColumn(fieldType, values):
+  """ Convert the values of a field in consecutive records to a NumPy array.
+
+  int, float and bool fields become numeric arrays, and datetime fields
+  datetime64[us] arrays. Fields of other types, and fields with missing
+  values (None), become object arrays holding the values unchanged.
+
+  fieldType:  type of the field, as in nupic.data.fieldmeta.FieldMetaInfo
+  values:     list of the values
+  """
+  if None not in values:
+    if fieldType == 'datetime':
+      try:
+        return numpy.array(values, dtype='datetime64[us]')
+      except (TypeError, ValueError):
+        pass
+    elif fieldType in _COLUMN_KINDS:
+      column = numpy.array(values)
+      if column.ndim == 1 and column.dtype.kind in _COLUMN_KINDS[fieldType]:
+        return column
+
+  # Assigned one at a time, so lists (e.g. sdr values) aren't unpacked
+  column = numpy.empty(len(values), dtype=object)
+  for (i, value) in enumerate(values):
+    column[i] = value
+  return column
+
+
+
+class RecordsBatch(object):
+  """ Consecutive records of a stream in struct-of-arrays form, returned by
+  RecordStreamIface.getNextRecordsBatch().
+
+  batch[name] is the NumPy array of the values of a field (see
+  valuesToColumn()), or of a meta field computed like
+  RecordStreamIface.getNextRecordDict() does: '_category', '_reset',
+  '_sequenceId', '_timestamp', '_timestampRecordIdx' and, if the stream has a
+  learning field, '_learning'.
+  """
+
+  def __init__(self, fieldNames, columns, metaColumns):
+    """
+    fieldNames:   names of the fields
+    columns:      array of values of each field, in the order of fieldNames
+    metaColumns:  dict of the meta field arrays
+    """
+    self.fieldNames = list(fieldNames)
+    self._columns = dict(zip(fieldNames, columns))
+    self._columns.update(metaColumns)
+    self._numRecords = len(columns[0]) if columns else 0
+
+
+  def __len__(self):
+    return self._numRecords
+
+
+  def __getitem__(self, name):
+    return self._columns[name]
+
+
+  def __contains__(self, name):
+    return name in self._columns
+
+
+  def keys(self):
+    return self._columns.keys()
+
+
+  def getRecordDicts(self):
+    """ Returns: the records of the batch as a list of dicts of Python values,
+    like those returned by RecordStreamIface.getNextRecordDict()
+    """
+    names = self._columns.keys()
+    columns = [self._columns[name].tolist() for name in names]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
 
 
 class RecordStreamIface(object):
@@ -141,6 +231,159 @@ class RecordStreamIface(object):
     return result
 
 
+  def getNextRecordsBatch(self, numRecords):
+    """ Returns the next available records of the storage as a RecordsBatch.
+    The meta field arrays hold the same values as the dicts returned by
+    getNextRecordDict(), which can be called before or after this method.
+
+    numRecords: maximum number of records to read. Fewer are returned at the
+                end of the stream, or when timing out while waiting for the
+                next record.
+
+    retval: a RecordsBatch; None, if no more records in the table (End of
+             Stream - EOS)
+    """
+    columns = self._getNextColumns(numRecords)
+    if columns is None:
+      return None
+
+    numRows = len(columns[0]) if columns else 0
+
+    # The special field indices are resolved once per batch
+    catIdx = self.getCategoryFieldIdx()
+    resetIdx = self.getResetFieldIdx()
+    sequenceIdx = self.getSequenceIdFieldIdx()
+    timeIdx = self.getTimestampFieldIdx()
+    learningIdx = self.getLearningFieldIdx()
+
+    meta = dict()
+    noneColumn = valuesToColumn(None, [None] * numRows)
+
+    if catIdx is not None:
+      meta['_category'] = columns[catIdx]
+    else:
+      meta['_category'] = noneColumn
+
+    if resetIdx is not None:
+      resets = self._toFlags(columns[resetIdx])
+    else:
+      resets = numpy.zeros(numRows, dtype=numpy.int64)
+
+    if learningIdx is not None:
+      meta['_learning'] = self._toFlags(columns[learningIdx])
+
+    if timeIdx is not None:
+      meta['_timestamp'] = columns[timeIdx]
+      meta['_timestampRecordIdx'] = self._computeTimestampRecordIdxs(
+                                                        columns[timeIdx])
+    else:
+      meta['_timestamp'] = noneColumn
+      meta['_timestampRecordIdx'] = noneColumn
+
+    # -----------------------------------------------------------------------
+    # Figure out the sequence IDs
+    hasReset = resetIdx is not None
+    hasSequenceId = sequenceIdx is not None
+    if hasReset and not hasSequenceId:
+      # Reset only
+      sequenceIds = (self._sequenceId + numpy.cumsum(resets)).tolist()
+
+    elif not hasReset and hasSequenceId:
+      sequenceIds = columns[sequenceIdx].tolist()
+      previous = [self._sequenceId] + sequenceIds[:-1]
+      resets = numpy.array([int(sequenceId != prev) for (sequenceId, prev)
+                            in zip(sequenceIds, previous)], dtype=numpy.int64)
+
+    elif hasReset and hasSequenceId:
+      sequenceIds = columns[sequenceIdx].tolist()
+
+    else:
+      sequenceIds = [0] * numRows
+
+    if numRows > 0 and hasSequenceId != hasReset:
+      self._sequenceId = sequenceIds[-1]
+
+    meta['_reset'] = resets
+    meta['_sequenceId'] = valuesToColumn(
+      'int', [hash(sequenceId) if sequenceId is not None else None
+              for sequenceId in sequenceIds])
+
+    return RecordsBatch(self.getFieldNames(), columns, meta)
+
+
+  def _getNextColumns(self, numRecords):
+    """ Reads up to numRecords records with getNextRecord(), for
+    getNextRecordsBatch(). Subclasses that store their records by field may
+    override it to build the arrays directly.
+
+    retval: a list with the NumPy array of the values of each field (see
+             valuesToColumn()); None at the End of Stream
+    """
+    records = []
+    while len(records) < numRecords:
+      values = self.getNextRecord()
+      if values is None:
+        if not records:
+          return None
+        break
+      if not values:
+        # Timed out waiting for the next record
+        break
+      records.append(values)
+
+    fields = self.getFields()
+    if records:
+      fieldValues = zip(*records)
+    else:
+      fieldValues = [()] * len(fields)
+    return [valuesToColumn(field[1], list(values))
+            for (field, values) in zip(fields, fieldValues)]
+
+
+  @staticmethod
+  def _toFlags(column):
+    """ Convert an array of reset or learning field values to an int array of
+    0 and 1 """
+    if column.dtype.kind in 'iufb':
+      return (column != 0).astype(numpy.int64)
+    return numpy.array([int(bool(value)) for value in column],
+                       dtype=numpy.int64)
+
+
+  def _computeTimestampRecordIdxs(self, timestamps):
+    """ Like _computeTimestampRecordIdx(), for an array of timestamps.
+
+    Parameters:
+    ------------------------------------------------------------------------
+    timestamps: array of timestamps, as returned by valuesToColumn()
+    retval:     array of record timestamp indices (of None if no aggregation
+                period)
+    """
+    aggPeriod = self.getAggregationMonthsAndSeconds()
+    if aggPeriod is None or timestamps.dtype.kind != 'M':
+      return valuesToColumn('int', [self._computeTimestampRecordIdx(timestamp)
+                                    for timestamp in timestamps])
+
+    # Base record index on number of elapsed months if aggregation is in
+    #  months
+    if aggPeriod['months'] > 0:
+      assert aggPeriod['seconds'] == 0
+      months = (timestamps.astype('datetime64[M]').astype(numpy.int64) +
+                1970 * 12)
+      return (months // aggPeriod['months']).astype(numpy.int64)
+
+    # Base record index on elapsed seconds; the sum is computed in the same
+    #  order as _computeTimestampRecordIdx() does, for the same rounding
+    elif aggPeriod['seconds'] > 0:
+      microseconds = timestamps.astype('datetime64[us]').astype(numpy.int64)
+      deltaSecs = ((microseconds // 1000000 + _EPOCH_SECONDS) +
+                   (microseconds % 1000000) / 1000000.0)
+      return numpy.trunc(deltaSecs / aggPeriod['seconds']).astype(numpy.int64)
+
+    else:
+      return valuesToColumn('int', [None] * len(timestamps))
+
+
   def _computeTimestampRecordIdx(self, recordTS):
     """ Give the timestamp of a record (a datetime object), compute the record's
     timestamp index - this is the timestamp divided by the aggregation period. 
@@ -27,6 +27,8 @@ import tempfile
 from pkg_resources import resource_filename
 
 from nupic.data.aggregator import Aggregator
+from nupic.data.binary_record_stream import (BinaryRecordStream,
+                                             BINARY_FILE_EXTENSION)
 from nupic.data.fieldmeta import FieldMetaInfo
 from nupic.data.file_record_stream import FileRecordStream
 from nupic.data import jsonhelpers
@@ -283,13 +285,19 @@ class StreamReader(RecordStreamIface):
                   firstRecordIdx):
     """Open the underlying file stream.
 
-    This only supports 'file://' prefixed paths.
+    This only supports 'file://' prefixed paths. Files with the
+    BINARY_FILE_EXTENSION extension are opened as BinaryRecordStreams, other
+    files as CSV FileRecordStreams.
     """
     filePath = dataUrl[len(FILE_PREF):]
     if not os.path.isabs(filePath):
       filePath = os.path.join(os.getcwd(), filePath)
-    self._recordStoreName = filePath 
-    self._recordStore = FileRecordStream(streamID=self._recordStoreName,
+    self._recordStoreName = filePath
+    if filePath.endswith(BINARY_FILE_EXTENSION):
+      recordStoreClass = BinaryRecordStream
+    else:
+      recordStoreClass = FileRecordStream
+    self._recordStore = recordStoreClass(streamID=self._recordStoreName,
                                          write=False,
                                          bookmark=bookmark,
                                          firstRecord=firstRecordIdx)
@@ -25,6 +25,7 @@
 from __future__ import with_statement
 
 import collections
+import contextlib
 import logging
 from optparse import OptionParser
 import sys
@@ -206,6 +207,9 @@ class ClientJobsDAO(object):
   _eng_model_milestones (engModelMilestones): JSON encoded object with
             information about global model milestone results.
 
+  _eng_model_change_seq (engModelChangeSeq): Last change sequence number given
+            to a model of this job; see _eng_change_seq in the models table.
+
   minimum_workers (minimumWorkers): min number of desired workers at a time.
             If 0, no workers will be allocated in a crunch
 
@@ -334,6 +338,12 @@ class ClientJobsDAO(object):
   _eng_matured (engMatured): Set by the model maturity checker when it decides
             that this model has "matured".
 
+  _eng_change_seq (engChangeSeq): Change sequence number of the model, set
+            from the job's _eng_model_change_seq every time the model is
+            inserted or its update_counter is incremented. Sequence numbers
+            are committed in increasing order within a job, so workers can
+            fetch only the models that changed since their last read.
+
   """
 
   # Job priority range values.
@@ -452,6 +462,10 @@ class ClientJobsDAO(object):
     getUpdateCountersNamedTuple = collections.namedtuple(
       '_modelsGetUpdateCountersNamedTuple', ['modelId', 'updateCounter'])
 
+    getChangesNamedTuple = collections.namedtuple(
+      '_modelsGetChangesNamedTuple',
+      ['modelId', 'updateCounter', 'engChangeSeq'])
+
     def __init__(self):
       super(ClientJobsDAO._ModelsTableInfo, self).__init__()
 
@@ -472,7 +486,7 @@ class ClientJobsDAO(object):
   # The root name and version of the database. The actual database name is
   #  something of the form "client_jobs_v2_suffix".
   _DB_ROOT_NAME = 'client_jobs'
-  _DB_VERSION = 29
+  _DB_VERSION = 30
 
 
   @classmethod
@@ -796,6 +810,8 @@ class ClientJobsDAO(object):
         '_eng_model_milestones   LONGTEXT',
             # JSon encoded object with information about global model milestone
             # results
+        '_eng_model_change_seq   BIGINT UNSIGNED DEFAULT 0',
+            # Last change sequence number given to a model of this job
 
         'PRIMARY KEY (job_id)',
         'UNIQUE INDEX (client, job_hash)',
@@ -879,9 +895,13 @@ class ClientJobsDAO(object):
             # Set by the model maturity-checker when it decides that this model
             #  has "matured". This means that it has reached the point of
             #  not getting better results with more data.
+        '_eng_change_seq         BIGINT UNSIGNED DEFAULT 0',
+            # Change sequence number of the last insert or update_counter
+            #  increment of this model, unique within the job
         'PRIMARY KEY (model_id)',
         'UNIQUE INDEX (job_id, _eng_params_hash)',
         'UNIQUE INDEX (job_id, _eng_particle_hash)',
+        'INDEX (job_id, _eng_change_seq)',
         ]
       options = [
         'AUTO_INCREMENT=1000',
@@ -2280,6 +2300,54 @@ class ClientJobsDAO(object):
       conn.cursor.execute(query)
 
 
+  @contextlib.contextmanager
+  def _modelChangeNoRetries(self, conn, jobID):
+    """ Context manager of the transaction of a statement that inserts a model
+    or increments its update_counter. Takes the next change sequence number of
+    the job and yields it, for the statement to store in _eng_change_seq. The
+    transaction is committed when the block exits normally and rolled back if
+    it raises.
+
+    The job row (the whole database with SQLite) stays locked until the
+    transaction ends, so the changes of a job are committed in the order of
+    their sequence numbers: a reader that sees a sequence number also sees all
+    the smaller ones.
+
+    conn:     Owned connection acquired from ConnectionFactory.get()
+    jobID:    jobID of the model, or None if the model doesn't exist; None is
+              then yielded and no transaction is started
+    """
+    if jobID is None:
+      yield None
+      return
+
+    conn.cursor.execute('START TRANSACTION')
+    try:
+      query = 'UPDATE %s SET _eng_model_change_seq=_eng_model_change_seq+1 ' \
+              '          WHERE job_id=%%s' % (self.jobsTableName,)
+      conn.cursor.execute(query, [jobID])
+
+      query = 'SELECT _eng_model_change_seq FROM %s WHERE job_id=%%s' \
+              % (self.jobsTableName,)
+      conn.cursor.execute(query, [jobID])
+      rows = conn.cursor.fetchall()
+      assert len(rows) == 1, "Job not found: jobID=%r" % (jobID,)
+
+      yield rows[0][0]
+    except:
+      conn.cursor.execute('ROLLBACK')
+      raise
+
+    conn.cursor.execute('COMMIT')
+
+
+  def _getModelJobIDNoRetries(self, conn, modelID):
+    """ Return the jobID of a model, or None if the model doesn't exist. """
+    row = self._getOneMatchingRowNoRetries(self._models, conn,
+                                           {'model_id':modelID}, ['job_id'])
+    return row[0] if row is not None else None
+
+
   @logExceptions(_getLogger)
   def modelInsertAndStart(self, jobID, params, paramsHash, particleHash=None):
     """ Insert a new unique model (based on params) into the model table in the
@@ -2344,14 +2412,15 @@ class ClientJobsDAO(object):
         # Create a new job entry
         query = 'INSERT INTO %s (job_id, params, status, _eng_params_hash, ' \
                 '  _eng_particle_hash, start_time, _eng_last_update_time, ' \
-                '  _eng_worker_conn_id) ' \
+                '  _eng_worker_conn_id, _eng_change_seq) ' \
                 '  VALUES (%%s, %%s, %%s, %%s, %%s, UTC_TIMESTAMP(), ' \
-                '          UTC_TIMESTAMP(), %%s) ' \
+                '          UTC_TIMESTAMP(), %%s, %%s) ' \
                 % (self.modelsTableName,)
-        sqlParams = (jobID, params, self.STATUS_RUNNING, paramsHash,
-                     particleHash, self._connectionID)
         try:
-          numRowsAffected = conn.cursor.execute(query, sqlParams)
+          with self._modelChangeNoRetries(conn, jobID) as changeSeq:
+            sqlParams = (jobID, params, self.STATUS_RUNNING, paramsHash,
+                         particleHash, self._connectionID, changeSeq)
+            numRowsAffected = conn.cursor.execute(query, sqlParams)
         except Exception, e:
           # NOTE: We have seen instances where some package in the calling
           #  chain tries to interpret the exception message using unicode.
@@ -2623,14 +2692,17 @@ class ClientJobsDAO(object):
       '%s=%%s' % (self._models.pubToDBNameDict[f],) for f in fields.iterkeys())
     assignmentValues = fields.values()
 
-    query = 'UPDATE %s SET %s, update_counter = update_counter+1 ' \
+    query = 'UPDATE %s SET %s, update_counter = update_counter+1, ' \
+            '              _eng_change_seq=%%s ' \
             '          WHERE model_id=%%s' \
             % (self.modelsTableName, assignmentExpressions)
-    sqlParams = assignmentValues + [modelID]
 
     # Get a database connection and cursor
     with ConnectionFactory.get() as conn:
-      numAffectedRows = conn.cursor.execute(query, sqlParams)
+      jobID = self._getModelJobIDNoRetries(conn, modelID)
+      with self._modelChangeNoRetries(conn, jobID) as changeSeq:
+        sqlParams = assignmentValues + [changeSeq, modelID]
+        numAffectedRows = conn.cursor.execute(query, sqlParams)
       self._logger.debug("Executed: numAffectedRows=%r, query=%r, sqlParams=%r",
                          numAffectedRows, query, sqlParams)
 
@@ -2733,6 +2805,34 @@ class ClientJobsDAO(object):
     return [self._models.getUpdateCountersNamedTuple._make(r) for r in rows]
 
 
+  @logExceptions(_getLogger)
+  @g_retrySQL
+  def modelsGetChangesSince(self, jobID, changeSeq):
+    """ Return info on the models of a job that were inserted or had their
+    update counter incremented since a given change sequence number. Unlike
+    modelsGetUpdateCounters(), the cost depends on the number of changed
+    models only, not on the number of models of the job.
+
+    Parameters:
+    ----------------------------------------------------------------
+    jobID:      jobID to query
+    changeSeq:  engChangeSeq of the last change seen by the caller; 0 to get
+                  all the models of the job
+    retval:     (possibly empty) list of tuples sorted by engChangeSeq. Each
+                  tuple contains: (modelID, updateCounter, engChangeSeq). Pass
+                  the engChangeSeq of the last tuple to the next call.
+    """
+    query = 'SELECT model_id, update_counter, _eng_change_seq FROM %s ' \
+            '          WHERE job_id=%%s AND _eng_change_seq>%%s ' \
+            '          ORDER BY _eng_change_seq' % (self.modelsTableName,)
+
+    with ConnectionFactory.get() as conn:
+      conn.cursor.execute(query, [jobID, changeSeq])
+      rows = conn.cursor.fetchall()
+
+    return [self._models.getChangesNamedTuple._make(r) for r in rows]
+
+
   @logExceptions(_getLogger)
   @g_retrySQL
   def modelUpdateResults(self, modelID, results=None, metricValue =None,
@@ -2749,7 +2849,8 @@ class ClientJobsDAO(object):
     numRecords:   new numRecords, or None to ignore
     """
 
-    assignmentExpressions = ['_eng_last_update_time=UTC_TIMESTAMP()',
+    assignmentExpressions = ['_eng_change_seq=%s',
+                             '_eng_last_update_time=UTC_TIMESTAMP()',
                              'update_counter=update_counter+1']
     assignmentValues = []
 
@@ -2770,11 +2871,14 @@ class ClientJobsDAO(object):
     query = 'UPDATE %s SET %s ' \
             '          WHERE model_id=%%s and _eng_worker_conn_id=%%s' \
                 % (self.modelsTableName, ','.join(assignmentExpressions))
-    sqlParams = assignmentValues + [modelID, self._connectionID]
 
     # Get a database connection and cursor
     with ConnectionFactory.get() as conn:
-      numRowsAffected = conn.cursor.execute(query, sqlParams)
+      jobID = self._getModelJobIDNoRetries(conn, modelID)
+      with self._modelChangeNoRetries(conn, jobID) as changeSeq:
+        sqlParams = ([changeSeq] + assignmentValues +
+                     [modelID, self._connectionID])
+        numRowsAffected = conn.cursor.execute(query, sqlParams)
 
     if numRowsAffected != 1:
       raise InvalidConnectionException(
@@ -2815,18 +2919,22 @@ class ClientJobsDAO(object):
               '            end_time=UTC_TIMESTAMP(), ' \
               '            cpu_time=%%s, ' \
               '            _eng_last_update_time=UTC_TIMESTAMP(), ' \
-              '            update_counter=update_counter+1 ' \
+              '            update_counter=update_counter+1, ' \
+              '            _eng_change_seq=%%s ' \
               '        WHERE model_id=%%s' \
               % (self.modelsTableName,)
-    sqlParams = [self.STATUS_COMPLETED, completionReason, completionMsg,
-                 cpuTime, modelID]
+    whereValues = [modelID]
 
     if useConnectionID:
       query += " AND _eng_worker_conn_id=%s"
-      sqlParams.append(self._connectionID)
+      whereValues.append(self._connectionID)
 
     with ConnectionFactory.get() as conn:
-      numRowsAffected = conn.cursor.execute(query, sqlParams)
+      jobID = self._getModelJobIDNoRetries(conn, modelID)
+      with self._modelChangeNoRetries(conn, jobID) as changeSeq:
+        sqlParams = [self.STATUS_COMPLETED, completionReason, completionMsg,
+                     cpuTime, changeSeq] + whereValues
+        numRowsAffected = conn.cursor.execute(query, sqlParams)
 
     if numRowsAffected != 1:
       raise InvalidConnectionException(
@@ -204,7 +204,8 @@ class ConnectionFactory(object):
                   The method must be compatible with the following signature:
                     <DatabaseConnectionPolicyIface subclass instance> provider()
     """
-    cls._connectionPolicyInstanceProvider = provider
+    # Wrapped so that a plain function isn't bound to the class on lookup
+    cls._connectionPolicyInstanceProvider = staticmethod(provider)
     return
 
 
@@ -218,11 +219,20 @@ class ConnectionFactory(object):
     """
     logger = _getLogger(cls)
 
-    logger.debug(
-      "Creating database connection policy: platform=%r; pymysql.VERSION=%r",
-      platform.system(), pymysql.VERSION)
+    backend = Configuration.get('nupic.cluster.database.backend', 'mysql')
 
-    if platform.system() == "Java":
+    logger.debug(
+      "Creating database connection policy: backend=%r; platform=%r; "
+      "pymysql.VERSION=%r", backend, platform.system(), pymysql.VERSION)
+
+    if backend == "sqlite":
+      # Imported here because the SQLite backend builds on this module
+      from nupic.database.SQLiteConnection import SQLiteConnectionPolicy
+      policy = SQLiteConnectionPolicy()
+    elif backend != "mysql":
+      raise ValueError("Unknown nupic.cluster.database.backend: %r" %
+                       (backend,))
+    elif platform.system() == "Java":
       # NOTE: PooledDB doesn't seem to work under Jython
       # NOTE: not appropriate for multi-threaded applications.
       # TODO: this was fixed in Webware DBUtils r8228, so once
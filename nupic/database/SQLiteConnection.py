@@ -0,0 +1,593 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+""" Embedded SQLite backend for the NuPIC cluster database.
+
+Selected by setting nupic.cluster.database.backend to "sqlite". Each MySQL
+database used by ClientJobsDAO is a SQLite file in
+nupic.cluster.database.sqlite.dir, attached to the connections under the same
+name so the "<database>.<table>" names of the DAO work unchanged. The cursors
+translate the subset of the MySQL dialect used by ClientJobsDAO, so the DAO
+emits the same SQL for both backends. The databases are in write-ahead logging
+mode, so the worker processes of a swarm on one host read while another
+process writes.
+"""
+
+import datetime
+import os
+import re
+import sqlite3
+import threading
+
+from nupic.database.Connection import (ConnectionWrapper,
+                                       DatabaseConnectionPolicyIface,
+                                       _getLogger)
+from nupic.support.configuration import Configuration
+
+
+
+# Main database of every connection; holds the connection ID counter
+_CONNECTIONS_DB_NAME = "_connections"
+
+_DB_FILE_EXTENSION = ".sqlite"
+
+_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f")
+
+# Statements that ClientJobsDAO sends to the MySQL server rather than to a
+# table, and that are executed by the cursor itself
+_CREATE_DATABASE_RE = re.compile(
+  r"^\s*CREATE\s+DATABASE\s+IF\s+NOT\s+EXISTS\s+(\w+)\s*$", re.I)
+_DROP_DATABASE_RE = re.compile(
+  r"^\s*DROP\s+DATABASE\s+IF\s+EXISTS\s+(\w+)\s*$", re.I)
+_SHOW_TABLES_RE = re.compile(r"^\s*SHOW\s+TABLES\s+IN\s+(\w+)\s*$", re.I)
+_START_TRANSACTION_RE = re.compile(r"^\s*START\s+TRANSACTION\s*$", re.I)
+_DESCRIBE_RE = re.compile(r"^\s*DESCRIBE\s+(\w+)\.(\w+)\s*$", re.I)
+_CREATE_TABLE_RE = re.compile(
+  r"^\s*CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)\.(\w+)\s*\((.*)\)\s*(.*)$",
+  re.I | re.S)
+
+_UPDATE_TABLE_RE = re.compile(r"^\s*UPDATE\s+(\w+)\.(\w+)\s+SET\b", re.I)
+_UPDATE_LIMIT_RE = re.compile(r"\s+LIMIT\s+\d+\s*$", re.I)
+_ASSIGN_DEFAULT_RE = re.compile(r"\b(\w+)\s*=\s*DEFAULT\b", re.I)
+_QUALIFIED_STAR_RE = re.compile(r"\b\w+\.(\w+)\.\*")
+_NO_SUCH_TABLE_RE = re.compile(r"no such table: (\w+)\.\w+")
+
+# MySQL function calls and their SQLite replacements
+_DIALECT_REPLACEMENTS = (
+  (re.compile(r"\bUTC_TIMESTAMP\(\)", re.I), "datetime('now')"),
+  (re.compile(r"\bLAST_INSERT_ID\(\)", re.I), "last_insert_rowid()"),
+  (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+  (re.compile(r"\bTIMESTAMPDIFF\(\s*SECOND\s*,", re.I),
+   "TIMESTAMPDIFF('SECOND',"),
+  # Boolean literals are only known to SQLite 3.23 and later
+  (re.compile(r"\bTRUE\b", re.I), "1"),
+  (re.compile(r"\bFALSE\b", re.I), "0"),
+)
+
+
+
+def _decodeText(value):
+  """ Text factory of the connections: TEXT values are returned as unicode,
+  like pymysql does, unless they hold binary data such as hashes.
+  """
+  try:
+    return value.decode("utf-8")
+  except UnicodeDecodeError:
+    return value
+
+
+
+def _parseDatetime(value):
+  """ Parse a DATETIME column value. MySQL's zero date (DEFAULT 0) is None. """
+  if value in ("0", "0000-00-00 00:00:00"):
+    return None
+  for dateFormat in _DATETIME_FORMATS:
+    try:
+      return datetime.datetime.strptime(value, dateFormat)
+    except ValueError:
+      pass
+  raise ValueError("Unexpected DATETIME value %r" % (value,))
+
+
+
+def _timestampDiff(unit, start, end):
+  """ SQLite implementation of MySQL's TIMESTAMPDIFF(SECOND, start, end) """
+  assert unit.upper() == "SECOND", unit
+  if start is None or end is None:
+    return None
+  start = _parseDatetime(str(start))
+  end = _parseDatetime(str(end))
+  if start is None or end is None:
+    return None
+  delta = end - start
+  return delta.days * 86400 + delta.seconds
+
+
+
+sqlite3.register_converter("DATETIME", _parseDatetime)
+# Binary columns are returned as str, like pymysql does, even when they hold
+# valid UTF-8
+sqlite3.register_converter("BLOB", str)
+sqlite3.register_converter("TINYBLOB", str)
+
+
+
+def _adaptParam(value):
+  # Strings that aren't text, like hashes, are bound as BLOBs
+  if isinstance(value, str):
+    try:
+      value.decode("utf-8")
+    except UnicodeDecodeError:
+      return buffer(value)
+  return value
+
+
+
+def _translateParams(query, params):
+  """ Convert a query with pymysql "format" placeholders to SQLite "qmark"
+  placeholders. Sequence parameters are expanded to a parenthesized list, as
+  pymysql does for "IN %s" predicates.
+
+  Returns: (query, params) to pass to the SQLite cursor
+  """
+  if params is None:
+    # Like pymysql, leave "%%" alone when there are no parameters
+    return query, ()
+
+  params = list(params)
+  sqliteParams = []
+  parts = []
+  pos = 0
+  for match in re.finditer(r"%[s%]", query):
+    parts.append(query[pos:match.start()])
+    pos = match.end()
+    if match.group() == "%%":
+      parts.append("%")
+      continue
+
+    value = params.pop(0)
+    if isinstance(value, (list, tuple, set)):
+      parts.append("(%s)" % ",".join("?" * len(value)))
+      sqliteParams.extend(_adaptParam(v) for v in value)
+    else:
+      parts.append("?")
+      sqliteParams.append(_adaptParam(value))
+  parts.append(query[pos:])
+
+  assert not params, "Too many parameters for query %r" % (query,)
+  return "".join(parts), sqliteParams
+
+
+
+def _translateCreateTable(dbName, tableName, body, options):
+  """ Translate a MySQL CREATE TABLE statement of ClientJobsDAO.
+
+  Returns: a list of SQLite statements
+  """
+  # Split the column and index definitions on the top level commas
+  definitions = []
+  depth = 0
+  current = []
+  for char in body:
+    if char == "," and depth == 0:
+      definitions.append("".join(current).strip())
+      current = []
+      continue
+    depth += {"(": 1, ")": -1}.get(char, 0)
+    current.append(char)
+  definitions.append("".join(current).strip())
+
+  columns = []
+  constraints = []
+  indexes = []
+  autoIncrementColumn = None
+  for definition in definitions:
+    primaryKey = re.match(r"PRIMARY\s+KEY\s*\((\w+)\)$", definition, re.I)
+    uniqueIndex = re.match(r"UNIQUE\s+INDEX\s*\((.*)\)$", definition, re.I)
+    index = re.match(r"INDEX\s*\((.*)\)$", definition, re.I)
+
+    if primaryKey:
+      constraints.append(("pk", primaryKey.group(1)))
+    elif uniqueIndex:
+      constraints.append(("unique", uniqueIndex.group(1)))
+    elif index:
+      indexes.append(index.group(1))
+    else:
+      (name, columnType) = definition.split(None, 1)
+      if re.search(r"\bAUTO_INCREMENT\b", columnType, re.I):
+        # Only an INTEGER PRIMARY KEY can be auto-incremented by SQLite
+        autoIncrementColumn = name
+        columns.append("%s INTEGER PRIMARY KEY AUTOINCREMENT" % (name,))
+        continue
+      # BINARY columns would get NUMERIC affinity and mangle hashes that look
+      # like numbers
+      columnType = re.sub(r"\bBINARY\(\d+\)", "BLOB", columnType, flags=re.I)
+      columnType = re.sub(r"\bUNSIGNED\b", "", columnType, flags=re.I)
+      columnType = re.sub(r'DEFAULT\s+"([^"]*)"', r"DEFAULT '\1'", columnType,
+                          flags=re.I)
+      columnType = re.sub(r"DEFAULT\s+TRUE\b", "DEFAULT 1", columnType,
+                          flags=re.I)
+      columnType = re.sub(r"DEFAULT\s+FALSE\b", "DEFAULT 0", columnType,
+                          flags=re.I)
+      columns.append("%s %s" % (name, " ".join(columnType.split())))
+
+  for (kind, columnNames) in constraints:
+    if kind == "pk":
+      if columnNames != autoIncrementColumn:
+        columns.append("PRIMARY KEY (%s)" % (columnNames,))
+    else:
+      columns.append("UNIQUE (%s)" % (columnNames,))
+
+  statements = ["CREATE TABLE IF NOT EXISTS %s.%s (%s)" % (
+    dbName, tableName, ", ".join(columns))]
+
+  for columnNames in indexes:
+    indexName = "%s_%s" % (tableName,
+                           "_".join(re.findall(r"\w+", columnNames)))
+    statements.append("CREATE INDEX IF NOT EXISTS %s.%s ON %s (%s)" % (
+      dbName, indexName, tableName, columnNames))
+
+  autoIncrementStart = re.search(r"\bAUTO_INCREMENT\s*=\s*(\d+)", options,
+                                 re.I)
+  if autoIncrementStart and autoIncrementColumn is not None:
+    statements.append(
+      "INSERT INTO %s.sqlite_sequence (name, seq) SELECT '%s', %d "
+      "WHERE NOT EXISTS (SELECT 1 FROM %s.sqlite_sequence WHERE name='%s')" % (
+        dbName, tableName, int(autoIncrementStart.group(1)) - 1, dbName,
+        tableName))
+
+  return statements
+
+
+
+class SQLiteConnection(object):
+  """ A SQLite connection and the state that the MySQL server would keep for
+  it: the attached databases and the connection ID.
+  """
+
+  def __init__(self, dataDir, timeout):
+    """
+    dataDir:    directory of the database files
+    timeout:    seconds to wait for a lock held by another connection
+    """
+    self._dataDir = dataDir
+    self._columnDefaults = {}
+
+    self.conn = sqlite3.connect(
+      self._getPath(_CONNECTIONS_DB_NAME), timeout=timeout,
+      detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+      check_same_thread=False)
+    self.conn.text_factory = _decodeText
+    self.conn.execute("PRAGMA journal_mode=WAL")
+
+    # MySQL identifies each connection; workers use it to claim models
+    self.conn.execute("CREATE TABLE IF NOT EXISTS connection_ids "
+                      "(id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    self.connectionID = self.conn.execute(
+      "INSERT INTO connection_ids DEFAULT VALUES").lastrowid
+
+    self.conn.create_function("CONNECTION_ID", 0, lambda: self.connectionID)
+    self.conn.create_function("TIMESTAMPDIFF", 3, _timestampDiff)
+
+    self._attached = set()
+
+    # True between a START TRANSACTION and the first statement executed in the
+    # transaction
+    self.transactionIsEmpty = False
+
+
+  def close(self):
+    self.conn.close()
+    self.conn = None
+
+
+  def _getPath(self, dbName):
+    return os.path.join(self._dataDir, dbName + _DB_FILE_EXTENSION)
+
+
+  def attach(self, dbName, create):
+    """ Attach a database to this connection under its own name.
+
+    dbName:   name of the database
+    create:   whether to create the database file if it doesn't exist
+
+    retval:   True if the database is attached
+    """
+    if dbName in self._attached:
+      return True
+    path = self._getPath(dbName)
+    if not create and not os.path.isfile(path):
+      return False
+    self.conn.execute("ATTACH DATABASE ? AS %s" % (dbName,), (path,))
+    self.conn.execute("PRAGMA %s.journal_mode=WAL" % (dbName,))
+    self._attached.add(dbName)
+    return True
+
+
+  def drop(self, dbName):
+    """ Delete a database, like MySQL's DROP DATABASE IF EXISTS. """
+    if dbName in self._attached:
+      self.conn.execute("DETACH DATABASE %s" % (dbName,))
+      self._attached.remove(dbName)
+    self._columnDefaults = dict(
+      (key, value) for (key, value) in self._columnDefaults.iteritems()
+      if key[0] != dbName)
+    path = self._getPath(dbName)
+    for suffix in ("", "-wal", "-shm"):
+      if os.path.exists(path + suffix):
+        os.remove(path + suffix)
+
+
+  def getColumnDefault(self, dbName, tableName, columnName):
+    """ Return the SQL expression of the default value of a column. """
+    key = (dbName, tableName)
+    if key not in self._columnDefaults:
+      self.attach(dbName, create=False)
+      rows = self.conn.execute(
+        "PRAGMA %s.table_info(%s)" % (dbName, tableName)).fetchall()
+      self._columnDefaults[key] = dict((row[1], row[4]) for row in rows)
+    default = self._columnDefaults[key][columnName]
+    return "NULL" if default is None else default
+
+
+
+class SQLiteCursor(object):
+  """ Cursor with the behavior of a pymysql cursor, for the SQL emitted by
+  ClientJobsDAO: execute() returns the number of affected or selected rows.
+  """
+
+  def __init__(self, connection):
+    """
+    connection:   the SQLiteConnection to execute statements on
+    """
+    self._connection = connection
+    self._rows = []
+    self.rowcount = -1
+
+
+  def close(self):
+    self._rows = []
+    self._connection = None
+
+
+  def fetchall(self):
+    rows = self._rows
+    self._rows = []
+    return tuple(rows)
+
+
+  def fetchone(self):
+    if not self._rows:
+      return None
+    return self._rows.pop(0)
+
+
+  def execute(self, query, params=None):
+    """ Execute a statement in the MySQL dialect of ClientJobsDAO.
+
+    retval:   the number of rows selected or affected
+    """
+    self._rows = []
+    connection = self._connection
+
+    match = _CREATE_DATABASE_RE.match(query)
+    if match:
+      connection.attach(match.group(1), create=True)
+      return self._setRows([])
+
+    match = _DROP_DATABASE_RE.match(query)
+    if match:
+      connection.drop(match.group(1))
+      return self._setRows([])
+
+    match = _SHOW_TABLES_RE.match(query)
+    if match:
+      dbName = match.group(1)
+      if not connection.attach(dbName, create=False):
+        return self._setRows([])
+      return self._execute(
+        "SELECT name FROM %s.sqlite_master WHERE type='table' "
+        "AND name NOT LIKE 'sqlite_%%'" % (dbName,), ())
+
+    match = _DESCRIBE_RE.match(query)
+    if match:
+      (dbName, tableName) = match.groups()
+      connection.attach(dbName, create=False)
+      rows = connection.conn.execute(
+        "PRAGMA %s.table_info(%s)" % (dbName, tableName)).fetchall()
+      # Same columns as MySQL: Field, Type, Null, Key, Default, Extra
+      return self._setRows([(row[1], row[2], "NO" if row[3] else "YES",
+                             "PRI" if row[5] else "", row[4], "")
+                            for row in rows])
+
+    if _START_TRANSACTION_RE.match(query):
+      # Take the write lock right away, like MySQL's row locks taken by the
+      # first UPDATE of the transaction
+      connection.conn.execute("BEGIN IMMEDIATE")
+      connection.transactionIsEmpty = True
+      return self._setRows([])
+
+    match = _CREATE_TABLE_RE.match(query)
+    if match:
+      (dbName, tableName, body, options) = match.groups()
+      connection.attach(dbName, create=True)
+      for statement in _translateCreateTable(dbName, tableName, body, options):
+        connection.conn.execute(statement)
+      return self._setRows([])
+
+    (query, params) = _translateParams(query, params)
+    return self._execute(self._translateQuery(query), params)
+
+
+  def _translateQuery(self, query):
+    for (pattern, replacement) in _DIALECT_REPLACEMENTS:
+      query = pattern.sub(replacement, query)
+
+    # SQLite doesn't accept "<database>.<table>.*" in a select list
+    query = _QUALIFIED_STAR_RE.sub(r"\1.*", query)
+
+    match = _UPDATE_TABLE_RE.match(query)
+    if match:
+      (dbName, tableName) = match.groups()
+      # The updates of ClientJobsDAO only limit rows that are unique anyway
+      query = _UPDATE_LIMIT_RE.sub("", query)
+      query = _ASSIGN_DEFAULT_RE.sub(
+        lambda m: "%s=%s" % (m.group(1), self._connection.getColumnDefault(
+          dbName, tableName, m.group(1))),
+        query)
+
+    return query
+
+
+  def _execute(self, query, params):
+    connection = self._connection
+    try:
+      cursor = connection.conn.execute(query, params)
+    except sqlite3.OperationalError as e:
+      # Another connection may have created the database since this one last
+      # looked for it
+      match = _NO_SUCH_TABLE_RE.search(str(e))
+      if not match:
+        raise
+      if connection.transactionIsEmpty:
+        # Databases can't be attached in a transaction; nothing was executed
+        # in this one yet, so start it again once attached
+        connection.conn.execute("ROLLBACK")
+        attached = connection.attach(match.group(1), create=False)
+        connection.conn.execute("BEGIN IMMEDIATE")
+      else:
+        attached = connection.attach(match.group(1), create=False)
+      if not attached:
+        raise
+      cursor = connection.conn.execute(query, params)
+    except sqlite3.IntegrityError as e:
+      # ClientJobsDAO recognizes unique key violations by MySQL's message
+      if "UNIQUE constraint failed" not in str(e):
+        raise
+      raise sqlite3.IntegrityError("Duplicate entry; %s" % (e,))
+    finally:
+      connection.transactionIsEmpty = False
+
+    if cursor.description is None:
+      self.rowcount = cursor.rowcount
+      return self.rowcount
+
+    rows = [tuple(str(value) if isinstance(value, buffer) else value
+                  for value in row)
+            for row in cursor.fetchall()]
+    return self._setRows(rows)
+
+
+  def _setRows(self, rows):
+    self._rows = list(rows)
+    self.rowcount = len(self._rows)
+    return self.rowcount
+
+
+
+class SQLiteConnectionPolicy(DatabaseConnectionPolicyIface):
+  """ This connection policy maintains a pool of SQLite connections that are
+  doled out as needed for each transaction, like PooledConnectionPolicy does
+  for MySQL. NOTE: The connections are NOT shared concurrently between
+  threads.
+  """
+
+
+  def __init__(self, dataDir=None, timeout=None):
+    """
+    dataDir:    directory of the database files; defaults to the
+                  nupic.cluster.database.sqlite.dir setting
+    timeout:    seconds to wait for a lock held by another process; defaults
+                  to the nupic.cluster.database.sqlite.timeout setting
+    """
+    self._logger = _getLogger(self.__class__)
+
+    if dataDir is None:
+      dataDir = Configuration.get("nupic.cluster.database.sqlite.dir")
+    if timeout is None:
+      timeout = Configuration.getFloat("nupic.cluster.database.sqlite.timeout")
+
+    self._dataDir = os.path.abspath(os.path.expanduser(dataDir))
+    if not os.path.isdir(self._dataDir):
+      os.makedirs(self._dataDir)
+    self._timeout = timeout
+
+    self._lock = threading.Lock()
+    self._idleConnections = []
+    self._opened = True
+
+    self._logger.info("Created %s in %r", self.__class__.__name__,
+                      self._dataDir)
+
+
+  def close(self):
+    """ Close the policy instance and its idle connections. """
+    self._logger.info("Closing")
+
+    if not self._opened:
+      self._logger.warning(
+        "close() called, but connection policy was alredy closed")
+      return
+
+    with self._lock:
+      for connection in self._idleConnections:
+        connection.close()
+      self._idleConnections = []
+      self._opened = False
+
+
+  def acquireConnection(self):
+    """ Get a connection from the pool.
+
+    Parameters:
+    ----------------------------------------------------------------
+    retval:       A ConnectionWrapper instance. NOTE: Caller
+                    is responsible for calling the  ConnectionWrapper
+                    instance's release() method or use it in a context manager
+                    expression (with ... as:) to release resources.
+    """
+    self._logger.debug("Acquiring connection")
+
+    with self._lock:
+      connection = (self._idleConnections.pop() if self._idleConnections
+                    else None)
+    if connection is None:
+      connection = SQLiteConnection(self._dataDir, self._timeout)
+
+    return ConnectionWrapper(dbConn=connection,
+                             cursor=SQLiteCursor(connection),
+                             releaser=self._releaseConnection,
+                             logger=self._logger)
+
+
+  def _releaseConnection(self, dbConn, cursor):
+    """ Release database connection and cursor; passed as a callback to
+    ConnectionWrapper
+    """
+    self._logger.debug("Releasing connection")
+
+    cursor.close()
+
+    with self._lock:
+      if self._opened:
+        self._idleConnections.append(dbConn)
+        return
+    dbConn.close()
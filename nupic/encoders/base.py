@@ -311,6 +311,24 @@ class Encoder(object):
     return tuple(retVals)
 
 
+  def encodeAll(self, inputData, output):
+    """
+    Encodes inputData into output and returns its scalars and encoded values,
+    i.e. does the work of encodeIntoArray(), getScalars() and
+    getEncodedValues() in one call. Encoders with sub-encoders override this
+    to visit each sub-field only once.
+
+    @param inputData The data from the source. This is typically a object with
+                 members
+    @param output numpy array to write the encoding into
+
+    @returns tuple (scalars, encodedValues), as returned by getScalars() and
+             getEncodedValues()
+    """
+    self.encodeIntoArray(inputData, output)
+    return (self.getScalars(inputData), self.getEncodedValues(inputData))
+
+
   def getBucketIndices(self, inputData):
     """
     Returns an array containing the sub-field bucket indices for
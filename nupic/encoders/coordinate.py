@@ -20,7 +20,6 @@
 # ----------------------------------------------------------------------
 
 import hashlib
-import itertools
 
 import numpy
 from nupic.bindings.math import Random
@@ -51,8 +50,15 @@ class CoordinateEncoder(Encoder):
   deterministically map it to one of the bits in the SDR. Make this bit active.
   5. This results in a final SDR with exactly W bits active
   (barring chance hash collisions).
+
+  The order and bit of the most recently used coordinates are kept in an LRU
+  cache of `cacheSize` entries, so that encoding nearby positions one after
+  another only hashes the coordinates that weren't in the previous areas.
   """
 
+  # Maximum number of coordinates whose order and bit are cached
+  cacheSize = 2 ** 16
+
   def __init__(self,
                w=21,
                n=1000,
@@ -81,6 +87,29 @@ class CoordinateEncoder(Encoder):
       name = "[%s:%s]" % (self.n, self.w)
     self.name = name
 
+    self._initCache()
+
+
+  def _initCache(self):
+    """
+    Creates the empty cache that maps coordinate tuples to [order, bit, last
+    use] (bit is None until the coordinate wins).
+    """
+    self._coordinateCache = dict()
+    self._cacheClock = 0
+
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state.pop("_coordinateCache", None)
+    state.pop("_cacheClock", None)
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._initCache()
+
 
   def getWidth(self):
     """See `nupic.encoders.base.Encoder` for more information."""
@@ -107,13 +136,55 @@ class CoordinateEncoder(Encoder):
     """
     (coordinate, radius) = inputData
     neighbors = self._neighbors(coordinate, radius)
-    winners = self._topWCoordinates(neighbors, self.w)
 
-    bitFn = lambda coordinate: self._bitForCoordinate(coordinate, self.n)
-    indices = numpy.array([bitFn(w) for w in winners])
+    # Same selection as `_topWCoordinates` followed by `_bitForCoordinate`,
+    # with the order and bit of each coordinate looked up in the cache
+    keys = [tuple(neighbor) for neighbor in neighbors.tolist()]
+    entries = self._cacheEntries(keys)
+    orders = numpy.array([entry[0] for entry in entries])
+    winners = numpy.argsort(orders)[-self.w:]
+
+    indices = []
+    for i in winners:
+      entry = entries[i]
+      if entry[1] is None:
+        entry[1] = self._bitForCoordinate(keys[i], self.n)
+      indices.append(entry[1])
 
     output[:] = 0
-    output[indices] = 1
+    output[numpy.array(indices)] = 1
+
+
+  def _cacheEntries(self, keys):
+    """
+    Returns the cache entries of coordinates, computing the order of the
+    coordinates that are not cached yet. When the cache grows beyond
+    `cacheSize`, the least recently used quarter of it is evicted.
+
+    @param keys (list) Coordinates, as tuples
+
+    @return (list) [order, bit, last use] of each coordinate
+    """
+    cache = self._coordinateCache
+    self._cacheClock += 1
+    clock = self._cacheClock
+
+    entries = [cache.get(key) for key in keys]
+    for (i, entry) in enumerate(entries):
+      if entry is None:
+        entries[i] = cache[keys[i]] = [self._orderForCoordinate(keys[i]), None,
+                                       clock]
+      else:
+        entry[2] = clock
+
+    if len(cache) > self.cacheSize:
+      lastUses = sorted(entry[2] for entry in cache.itervalues())
+      threshold = lastUses[len(cache) - self.cacheSize * 3 // 4]
+      for key in [key for (key, entry) in cache.iteritems()
+                  if entry[2] < threshold]:
+        del cache[key]
+
+    return entries
 
 
   @staticmethod
@@ -127,8 +198,15 @@ class CoordinateEncoder(Encoder):
 
     @return (numpy.array) List of coordinates
     """
-    ranges = [range(n-radius, n+radius+1) for n in coordinate.tolist()]
-    return numpy.array(list(itertools.product(*ranges)))
+    coordinate = numpy.asarray(coordinate)
+    radius = int(radius)
+    numDimensions = len(coordinate)
+
+    # Offsets in the same order as itertools.product of the ranges of each
+    # dimension
+    offsets = numpy.indices((2 * radius + 1,) * numDimensions)
+    offsets = offsets.reshape(numDimensions, -1).T - radius
+    return coordinate + offsets
 
 
   @classmethod
@@ -198,6 +276,7 @@ class CoordinateEncoder(Encoder):
     encoder.n = proto.n
     encoder.verbosity = proto.verbosity
     encoder.name = proto.name
+    encoder._initCache()
     return encoder
 
 
@@ -63,10 +63,17 @@ class DateEncoder(Encoder):
 
   forced (default True) : if True, skip checks for parameters' settings; see encoders/scalar.py for details
 
-
+  The encodings of the most recently used sub-field values (day of year, day
+  of week, time of day, ...) are cached (see cacheSize), so encoding
+  regularly spaced timestamps mostly copies cached bit patterns. The sub-field
+  values of the last input are kept as well, so that encoding a timestamp and
+  getting its scalars or encoded values only decomposes it once.
 
   """
 
+  # Maximum number of sub-field values whose encoding is cached
+  cacheSize = 2 ** 14
+
 
   def __init__(self, season=0, dayOfWeek=0, weekend=0, holiday=0, timeOfDay=0, customDays=0,
                 name = '', forced=True):
@@ -208,6 +215,33 @@ class DateEncoder(Encoder):
       self.description.append(("time of day", self.timeOfDayOffset))
       self.encoders.append(("time of day", self.timeOfDayEncoder, self.timeOfDayOffset))
 
+    self._initCache()
+
+
+  def _initCache(self):
+    """
+    Creates the empty cache that maps (sub-field index, value) to
+    [encoding of the sub-field, last use], and forgets the values of the last
+    input.
+    """
+    self._encodingCache = dict()
+    self._cacheClock = 0
+    self._lastInput = None
+    self._lastValues = None
+
+
+  def __getstate__(self):
+    # The caches are rebuilt on demand
+    state = self.__dict__.copy()
+    for name in ("_encodingCache", "_cacheClock", "_lastInput", "_lastValues"):
+      state.pop(name, None)
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._initCache()
+
 
   def getWidth(self):
     return self.width
@@ -256,6 +290,25 @@ class DateEncoder(Encoder):
       return numpy.array([None])
 
     assert isinstance(input, datetime.datetime)
+    return list(self._getValues(input))
+
+
+  def _getValues(self, input):
+    """
+    Returns the sub-field values of a datetime as a tuple, reusing those of
+    the last input when called with the same object again.
+    """
+    if input is not self._lastInput:
+      self._lastValues = tuple(self._computeValues(input))
+      self._lastInput = input
+    return self._lastValues
+
+
+  def _computeValues(self, input):
+    """
+    Computes the sub-field values of a datetime, in the same order as the
+    sub-encoders.
+    """
     values = []
 
     # -------------------------------------------------------------------------
@@ -339,6 +392,13 @@ class DateEncoder(Encoder):
     return numpy.array(self.getEncodedValues(input))
 
 
+  def encodeAll(self, input, output):
+    """ See method description in base.py """
+    self.encodeIntoArray(input, output)
+    encodedValues = self.getEncodedValues(input)
+    return (numpy.array(encodedValues), encodedValues)
+
+
   def getBucketIndices(self, input):
     """ See method description in base.py """
 
@@ -371,11 +431,42 @@ class DateEncoder(Encoder):
             type(input), str(input)))
 
       # Get the scalar values for each sub-field
-      scalars = self.getScalars(input)
-      # Encoder each sub-field
+      values = self._getValues(input)
+      scalars = None
+
+      cache = self._encodingCache
+      self._cacheClock += 1
+      clock = self._cacheClock
+
+      # Encoder each sub-field, or copy its cached encoding
       for i in xrange(len(self.encoders)):
         (name, encoder, offset) = self.encoders[i]
-        encoder.encodeIntoArray(scalars[i], output[offset:])
+        key = (i, values[i])
+        entry = cache.get(key)
+        if entry is None:
+          if scalars is None:
+            scalars = numpy.array(values)
+          encoder.encodeIntoArray(scalars[i], output[offset:])
+          cache[key] = [output[offset:offset + encoder.getWidth()].copy(),
+                        clock]
+        else:
+          output[offset:offset + len(entry[0])] = entry[0]
+          entry[1] = clock
+
+      if len(cache) > self.cacheSize:
+        self._evictCache()
+
+
+  def _evictCache(self):
+    """
+    Evicts the least recently used quarter of the encoding cache.
+    """
+    cache = self._encodingCache
+    lastUses = sorted(entry[1] for entry in cache.itervalues())
+    threshold = lastUses[len(cache) - self.cacheSize * 3 // 4]
+    for key in [key for (key, entry) in cache.iteritems()
+                if entry[1] < threshold]:
+      del cache[key]
 
 
   def getDescription(self):
@@ -410,6 +501,8 @@ class DateEncoder(Encoder):
     addEncoder("holidayEncoder", "holidayOffset")
     addEncoder("timeOfDayEncoder", "timeOfDayOffset")
 
+    encoder._initCache()
+
     return encoder
 
 
@@ -20,8 +20,9 @@
 # ----------------------------------------------------------------------
 
 import capnp
+import numpy
 
-from nupic.encoders.base import Encoder
+from nupic.encoders.base import Encoder, _isSequence
 from nupic.encoders.scalar import ScalarEncoder
 from nupic.encoders.adaptivescalar import AdaptiveScalarEncoder
 from nupic.encoders.date import DateEncoder
@@ -100,6 +101,27 @@ class MultiEncoder(Encoder):
         encoder.encodeIntoArray(self._getInputValue(obj, name), output[offset:])
 
 
+  def encodeAll(self, obj, output):
+    """ See method description in base.py
+
+    Each field is looked up, encoded and converted to scalars and encoded
+    values in a single pass over the sub-encoders.
+    """
+    scalars = [numpy.array([])]
+    encodedValues = []
+    for name, encoder, offset in self.encoders:
+      (fieldScalars, fieldValues) = encoder.encodeAll(
+        self._getInputValue(obj, name), output[offset:])
+      scalars.append(fieldScalars)
+      if _isSequence(fieldValues):
+        encodedValues.extend(fieldValues)
+      else:
+        encodedValues.append(fieldValues)
+
+    # Each field's scalars are a 1-D array already
+    return (numpy.concatenate(scalars), tuple(encodedValues))
+
+
   def getDescription(self):
     return self.description
 
@@ -161,6 +161,13 @@ class RandomDistributedScalarEncoder(Encoder):
       self.dump()
 
 
+  def __getstate__(self):
+    # The occupancy matrix is derived from the bucket map
+    state = self.__dict__.copy()
+    state.pop("_bucketOccupancy", None)
+    return state
+
+
   def __setstate__(self, state):
     self.__dict__.update(state)
 
@@ -170,6 +177,8 @@ class RandomDistributedScalarEncoder(Encoder):
     if isinstance(randomState, numpy.random.mtrand.RandomState):
       self.random = NupicRandom(randomState.randint(sys.maxint))
 
+    self._initializeBucketOccupancy()
+
 
   def _seed(self, seed=-1):
     """
@@ -252,33 +261,50 @@ class RandomDistributedScalarEncoder(Encoder):
       output[self.mapBucketIndexToNonZeroBits(bucketIdx)] = 1
 
 
+  def precomputeBuckets(self, minValue, maxValue):
+    """
+    Create the buckets for all values in [minValue, maxValue], so that
+    encoding values within that range later on doesn't need to create any
+    buckets. If the offset is not set yet, it is set to the middle of the
+    range.
+    """
+    if minValue > maxValue:
+      raise ValueError("minValue must not be greater than maxValue")
+
+    if self._offset is None:
+      self._offset = (minValue + maxValue) / 2.0
+
+    for x in (minValue, maxValue):
+      self.mapBucketIndexToNonZeroBits(self.getBucketIndices(x)[0])
+
+
   def _createBucket(self, index):
     """
-    Create the given bucket index. Recursively create as many in-between
-    bucket indices as necessary.
+    Create the given bucket index, along with as many in-between bucket
+    indices as necessary.
     """
     if index < self.minIndex:
-      if index == self.minIndex - 1:
-        # Create a new representation that has exactly w-1 overlapping bits
-        # as the min representation
-        self.bucketMap[index] = self._newRepresentation(self.minIndex,
-                                                        index)
-        self.minIndex = index
-      else:
-        # Recursively create all the indices above and then this index
-        self._createBucket(index+1)
-        self._createBucket(index)
+      # Create all the indices from the min representation down to this
+      # index, each with exactly w-1 overlapping bits as the one above
+      for newIndex in xrange(self.minIndex - 1, index - 1, -1):
+        self._addBucket(newIndex,
+                        self._newRepresentation(self.minIndex, newIndex))
+        self.minIndex = newIndex
     else:
-      if index == self.maxIndex + 1:
-        # Create a new representation that has exactly w-1 overlapping bits
-        # as the max representation
-        self.bucketMap[index] = self._newRepresentation(self.maxIndex,
-                                                        index)
-        self.maxIndex = index
-      else:
-        # Recursively create all the indices below and then this index
-        self._createBucket(index-1)
-        self._createBucket(index)
+      # Create all the indices from the max representation up to this
+      # index, each with exactly w-1 overlapping bits as the one below
+      for newIndex in xrange(self.maxIndex + 1, index + 1):
+        self._addBucket(newIndex,
+                        self._newRepresentation(self.maxIndex, newIndex))
+        self.maxIndex = newIndex
+
+
+  def _addBucket(self, index, representation):
+    """
+    Store the representation of a bucket index.
+    """
+    self.bucketMap[index] = representation
+    self._bucketOccupancy[index, representation] = True
 
 
   def _newRepresentation(self, index, newIndex):
@@ -295,17 +321,57 @@ class RandomDistributedScalarEncoder(Encoder):
     ri = newIndex % self.w
 
     # Now we choose a bit such that the overlap rules are satisfied.
+    newBitOK = self._newBitsOK(index, newIndex, ri)
+    if not newBitOK.any():
+      raise RuntimeError("No bit satisfies the overlap rules for bucket %d"
+                         % newIndex)
+
     newBit = self.random.getUInt32(self.n)
-    newRepresentation[ri] = newBit
-    while newBit in self.bucketMap[index] or \
-          not self._newRepresentationOK(newRepresentation, newIndex):
+    while not newBitOK[newBit]:
       self.numTries += 1
       newBit = self.random.getUInt32(self.n)
-      newRepresentation[ri] = newBit
+    newRepresentation[ri] = newBit
 
     return newRepresentation
 
 
+  def _newBitsOK(self, index, newIndex, ri):
+    """
+    Return a boolean array telling for each bit whether replacing bit ri of
+    the representation at index by it yields a representation for newIndex
+    that satisfies all our overlap rules, i.e. for which _newRepresentationOK
+    holds.
+
+    The overlaps of the representation without bit ri with every bucket are
+    computed once from the occupancy matrix. Each existing bucket then either
+    requires the new bit, forbids it, or doesn't care, and checking a bit only
+    takes looking up its column in the buckets that care.
+    """
+    representation = self.bucketMap[index]
+    occupancy = self._bucketOccupancy[self.minIndex:self.maxIndex+1]
+    overlaps = (occupancy[:, representation].sum(axis=1) -
+                occupancy[:, representation[ri]])
+
+    distances = numpy.abs(numpy.arange(self.minIndex, self.maxIndex+1) -
+                          newIndex)
+    near = distances < self.w
+    requiredOverlaps = self.w - distances
+
+    # Near buckets must overlap by exactly w - distance bits, the others by at
+    # most maxOverlap bits
+    requireBit = near & (overlaps == requiredOverlaps - 1)
+    forbidBit = ((near & (overlaps == requiredOverlaps)) |
+                 (~near & (overlaps == self._maxOverlap)))
+    impossible = ((near & ~requireBit & ~forbidBit) |
+                  (~near & (overlaps > self._maxOverlap)))
+    if impossible.any():
+      return numpy.zeros(self.n, dtype=bool)
+
+    return (occupancy[requireBit].all(axis=0) &
+            ~occupancy[forbidBit].any(axis=0) &
+            ~self._bucketOccupancy[index])
+
+
   def _newRepresentationOK(self, newRep, newIndex):
     """
     Return True if this new candidate representation satisfies all our overlap
@@ -437,11 +503,23 @@ class RandomDistributedScalarEncoder(Encoder):
       return r
 
     self.bucketMap[self.minIndex] = _permutation(self.n)[0:self.w]
+    self._initializeBucketOccupancy()
 
     # How often we need to retry when generating valid encodings
     self.numTries = 0
 
 
+  def _initializeBucketOccupancy(self):
+    """
+    Build the occupancy matrix from the bucket map. Row i tells which bits are
+    set in the representation of bucket index i, so column j lists the buckets
+    that contain bit j.
+    """
+    self._bucketOccupancy = numpy.zeros((self._maxBuckets, self.n), dtype=bool)
+    for (index, representation) in self.bucketMap.iteritems():
+      self._bucketOccupancy[index, representation] = True
+
+
   def dump(self):
     print "RandomDistributedScalarEncoder:"
     print "  minIndex:   %d" % self.minIndex
@@ -475,6 +553,7 @@ class RandomDistributedScalarEncoder(Encoder):
     encoder._maxBuckets = INITIAL_BUCKETS
     encoder.bucketMap = {x.key: numpy.array(x.value, dtype=numpy.uint32)
                          for x in proto.bucketMap}
+    encoder._initializeBucketOccupancy()
 
     return encoder
 
@@ -20,6 +20,7 @@
 # ----------------------------------------------------------------------
 
 import random
+import sys
 
 import numpy
 from nupic.data.fieldmeta import FieldMetaType
@@ -44,17 +45,21 @@ class SDRCategoryEncoder(Encoder):
 
 
   def __init__(self, n, w, categoryList = None, name="category", verbosity=0,
-               encoderSeed=1, forced=False):
+               encoderSeed=1, forced=False, compact=False):
     """
     n is  total bits in output
     w is the number of bits that are turned on for each rep
     categoryList is a list of strings that define the categories.
     If "none" then categories will automatically be added as they are encountered.
     forced (default False) : if True, skip checks for parameters' settings; see encoders/scalar.py for details
+    compact (default False) : if True, store each category as the sorted
+        indices of its w on bits instead of a dense row of n bytes, which
+        saves memory when there are many categories.
     """
 
     self.n = n
     self.w = w
+    self._compact = compact
 
     self._learningEnabled = True
 
@@ -83,6 +88,10 @@ class SDRCategoryEncoder(Encoder):
     self.ncategories = 0
     self.categories = list()
     self.sdrs = None
+    self._sdrIndices = None
+
+    # Signatures of all the SDRs, to check new ones for uniqueness
+    self._sdrSignatures = set()
 
     # Always include an 'unknown' category for
     # edge cases
@@ -130,6 +139,12 @@ class SDRCategoryEncoder(Encoder):
     if isinstance(randomState, numpy.random.mtrand.RandomState):
       self.random = NupicRandom(randomState.randint(sys.maxint))
 
+    if "_compact" not in state:
+      self._compact = False
+      self._sdrIndices = None
+    if "_sdrSignatures" not in state:
+      self._initSignatures()
+
 
   def _seed(self, seed=-1):
     """
@@ -155,7 +170,18 @@ class SDRCategoryEncoder(Encoder):
       raise RuntimeError("Attempt to add add encoder category '%s' "
                          "that already exists" % category)
 
-    if self.sdrs is None:
+    if self._compact:
+      if self._sdrIndices is None:
+        assert self.ncategories == 0
+        # Initial allocation -- 16 rows
+        self._sdrIndices = numpy.zeros((16, self.w), dtype=numpy.uint32)
+      elif self.ncategories > self._sdrIndices.shape[0] - 2:
+        # Preallocated rows are used up. Double our size
+        currentMax = self._sdrIndices.shape[0]
+        newIndices = numpy.zeros((currentMax * 2, self.w), dtype=numpy.uint32)
+        newIndices[0:currentMax] = self._sdrIndices[0:currentMax]
+        self._sdrIndices = newIndices
+    elif self.sdrs is None:
       assert self.ncategories == 0
       assert len(self.categoryToIndex) == 0
       # Initial allocation -- 16 rows
@@ -167,36 +193,49 @@ class SDRCategoryEncoder(Encoder):
       newsdrs[0:currentMax] = self.sdrs[0:currentMax]
       self.sdrs = newsdrs
 
-    newrep = self._newRep()
-    self.sdrs[self.ncategories] = newrep
+    oneBits = self._newRep()
+    if self._compact:
+      self._sdrIndices[self.ncategories] = oneBits
+    else:
+      self.sdrs[self.ncategories, oneBits] = 1
+      # The top down mapping is rebuilt from scratch, while in compact mode
+      # rows for new categories are appended to it
+      self._topDownMappingM = None
+    self._sdrSignatures.add(oneBits.tostring())
     self.categories.append(category)
     self.categoryToIndex[category] = self.ncategories
     self.ncategories += 1
-    self._topDownMappingM = None
 
 
   def _newRep(self):
-    """Generate a new and unique representation. Returns a numpy array
-    of shape (n,). """
+    """Generate a new and unique representation. Returns the sorted indices of
+    its w on bits, as a numpy array. """
     maxAttempts = 1000
 
     for _ in xrange(maxAttempts):
-      foundUnique = True
       population = numpy.arange(self.n, dtype=numpy.uint32)
       choices = numpy.arange(self.w, dtype=numpy.uint32)
-      oneBits = sorted(self.random.sample(population, choices))
-      sdr =  numpy.zeros(self.n, dtype='uint8')
-      sdr[oneBits] = 1
-      for i in xrange(self.ncategories):
-        if (sdr == self.sdrs[i]).all():
-          foundUnique = False
-          break
-      if foundUnique:
-        break;
-    if not foundUnique:
-      raise RuntimeError("Error, could not find unique pattern %d after "
-                         "%d attempts" % (self.ncategories, maxAttempts))
-    return sdr
+      oneBits = numpy.array(sorted(self.random.sample(population, choices)),
+                            dtype=numpy.uint32)
+      if oneBits.tostring() not in self._sdrSignatures:
+        return oneBits
+
+    raise RuntimeError("Error, could not find unique pattern %d after "
+                       "%d attempts" % (self.ncategories, maxAttempts))
+
+
+  def _getOneBits(self, index):
+    """Return the sorted indices of the on bits of the SDR of a category. """
+    if self._compact:
+      return self._sdrIndices[index]
+    else:
+      return numpy.flatnonzero(self.sdrs[index]).astype(numpy.uint32)
+
+
+  def _initSignatures(self):
+    """Build the set of SDR signatures from the stored SDRs. """
+    self._sdrSignatures = set(self._getOneBits(i).tostring()
+                              for i in xrange(self.ncategories))
 
 
   def getWidth(self):
@@ -238,7 +277,11 @@ class SDRCategoryEncoder(Encoder):
       index = 0
     else:
       index = self.getBucketIndices(input)[0]
-      output[0:self.n] = self.sdrs[index,:]
+      if self._compact:
+        output[0:self.n] = 0
+        output[self._sdrIndices[index]] = 1
+      else:
+        output[0:self.n] = self.sdrs[index,:]
 
     if self.verbosity >= 2:
       print "input:", input, "index:", index, "output:", output
@@ -254,7 +297,11 @@ class SDRCategoryEncoder(Encoder):
     resultString =  ""
     resultRanges = []
 
-    overlaps =  (self.sdrs * encoded[0:self.n]).sum(axis=1)
+    if self._compact:
+      overlaps = numpy.asarray(encoded[0:self.n])[
+        self._sdrIndices[0:self.ncategories]].sum(axis=1)
+    else:
+      overlaps =  (self.sdrs * encoded[0:self.n]).sum(axis=1)
 
     if self.verbosity >= 2:
       print "Overlaps for decoding:"
@@ -283,6 +330,17 @@ class SDRCategoryEncoder(Encoder):
     category.
     """
 
+    if self._compact:
+      # Append the rows of the categories added since the last call
+      if self._topDownMappingM is None:
+        self._topDownMappingM = SM32(0, self.n)
+
+      values = numpy.ones(self.w, dtype=GetNTAReal())
+      for i in xrange(self._topDownMappingM.nRows(), self.ncategories):
+        self._topDownMappingM.addRowNZ(self._sdrIndices[i], values)
+
+      return self._topDownMappingM
+
     # -------------------------------------------------------------------------
     # Do we need to build up our reverse mapping table?
     if self._topDownMappingM is None:
@@ -369,7 +427,15 @@ class SDRCategoryEncoder(Encoder):
     encoder.name = proto.name
     encoder.description = [(proto.name, 0)]
     encoder.categories = list(proto.categories)
-    encoder.sdrs = numpy.array(proto.sdrs, dtype=numpy.uint8)
+    encoder._compact = proto.compact
+    if encoder._compact:
+      encoder.sdrs = None
+      encoder._sdrIndices = numpy.array([numpy.flatnonzero(row)
+                                         for row in proto.sdrs],
+                                        dtype=numpy.uint32)
+    else:
+      encoder.sdrs = numpy.array(proto.sdrs, dtype=numpy.uint8)
+      encoder._sdrIndices = None
 
     encoder.categoryToIndex = {category:index
                                for index, category
@@ -377,6 +443,10 @@ class SDRCategoryEncoder(Encoder):
     encoder.ncategories = len(encoder.categories)
     encoder._learningEnabled = False
     encoder._initOverlap()
+    encoder._initSignatures()
+    encoder.encoders = None
+    encoder._topDownMappingM = None
+    encoder._topDownValues = None
 
     return encoder
 
@@ -388,4 +458,13 @@ class SDRCategoryEncoder(Encoder):
     proto.verbosity = self.verbosity
     proto.name = self.name
     proto.categories = self.categories
-    proto.sdrs = self.sdrs.tolist()
+    proto.compact = self._compact
+    if self._compact:
+      # Same format as the dense rows, built one category at a time
+      sdrsProto = proto.init("sdrs", self.ncategories)
+      for i in xrange(self.ncategories):
+        rowProto = sdrsProto.init(i, self.n)
+        for bit in self._sdrIndices[i]:
+          rowProto[int(bit)] = 1
+    else:
+      proto.sdrs = self.sdrs.tolist()
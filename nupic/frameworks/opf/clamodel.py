@@ -44,6 +44,9 @@ from nupic.data.fieldmeta import FieldMetaSpecial, FieldMetaInfo
 from nupic.encoders import MultiEncoder, DeltaEncoder
 from nupic.engine import Network
 from nupic.support.fshelpers import makeDirectoryFromAbsolutePath
+from nupic.support.serializationutils import (findMappableArrays,
+                                              loadMappedArray,
+                                              resolveAttrPath)
 from nupic.frameworks.opf.opfutils import (InferenceType,
                       InferenceElement,
                       SensorInput,
@@ -122,7 +125,8 @@ class CLAModel(Model):
       clParams={},
       anomalyParams={},
       minLikelihoodThreshold=DEFAULT_LIKELIHOOD_THRESHOLD,
-      maxPredictionsPerStep=DEFAULT_MAX_PREDICTIONS_PER_STEP):
+      maxPredictionsPerStep=DEFAULT_MAX_PREDICTIONS_PER_STEP,
+      leanResults=False):
     """CLAModel constructor.
 
     Args:
@@ -147,6 +151,11 @@ class CLAModel(Model):
       maxPredictionsPerStep: Maximum number of predictions to include for
           each step in inferences. The predictions with highest likelihood are
           included.
+      leanResults: If set, run() returns lean results for high-rate
+          deployments: the sensorInput only carries the (uncopied) input
+          record, the reset flag and the category, and multi-step models only
+          report the best prediction for each step, without the per-step
+          likelihood dicts.
     """
     if not inferenceType in self.__supportedInferenceKindSet:
       raise ValueError("{0} received incompatible inference type: {1}"\
@@ -167,6 +176,7 @@ class CLAModel(Model):
 
     self._minLikelihoodThreshold = minLikelihoodThreshold
     self._maxPredictionsPerStep = maxPredictionsPerStep
+    self._leanResults = bool(leanResults)
 
     # set up learning parameters (note: these may be replaced via
     # enable/disable//SP/TP//Learning methods)
@@ -184,6 +194,8 @@ class CLAModel(Model):
     self._hasCL = clEnable
 
     self._classifierInputEncoder = None
+    self._classifierInputIsDelta = None
+    self._predictionSteps = None
     self._predictedFieldIdx = None
     self._predictedFieldName = None
     self._numFields = None
@@ -303,6 +315,16 @@ class CLAModel(Model):
     self._getEncoder().setLearning(learningEnabled)
 
 
+  def setLeanResults(self, leanResults):
+    """ Turn the lean results mode of run() on or off (see __init__) """
+    self._leanResults = bool(leanResults)
+
+
+  def isLeanResults(self):
+    """ Return True if run() returns lean results (see __init__) """
+    return self._leanResults
+
+
   # Anomaly Accessor Methods
   @requireAnomalyModel
   def setAnomalyParameter(self, param, value):
@@ -429,11 +451,19 @@ class CLAModel(Model):
     representation of the input record
     """
     sensor = self._getSensorRegion()
+    inputRecordCategory = int(sensor.getOutputData('categoryOut')[0])
+    resetOut = sensor.getOutputData('resetOut')[0]
+
+    if self._leanResults:
+      # Skip the parsed data row and the encodings, and hand back the caller's
+      # own input record instead of a copy of it
+      return SensorInput(dataDict=inputRecord,
+                         sequenceReset=resetOut,
+                         category=inputRecordCategory)
+
     dataRow = copy.deepcopy(sensor.getSelf().getOutputValues('sourceOut'))
     dataDict = copy.deepcopy(inputRecord)
     inputRecordEncodings = sensor.getSelf().getOutputValues('sourceEncodings')
-    inputRecordCategory = int(sensor.getOutputData('categoryOut')[0])
-    resetOut = sensor.getOutputData('resetOut')[0]
 
     return SensorInput(dataRow=dataRow,
                        dataDict=dataDict,
@@ -624,9 +654,9 @@ class CLAModel(Model):
                                    self._prevPredictedColumns,
                                    inputValue=self._input[self._predictedFieldName])
 
-      # Store the predicted columns for the next timestep.
-      predictedColumns = tp.getOutputData("topDownOut").nonzero()[0]
-      self._prevPredictedColumns = copy.deepcopy(predictedColumns)
+      # Store the predicted columns for the next timestep. nonzero() returns a
+      # new array, so there is no need to copy it.
+      self._prevPredictedColumns = tp.getOutputData("topDownOut").nonzero()[0]
 
       # Calculate the classifier's output and use the result as the anomaly
       # label. Stores as string of results.
@@ -718,6 +748,10 @@ class CLAModel(Model):
         encoderList = sensor.getSelf().encoder.getEncoderList()
         self._classifierInputEncoder = encoderList[self._predictedFieldIdx]
 
+      # The encoder type doesn't change, so check for a delta encoder only once
+      self._classifierInputIsDelta = isinstance(self._classifierInputEncoder,
+                                                DeltaEncoder)
+
 
 
     # Get the actual value and the bucket index for this sample. The
@@ -733,7 +767,7 @@ class CLAModel(Model):
 
     # Convert the absolute values to deltas if necessary
     # The bucket index should be handled correctly by the underlying delta encoder
-    if isinstance(self._classifierInputEncoder, DeltaEncoder):
+    if self._classifierInputIsDelta:
       # Make the delta before any values have been seen 0 so that we do not mess up the
       # range for the adaptive scalar encoder.
       if not hasattr(self,"_ms_prevVal"):
@@ -767,16 +801,22 @@ class CLAModel(Model):
                                            classification=classificationIn)
 
     # ---------------------------------------------------------------
-    # Get the prediction for every step ahead learned by the classifier
-    predictionSteps = classifier.getParameter('steps')
-    predictionSteps = [int(x) for x in predictionSteps.split(',')]
+    # Get the prediction for every step ahead learned by the classifier. The
+    # steps are fixed when the classifier is created, so parse them only once.
+    if self._predictionSteps is None:
+      predictionSteps = classifier.getParameter('steps')
+      self._predictionSteps = [int(x) for x in predictionSteps.split(',')]
+    predictionSteps = self._predictionSteps
+    leanResults = self._leanResults
 
     # We will return the results in this dict. The top level keys
     # are the step number, the values are the relative likelihoods for
     # each classification value in that time step, represented as
     # another dict where the keys are the classification values and
     # the values are the relative likelihoods.
-    inferences[InferenceElement.multiStepPredictions] = dict()
+    # In lean mode, only the best prediction for each step is returned.
+    if not leanResults:
+      inferences[InferenceElement.multiStepPredictions] = dict()
     inferences[InferenceElement.multiStepBestPredictions] = dict()
 
 
@@ -790,34 +830,44 @@ class CLAModel(Model):
       likelihoodsVec = clResults[steps]
       bucketValues = clResults['actualValues']
 
-      # Create a dict of value:likelihood pairs. We can't simply use
-      #  dict(zip(bucketValues, likelihoodsVec)) because there might be
-      #  duplicate bucketValues (this happens early on in the model when
-      #  it doesn't have actual values for each bucket so it returns
-      #  multiple buckets with the same default actual value).
-      likelihoodsDict = dict()
-      bestActValue = None
-      bestProb = None
-      for (actValue, prob) in zip(bucketValues, likelihoodsVec):
-        if actValue in likelihoodsDict:
-          likelihoodsDict[actValue] += prob
+      if leanResults:
+        # Only the best prediction is returned, so just take the value of the
+        # most likely bucket. Buckets sharing the same default actual value
+        # early on (see below) are not merged.
+        if len(likelihoodsVec) > 0:
+          bestActValue = bucketValues[int(numpy.argmax(likelihoodsVec))]
         else:
-          likelihoodsDict[actValue] = prob
-        # Keep track of best
-        if bestProb is None or likelihoodsDict[actValue] > bestProb:
-          bestProb = likelihoodsDict[actValue]
-          bestActValue = actValue
-
+          bestActValue = None
 
-      # Remove entries with 0 likelihood or likelihood less than
-      # minLikelihoodThreshold, but don't leave an empty dict.
-      likelihoodsDict = CLAModel._removeUnlikelyPredictions(
-          likelihoodsDict, minLikelihoodThreshold, maxPredictionsPerStep)
+      else:
+        # Create a dict of value:likelihood pairs. We can't simply use
+        #  dict(zip(bucketValues, likelihoodsVec)) because there might be
+        #  duplicate bucketValues (this happens early on in the model when
+        #  it doesn't have actual values for each bucket so it returns
+        #  multiple buckets with the same default actual value).
+        likelihoodsDict = dict()
+        bestActValue = None
+        bestProb = None
+        for (actValue, prob) in zip(bucketValues, likelihoodsVec):
+          if actValue in likelihoodsDict:
+            likelihoodsDict[actValue] += prob
+          else:
+            likelihoodsDict[actValue] = prob
+          # Keep track of best
+          if bestProb is None or likelihoodsDict[actValue] > bestProb:
+            bestProb = likelihoodsDict[actValue]
+            bestActValue = actValue
+
+
+        # Remove entries with 0 likelihood or likelihood less than
+        # minLikelihoodThreshold, but don't leave an empty dict.
+        likelihoodsDict = CLAModel._removeUnlikelyPredictions(
+            likelihoodsDict, minLikelihoodThreshold, maxPredictionsPerStep)
 
       # ---------------------------------------------------------------------
       # If we have a delta encoder, we have to shift our predicted output value
       #  by the sum of the deltas
-      if isinstance(self._classifierInputEncoder, DeltaEncoder):
+      if self._classifierInputIsDelta:
         # Get the prediction history for this number of timesteps.
         # The prediction history is a store of the previous best predicted values.
         # This is used to get the final shift from the current absolute value.
@@ -831,13 +881,22 @@ class CLAModel(Model):
         # Find the sum of the deltas for the steps and use this to generate
         # an offset from the current absolute value
         sumDelta = sum(predHistory)
-        offsetDict = dict()
-        for (k, v) in likelihoodsDict.iteritems():
-          if k is not None:
-            # Reconstruct the absolute value based on the current actual value,
-            # the best predicted values from the previous iterations,
-            # and the current predicted delta
-            offsetDict[absoluteValue+float(k)+sumDelta] = v
+        if not leanResults:
+          offsetDict = dict()
+          for (k, v) in likelihoodsDict.iteritems():
+            if k is not None:
+              # Reconstruct the absolute value based on the current actual
+              # value, the best predicted values from the previous iterations,
+              # and the current predicted delta
+              offsetDict[absoluteValue+float(k)+sumDelta] = v
+
+          # Provide the offsetDict as the return value
+          if len(offsetDict)>0:
+            inferences[InferenceElement.multiStepPredictions][steps] = \
+                                                        offsetDict
+          else:
+            inferences[InferenceElement.multiStepPredictions][steps] = \
+                                                          likelihoodsDict
 
         # Push the current best delta to the history buffer for reconstructing the final delta
         if bestActValue is not None:
@@ -847,13 +906,6 @@ class CLAModel(Model):
         if len(predHistory) >= steps:
           predHistory.popleft()
 
-        # Provide the offsetDict as the return value
-        if len(offsetDict)>0:
-          inferences[InferenceElement.multiStepPredictions][steps] = \
-                                                      offsetDict
-        else:
-          inferences[InferenceElement.multiStepPredictions][steps] = \
-                                                        likelihoodsDict
         if bestActValue is None:
           inferences[InferenceElement.multiStepBestPredictions][steps] = \
                                                   None
@@ -867,8 +919,9 @@ class CLAModel(Model):
       else:
         # The multiStepPredictions element holds the probabilities for each
         #  bucket
-        inferences[InferenceElement.multiStepPredictions][steps] = \
-                                                      likelihoodsDict
+        if not leanResults:
+          inferences[InferenceElement.multiStepPredictions][steps] = \
+                                                        likelihoodsDict
         inferences[InferenceElement.multiStepBestPredictions][steps] = \
                                                 bestActValue
 
@@ -1235,6 +1288,11 @@ class CLAModel(Model):
     # This gets filled in during the first infer because it can only be
     #  determined at run-time
     self._classifierInputEncoder = None
+    self._classifierInputIsDelta = None
+    self._predictionSteps = None
+
+    if not hasattr(self, '_leanResults'):
+      self._leanResults = False
 
     if not hasattr(self, '_minLikelihoodThreshold'):
       self._minLikelihoodThreshold = DEFAULT_LIKELIHOOD_THRESHOLD
@@ -1264,7 +1322,15 @@ class CLAModel(Model):
 
     self.__logger.debug("Serializing network...")
 
-    self._netInfo.net.save(outputDir)
+    # The large arrays of the python regions are saved as .npy files, and
+    # left out of the network's pickles while it is saved
+    detachedArrays = self.__detachRegionArrays(
+        arrayDir=self.__getRegionArrayDirectory(extraDataDir))
+    try:
+      self._netInfo.net.save(outputDir)
+    finally:
+      for (owner, attrName, array) in detachedArrays:
+        setattr(owner, attrName, array)
 
     self.__logger.debug("Finished serializing network")
 
@@ -1294,6 +1360,8 @@ class CLAModel(Model):
       "(%s) De-serializing network...", self)
 
     self._netInfo.net = Network(stateDir)
+    self.__attachRegionArrays(
+        arrayDir=self.__getRegionArrayDirectory(extraDataDir))
 
     self.__logger.debug(
       "(%s) Finished de-serializing network", self)
@@ -1408,6 +1476,80 @@ class CLAModel(Model):
       raise RuntimeError("TemporalAnomaly models require a TP region.")
 
 
+  def __detachRegionArrays(self, arrayDir):
+    """
+    Save the large numpy arrays held by the python regions of the network as
+    .npy files, listed in a manifest, and set their attributes to None.
+
+    arrayDir:     Directory for the .npy files and the manifest
+    Returns:      List of (owner, attrName, array) to restore after saving
+    """
+    makeDirectoryFromAbsolutePath(arrayDir)
+
+    detached = []
+    manifest = {}
+    # Arrays shared between attributes are saved once
+    fileNames = {}
+    for (regionName, region) in self._netInfo.net.regions.items():
+      if not region.type.startswith("py."):
+        continue
+
+      regionArrays = {}
+      for (attrPath, owner, attrName, array) in findMappableArrays(
+          region.getSelf()):
+        if id(array) not in fileNames:
+          fileNames[id(array)] = "%s.%s.npy" % (regionName, attrPath)
+          numpy.save(os.path.join(arrayDir, fileNames[id(array)]), array)
+        regionArrays[attrPath] = fileNames[id(array)]
+        detached.append((owner, attrName, array))
+      manifest[regionName] = regionArrays
+
+    for (owner, attrName, _) in detached:
+      setattr(owner, attrName, None)
+
+    with open(os.path.join(arrayDir, "arrays.json"), "w") as manifestFile:
+      json.dump(manifest, manifestFile)
+
+    return detached
+
+
+  def __attachRegionArrays(self, arrayDir):
+    """
+    Memory-map the arrays saved by __detachRegionArrays() back into the python
+    regions of the restored network, copy-on-write. Attributes that the
+    regions re-created while being restored are left alone.
+
+    arrayDir:     Directory of the .npy files and the manifest
+    """
+    manifestPath = os.path.join(arrayDir, "arrays.json")
+    if not os.path.isfile(manifestPath):
+      # Checkpoint written before the arrays were stored separately
+      return
+
+    with open(manifestPath) as manifestFile:
+      manifest = json.load(manifestFile)
+
+    arrays = {}
+    for (regionName, regionArrays) in manifest.iteritems():
+      regionImpl = self._netInfo.net.regions[regionName].getSelf()
+      for (attrPath, fileName) in regionArrays.iteritems():
+        (owner, attrName) = resolveAttrPath(regionImpl, attrPath)
+        if getattr(owner, attrName) is not None:
+          continue
+        if fileName not in arrays:
+          arrays[fileName] = loadMappedArray(os.path.join(arrayDir, fileName))
+        setattr(owner, attrName, arrays[fileName])
+
+
+  def __getRegionArrayDirectory(self, extraDataDir):
+    """
+    extraDataDir:
+                  Model's extra data directory path
+    Returns:      Absolute directory path for the arrays of the network regions
+    """
+    return os.path.abspath(os.path.join(extraDataDir, "regionarrays"))
+
+
   def __getNetworkStateDirectory(self, extraDataDir):
     """
     extraDataDir:
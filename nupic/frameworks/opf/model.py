@@ -21,12 +21,16 @@
 
 """Module defining the OPF Model base class."""
 
-import cPickle as pickle
+import hashlib
+import json
 import os
 import shutil
+import sys
+import threading
 from abc import ABCMeta, abstractmethod
 
 import nupic.frameworks.opf.opfutils as opfutils
+from nupic.support.serializationutils import dumpWithArrays, loadWithArrays
 
 
 
@@ -39,6 +43,10 @@ class Model(object):
 
   __metaclass__ = ABCMeta
 
+  # Background saves still committing, by checkpoint directory
+  _pendingSaves = {}
+  _pendingSavesLock = threading.Lock()
+
   def __init__(self, inferenceType):
     """ Model constructor.
     @param inferenceType (nupic.frameworks.opf.opfutils.InferenceType)
@@ -181,23 +189,45 @@ class Model(object):
   # Implementation of common save/load functionality
   ###############################################################################
 
-  def save(self, saveModelDir):
+  def save(self, saveModelDir, background=False):
     """ Save the model in the given directory.
+
+    The checkpoint is first written to a temporary directory next to
+    saveModelDir, and then swapped in with directory renames, so a failed save
+    leaves the previous checkpoint intact. Each file of the checkpoint (the
+    model pickle and the per-region files of the network) is a chunk whose
+    digest is kept in a manifest; the chunks that did not change since the
+    previous checkpoint are hard-linked to the previous files instead of
+    taking disk space again.
+
     @param saveModelDir (string)
            Absolute directory path for saving the model. This directory should
            only be used to store a saved model. If the directory does not exist,
            it will be created automatically and populated with model data. A
            pre-existing directory will only be accepted if it contains previously
            saved model data. If such a directory is given, the full contents of
-           the directory will be deleted and replaced with current model data.
+           the directory will be replaced with current model data.
+    @param background (bool)
+           If True, only the model state is written before returning, and the
+           chunk deduplication and the swap of the directories run in a
+           background thread. The model may be run again right away.
+    @returns (threading.Thread) The started background thread if background
+             is True, to be joined before the checkpoint is used; else None.
+             Its join() re-raises any exception raised by the background save.
     """
     logger = self._getLogger()
     logger.debug("(%s) Creating local checkpoint in %r...",
                        self, saveModelDir)
 
+    saveModelDir = os.path.abspath(saveModelDir)
+
+    # A background save to the same directory must finish first: its
+    # temporary directory is about to be replaced
+    Model._waitForPendingSave(saveModelDir)
+    Model._recoverCheckpoint(saveModelDir)
     modelPickleFilePath = self._getModelPickleFilePath(saveModelDir)
 
-    # Clean up old saved state, if any
+    # Make sure that we are not about to replace something else than a model
     if os.path.exists(saveModelDir):
       if not os.path.isdir(saveModelDir):
         raise Exception(("Existing filesystem entry <%s> is not a model"
@@ -209,25 +239,136 @@ class Model(object):
                          " (%s missing or not a file)") % \
                           (saveModelDir, modelPickleFilePath))
 
-      shutil.rmtree(saveModelDir)
+    # Write the new state into a clean temporary directory
+    tmpDir = saveModelDir + ".tmp"
+    if os.path.exists(tmpDir):
+      shutil.rmtree(tmpDir)
+    self.__makeDirectoryFromAbsolutePath(tmpDir)
 
-    # Create a new directory for saving state
-    self.__makeDirectoryFromAbsolutePath(saveModelDir)
-
-    with open(modelPickleFilePath, 'wb') as modelPickleFile:
+    with open(self._getModelPickleFilePath(tmpDir), 'wb') as modelPickleFile:
       logger.debug("(%s) Pickling Model instance...", self)
 
-      pickle.dump(self, modelPickleFile)
+      dumpWithArrays(self, modelPickleFile,
+                     arrayDir=self._getModelArrayDir(tmpDir))
 
       logger.debug("(%s) Finished pickling Model instance", self)
 
 
     # Tell the model to save extra data, if any, that's too big for pickling
-    self._serializeExtraData(extraDataDir=self._getModelExtraDataDir(saveModelDir))
+    self._serializeExtraData(extraDataDir=self._getModelExtraDataDir(tmpDir))
 
-    logger.debug("(%s) Finished creating local checkpoint", self)
+    if background:
+      thread = _CheckpointThread(saveModelDir, logger)
+      with Model._pendingSavesLock:
+        Model._pendingSaves[saveModelDir] = thread
+      thread.start()
+      return thread
 
-    return
+    Model._commitCheckpoint(saveModelDir, logger)
+    return None
+
+  @staticmethod
+  def _waitForPendingSave(saveModelDir):
+    """ Wait for the background save to saveModelDir, if any, to finish.
+    Its errors are left to be raised by the join() of its own caller.
+    @param saveModelDir (string) Absolute path of the checkpoint directory
+    """
+    with Model._pendingSavesLock:
+      thread = Model._pendingSaves.get(saveModelDir)
+    if thread is not None:
+      threading.Thread.join(thread)
+
+  @staticmethod
+  def _commitCheckpoint(saveModelDir, logger):
+    """ Replace the checkpoint in saveModelDir with the one written to its
+    temporary directory, sharing the unchanged chunks with the previous
+    checkpoint.
+    @param saveModelDir (string) Absolute path of the checkpoint directory
+    @param logger (Logger) Logger of the saved model
+    """
+    tmpDir = saveModelDir + ".tmp"
+    oldDir = saveModelDir + ".old"
+
+    previousManifest = Model._readCheckpointManifest(saveModelDir)
+    manifest = {}
+    numLinked = 0
+    for (dirPath, _, fileNames) in os.walk(tmpDir):
+      for fileName in fileNames:
+        filePath = os.path.join(dirPath, fileName)
+        chunkName = os.path.relpath(filePath, tmpDir)
+        digest = Model._getChunkDigest(filePath)
+        manifest[chunkName] = digest
+
+        if (previousManifest.get(chunkName) == digest and
+            Model._linkChunk(os.path.join(saveModelDir, chunkName), filePath)):
+          numLinked += 1
+
+    # The manifest is written last: its presence marks a complete checkpoint
+    with open(Model._getCheckpointManifestPath(tmpDir), 'w') as manifestFile:
+      json.dump(manifest, manifestFile)
+
+    if os.path.exists(oldDir):
+      shutil.rmtree(oldDir)
+    if os.path.exists(saveModelDir):
+      os.rename(saveModelDir, oldDir)
+    os.rename(tmpDir, saveModelDir)
+    if os.path.exists(oldDir):
+      shutil.rmtree(oldDir)
+
+    logger.debug("Finished creating local checkpoint in %r (%d of %d chunks "
+                 "unchanged)", saveModelDir, numLinked, len(manifest))
+
+  @staticmethod
+  def _recoverCheckpoint(saveModelDir):
+    """ Complete a checkpoint swap that was interrupted between the renames of
+    _commitCheckpoint(), so that saveModelDir holds the latest complete
+    checkpoint.
+    @param saveModelDir (string) Absolute path of the checkpoint directory
+    """
+    if os.path.exists(saveModelDir):
+      return
+
+    tmpDir = saveModelDir + ".tmp"
+    oldDir = saveModelDir + ".old"
+    if os.path.isfile(Model._getCheckpointManifestPath(tmpDir)):
+      os.rename(tmpDir, saveModelDir)
+    elif os.path.isdir(oldDir):
+      os.rename(oldDir, saveModelDir)
+
+  @staticmethod
+  def _readCheckpointManifest(saveModelDir):
+    """ Return the {chunk name: digest} manifest of a checkpoint, or an empty
+    dict if the checkpoint does not exist or predates manifests.
+    @param saveModelDir (string) Absolute path of the checkpoint directory
+    """
+    manifestPath = Model._getCheckpointManifestPath(saveModelDir)
+    if not os.path.isfile(manifestPath):
+      return {}
+    with open(manifestPath) as manifestFile:
+      return json.load(manifestFile)
+
+  @staticmethod
+  def _getChunkDigest(filePath):
+    digest = hashlib.sha1()
+    with open(filePath, 'rb') as chunkFile:
+      for block in iter(lambda: chunkFile.read(1 << 20), ''):
+        digest.update(block)
+    return digest.hexdigest()
+
+  @staticmethod
+  def _linkChunk(previousPath, filePath):
+    """ Replace filePath with a hard link to the identical previousPath.
+    @returns (bool) False if hard links are not supported here
+    """
+    if not hasattr(os, "link"):
+      return False
+    linkPath = filePath + ".link"
+    try:
+      os.link(previousPath, linkPath)
+    except OSError:
+      return False
+    os.rename(linkPath, filePath)
+    return True
 
   def _serializeExtraData(self, extraDataDir):
     """ Protected method that is called during serialization with an external
@@ -241,6 +382,8 @@ class Model(object):
   @classmethod
   def load(cls, savedModelDir):
     """ Load saved model.
+    The large numpy arrays of the model are memory-mapped copy-on-write from
+    the checkpoint, so their pages are only read when they are first touched.
     @param savedModelDir (string)
            Directory of where the experiment is to be or was saved
     @returns (Model) The loaded model instance
@@ -248,13 +391,20 @@ class Model(object):
     logger = opfutils.initLogger(cls)
     logger.debug("Loading model from local checkpoint at %r...", savedModelDir)
 
+    # A background save to the same directory may still be replacing the
+    # checkpoint
+    savedModelDir = os.path.abspath(savedModelDir)
+    Model._waitForPendingSave(savedModelDir)
+    Model._recoverCheckpoint(savedModelDir)
+
     # Load the model
     modelPickleFilePath = Model._getModelPickleFilePath(savedModelDir)
 
     with open(modelPickleFilePath, 'rb') as modelPickleFile:
       logger.debug("Unpickling Model instance...")
 
-      model = pickle.load(modelPickleFile)
+      model = loadWithArrays(modelPickleFile,
+                             arrayDir=Model._getModelArrayDir(savedModelDir))
 
       logger.debug("Finished unpickling Model instance")
 
@@ -287,6 +437,30 @@ class Model(object):
     path = os.path.abspath(path)
     return path
 
+  @staticmethod
+  def _getCheckpointManifestPath(saveModelDir):
+    """ Return the absolute path of the manifest of the checkpoint chunks.
+    @param saveModelDir (string)
+           Directory of where the experiment is to be or was saved
+    @returns (string) An absolute path.
+    """
+    path = os.path.join(saveModelDir, "checkpoint.manifest")
+    path = os.path.abspath(path)
+    return path
+
+  @staticmethod
+  def _getModelArrayDir(saveModelDir):
+    """ Return the absolute path to the directory where the large numpy
+    arrays of the model's pickle are stored as raw .npy files. They are
+    memory-mapped copy-on-write when the model is loaded.
+    @param saveModelDir (string)
+           Directory of where the experiment is to be or was saved
+    @returns (string) An absolute path.
+    """
+    path = os.path.join(saveModelDir, "modelarrays")
+    path = os.path.abspath(path)
+    return path
+
   @staticmethod
   def _getModelExtraDataDir(saveModelDir):
     """ Return the absolute path to the directory where the model's own
@@ -319,3 +493,40 @@ class Model(object):
         raise
 
     return
+
+
+
+class _CheckpointThread(threading.Thread):
+  """ Thread that commits a checkpoint written by Model.save(background=True).
+  An exception raised by the commit is kept and re-raised by join().
+  """
+
+  def __init__(self, saveModelDir, logger):
+    """
+    @param saveModelDir (string) Absolute path of the checkpoint directory
+    @param logger (Logger) Logger of the saved model
+    """
+    super(_CheckpointThread, self).__init__()
+    self._saveModelDir = saveModelDir
+    self._logger = logger
+    self._excInfo = None
+
+  def run(self):
+    try:
+      Model._commitCheckpoint(self._saveModelDir, self._logger)
+    except Exception:
+      self._logger.exception("Failed to commit checkpoint in %r",
+                             self._saveModelDir)
+      self._excInfo = sys.exc_info()
+    finally:
+      with Model._pendingSavesLock:
+        if Model._pendingSaves.get(self._saveModelDir) is self:
+          del Model._pendingSaves[self._saveModelDir]
+
+  def join(self, timeout=None):
+    """ Wait for the commit to finish, and re-raise its exception, if any.
+    @param timeout (float) Maximum number of seconds to wait, or None
+    """
+    super(_CheckpointThread, self).join(timeout)
+    if self._excInfo is not None and not self.isAlive():
+      raise self._excInfo[0], self._excInfo[1], self._excInfo[2]
@@ -0,0 +1,361 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Hosts many OPF models in a pool of worker processes.
+
+Each model is owned by exactly one worker, picked from a hash of the model
+name, so a worker keeps its models in memory between calls. A batch of records
+for many models is split by worker, all the workers run their share
+concurrently, and the results are gathered back in the caller's process.
+"""
+
+import cPickle
+import multiprocessing
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+
+
+class ModelHostError(Exception):
+  """ Raised when a worker fails to execute a model host command, and returned
+  by ModelHost.runBatch() for the models that failed. The message holds the
+  traceback from the worker process.
+  """
+  pass
+
+
+
+def _formatException():
+  return "".join(traceback.format_exception(*sys.exc_info()))
+
+
+
+def _sendReply(conn, command, reply):
+  """ Send a reply to the ModelHost. If the reply can't be pickled, an error
+  is sent instead, so the ModelHost never waits for a reply that won't come.
+  For a "run" command, only the models whose results can't be pickled are
+  replaced by errors.
+  """
+  try:
+    conn.send(reply)
+    return
+  except Exception:
+    error = ("error", _formatException())
+
+  if command[0] == "run" and reply[0] == "ok":
+    (results, computeTime) = reply[1]
+    for (modelName, modelReply) in results.items():
+      try:
+        cPickle.dumps(modelReply, cPickle.HIGHEST_PROTOCOL)
+      except Exception:
+        results[modelName] = ("error", _formatException())
+    try:
+      conn.send(("ok", (results, computeTime)))
+      return
+    except Exception:
+      error = ("error", _formatException())
+
+  conn.send(error)
+
+
+
+def _workerMain(conn):
+  """ Command loop of a worker process. Owns the models that are sharded to
+  this worker and serves the commands sent by the ModelHost on conn until it
+  receives "stop".
+
+  conn:     multiprocessing Connection to the ModelHost
+  """
+  models = {}
+
+  while True:
+    command = conn.recv()
+    name = command[0]
+
+    if name == "stop":
+      conn.send(("ok", None))
+      break
+
+    try:
+      if name == "create":
+        (_, modelName, modelParams, predictedFieldName) = command
+        if modelName in models:
+          raise KeyError("Model with name <%s> already exists" % modelName)
+        model = ModelFactory.create(modelParams)
+        model.enableInference({"predictedField": predictedFieldName})
+        models[modelName] = model
+        result = None
+
+      elif name == "delete":
+        del models[command[1]]
+        result = None
+
+      elif name == "run":
+        # The batch maps model names to lists of records; time only the
+        # model computation so the host can tell it from the IPC overhead.
+        # A failing model doesn't prevent the others from running.
+        start = time.time()
+        result = {}
+        for (modelName, records) in command[1].iteritems():
+          try:
+            result[modelName] = ("ok", [models[modelName].run(record)
+                                        for record in records])
+          except Exception:
+            result[modelName] = ("error", _formatException())
+        result = (result, time.time() - start)
+
+      else:
+        raise ValueError("Unknown model host command: %r" % (name,))
+
+    except Exception:
+      _sendReply(conn, command, ("error", _formatException()))
+    else:
+      _sendReply(conn, command, ("ok", result))
+
+
+
+class ModelHost(object):
+  """ Hosts OPF models in a pool of worker processes and runs batches of
+  records for many models concurrently.
+
+  Models are created from the same model params as ModelFactory.create(). For
+  high-rate anomaly models, set "leanResults" in the model params to avoid
+  sending unused result fields back from the workers.
+
+  A ModelHost may be shared between threads: each exchange with the workers
+  holds a lock, so the replies of concurrent calls can't be mixed up.
+  """
+
+  def __init__(self, numWorkers=None):
+    """
+    numWorkers: number of worker processes; defaults to the number of CPUs
+    """
+    if numWorkers is None:
+      numWorkers = multiprocessing.cpu_count()
+    if numWorkers < 1:
+      raise ValueError("numWorkers must be positive, got %r" % (numWorkers,))
+
+    # Held for each exchange of commands and replies with the workers
+    self._lock = threading.Lock()
+    self._workers = []
+    self._connections = []
+    for _ in xrange(numWorkers):
+      (parentConn, childConn) = multiprocessing.Pipe()
+      worker = multiprocessing.Process(target=_workerMain, args=(childConn,))
+      worker.daemon = True
+      worker.start()
+      childConn.close()
+      self._workers.append(worker)
+      self._connections.append(parentConn)
+
+    # Model name -> worker index
+    self._modelWorkers = {}
+
+    self._numBatches = 0
+    self._numRecords = 0
+    self._totalBatchTime = 0.0
+    self._maxBatchTime = 0.0
+    self._workerRecords = [0] * numWorkers
+    self._workerComputeTime = [0.0] * numWorkers
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    self.close()
+
+
+  def close(self):
+    """ Stop the worker processes. The hosted models are discarded. """
+    with self._lock:
+      for conn in self._connections:
+        conn.send(("stop",))
+      for (conn, worker) in zip(self._connections, self._workers):
+        conn.recv()
+        conn.close()
+        worker.join()
+      self._connections = []
+      self._workers = []
+      self._modelWorkers = {}
+
+
+  def getNumWorkers(self):
+    return len(self._workers)
+
+
+  def getModelNames(self):
+    """ Return the names of the hosted models """
+    return self._modelWorkers.keys()
+
+
+  def hasModel(self, name):
+    return name in self._modelWorkers
+
+
+  def createModel(self, name, modelParams, predictedFieldName):
+    """ Create a model in the worker that owns its name.
+
+    name:               unique model name
+    modelParams:        model description, as passed to ModelFactory.create()
+    predictedFieldName: name of the predicted field, used to enable inference
+    """
+    if name in self._modelWorkers:
+      raise KeyError("Model with name <%s> already exists" % name)
+
+    workerIdx = zlib.crc32(name) % len(self._workers)
+    self._call(workerIdx, ("create", name, modelParams, predictedFieldName))
+    self._modelWorkers[name] = workerIdx
+
+
+  def deleteModel(self, name):
+    """ Remove a model from its worker """
+    workerIdx = self._getWorker(name)
+    self._call(workerIdx, ("delete", name))
+    del self._modelWorkers[name]
+
+
+  def run(self, name, record):
+    """ Run one record through one model.
+
+    Returns: the ModelResult of the model
+    Raises:  ModelHostError if the model failed
+    """
+    results = self.runBatch({name: [record]})[name]
+    if isinstance(results, ModelHostError):
+      raise results
+    return results[0]
+
+
+  def runBatch(self, batch):
+    """ Run records through many models. The records of each model are run in
+    order, and the workers run their models concurrently.
+
+    batch:    dict mapping model names to lists of input records
+
+    Returns:  dict mapping the same model names to lists of ModelResults, one
+              per input record, or to a ModelHostError for the models that
+              failed. The results of the other models are still returned.
+    """
+    workerBatches = {}
+    for (name, records) in batch.iteritems():
+      workerBatches.setdefault(self._getWorker(name), {})[name] = records
+
+    results = {}
+    with self._lock:
+      start = time.time()
+      # Send all the sub-batches before collecting any results so the workers
+      # compute concurrently
+      sentWorkers = []
+      try:
+        for (workerIdx, workerBatch) in workerBatches.iteritems():
+          self._connections[workerIdx].send(("run", workerBatch))
+          sentWorkers.append(workerIdx)
+      except Exception:
+        # The workers that got their sub-batch will still reply; read those
+        # replies now so they aren't taken for the replies of a later call
+        self._drain(sentWorkers)
+        raise
+
+      for (workerIdx, workerBatch) in workerBatches.iteritems():
+        try:
+          (workerResults, computeTime) = self._receive(workerIdx)
+        except ModelHostError as e:
+          for name in workerBatch:
+            results[name] = e
+          continue
+        except (EOFError, IOError) as e:
+          # The worker is gone; keep reading the replies of the others
+          for name in workerBatch:
+            results[name] = ModelHostError("Worker %d failed: %r" %
+                                           (workerIdx, e))
+          continue
+        for (name, (status, result)) in workerResults.iteritems():
+          results[name] = (ModelHostError(result) if status == "error"
+                           else result)
+        self._workerRecords[workerIdx] += sum(
+            len(records) for records in workerBatch.itervalues())
+        self._workerComputeTime[workerIdx] += computeTime
+
+      batchTime = time.time() - start
+      self._numBatches += 1
+      self._numRecords += sum(len(records) for records in batch.itervalues())
+      self._totalBatchTime += batchTime
+      self._maxBatchTime = max(self._maxBatchTime, batchTime)
+
+    return results
+
+
+  def getStats(self):
+    """ Return the throughput and latency counters of this host.
+
+    Returns: a dict with the number of models, batches and records run, the
+             records per second and the mean and max batch latency in
+             seconds, and the records and compute seconds of each worker
+    """
+    return {
+      "numModels": len(self._modelWorkers),
+      "numBatches": self._numBatches,
+      "numRecords": self._numRecords,
+      "recordsPerSecond": (self._numRecords / self._totalBatchTime
+                           if self._totalBatchTime > 0 else 0.0),
+      "meanBatchLatency": (self._totalBatchTime / self._numBatches
+                           if self._numBatches > 0 else 0.0),
+      "maxBatchLatency": self._maxBatchTime,
+      "workerRecords": list(self._workerRecords),
+      "workerComputeTime": list(self._workerComputeTime),
+    }
+
+
+  def _getWorker(self, name):
+    try:
+      return self._modelWorkers[name]
+    except KeyError:
+      raise KeyError("Model with name <%s> does not exist." % name)
+
+
+  def _call(self, workerIdx, command):
+    with self._lock:
+      self._connections[workerIdx].send(command)
+      return self._receive(workerIdx)
+
+
+  def _drain(self, workerIndices):
+    """ Read and discard the pending replies of the given workers """
+    for workerIdx in workerIndices:
+      try:
+        self._connections[workerIdx].recv()
+      except (EOFError, IOError):
+        pass
+
+
+  def _receive(self, workerIdx):
+    (status, result) = self._connections[workerIdx].recv()
+    if status == "error":
+      raise ModelHostError(result)
+    return result
@@ -289,13 +289,12 @@ class RecordSensor(PyRegion):
       sequenceId = data["_sequenceId"]
       category = data["_category"]
 
-      # Encode the processed records
-      self.encoder.encodeIntoArray(data, outputs["dataOut"])
-
-      # Write out the scalar values obtained from the data source. These
-      #  are often logged to a file
-      outputs['sourceOut'][:] = self.encoder.getScalars(data)
-      self._outputValues['sourceOut'] = self.encoder.getEncodedValues(data)
+      # Encode the processed records, and write out the scalar values obtained
+      #  from the data source. These are often logged to a file
+      (scalarValues, encodedValues) = self.encoder.encodeAll(
+        data, outputs["dataOut"])
+      outputs['sourceOut'][:] = scalarValues
+      self._outputValues['sourceOut'] = encodedValues
 
       # -----------------------------------------------------------------------
       # Get the encoded bit arrays for each field
@@ -333,7 +332,6 @@ class RecordSensor(PyRegion):
       # If verbosity >=2, print the record fields
       if self.verbosity >= 1:
         self.encoder.pprint(outputs["dataOut"], prefix="%7d:" % (self._iterNum))
-        scalarValues = self.encoder.getScalars(data)
         nz = outputs["dataOut"].nonzero()[0]
         print "     nz: (%d)" % (len(nz)), nz
         print "  encIn:", self.encoder.scalarsToStr(scalarValues)
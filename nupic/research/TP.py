@@ -244,6 +244,13 @@ class TP(ConsolePrinterMixin):
       for _ in xrange(self.cellsPerColumn):
         self.cells[c].append([])
 
+    ## Reverse index from each presynaptic cell (column, index) to the
+    # segments it has synapses on. Each entry maps a segment to
+    # [column, index, number of synapses] of the segment. Built on first use
+    # by _computeSegmentActivity(), and then kept up to date when segments
+    # are adapted or trimmed.
+    self._presynapticIndex = None
+
     ## @todo document
     self.lrnIterationIdx = 0
     ## @todo document
@@ -308,7 +315,7 @@ class TP(ConsolePrinterMixin):
     """
     List of our member variables that we don't need to be saved.
     """
-    return []
+    return ['_presynapticIndex']
 
 
   def _initEphemerals(self):
@@ -396,6 +403,8 @@ class TP(ConsolePrinterMixin):
     self.setRandomState(state['_random'])
     del state['_random']
     self.__dict__.update(state)
+    # The presynaptic index is rebuilt on first use
+    self._presynapticIndex = None
     # Check the version of the checkpointed TP and update it to the current
     # version if necessary.
     if not hasattr(self, 'version'):
@@ -1738,33 +1747,33 @@ class TP(ConsolePrinterMixin):
     self.colConfidence['t'].fill(0)
 
     # Phase 2 - Compute new predicted state and update cell and column
-    #   confidences
-    for c in xrange(self.numberOfCols):
-
-      # For each cell in the column
-      for i in xrange(self.cellsPerColumn):
-
-        # For each segment in the cell
-        for s in self.cells[c][i]:
-
-          # See if it has the min number of active synapses
-          numActiveSyns = self.getSegmentActivityLevel(
-              s, self.infActiveState['t'], connectedSynapsesOnly=False)
-          if numActiveSyns < self.activationThreshold:
-            continue
-
-          # Incorporate the confidence into the owner cell and column
-          if self.verbosity >= 6:
-            print "incorporating DC from cell[%d,%d]:   " % (c, i),
-            s.debugPrint()
-          dc = s.dutyCycle()
-          self.cellConfidence['t'][c, i] += dc
-          self.colConfidence['t'][c] += dc
+    #   confidences. Only the cells with a segment that has the min number of
+    #   active synapses contribute, so we find them by propagating from the
+    #   active cells and visit them in column, cell order.
+    segmentActivity = self._computeSegmentActivity(self.infActiveState['t'])
+    for c, i in self._getCellsWithActiveSegments(segmentActivity,
+                                                 self.activationThreshold):
+
+      # For each segment in the cell
+      for s in self.cells[c][i]:
+
+        # See if it has the min number of active synapses
+        numActiveSyns = segmentActivity[s][2] if s in segmentActivity else 0
+        if numActiveSyns < self.activationThreshold:
+          continue
+
+        # Incorporate the confidence into the owner cell and column
+        if self.verbosity >= 6:
+          print "incorporating DC from cell[%d,%d]:   " % (c, i),
+          s.debugPrint()
+        dc = s.dutyCycle()
+        self.cellConfidence['t'][c, i] += dc
+        self.colConfidence['t'][c] += dc
 
-          # If we reach threshold on the connected synapses, predict it
-          # If not active, skip over it
-          if self.isSegmentActive(s, self.infActiveState['t']):
-            self.infPredictedState['t'][c, i] = 1
+        # If we reach threshold on the connected synapses, predict it
+        # If not active, skip over it
+        if self.isSegmentActive(s, self.infActiveState['t']):
+          self.infPredictedState['t'][c, i] = 1
 
     # Normalize column and cell confidences
     sumConfidences = self.colConfidence['t'].sum()
@@ -2137,8 +2146,12 @@ class TP(ConsolePrinterMixin):
 
     # Compute new predicted state. When computing predictions for
     # phase 2, we predict at  most one cell per column (the one with the best
-    # matching segment).
-    for c in xrange(self.numberOfCols):
+    # matching segment). Only columns with a segment that has at least
+    # activationThreshold active synapses can have a predicted cell.
+    segmentActivity = self._computeSegmentActivity(self.lrnActiveState['t'])
+    columns = sorted(set(c for c, _ in self._getCellsWithActiveSegments(
+        segmentActivity, self.activationThreshold)))
+    for c in columns:
 
       # Is there a cell predicted to turn on in this column?
       i, s, numActive = self.getBestMatchingCell(
@@ -2372,11 +2385,14 @@ class TP(ConsolePrinterMixin):
             if len(synsToDel) == segment.getNumSynapses():
               segsToDel.append(segment) # will remove the whole segment
             elif len(synsToDel) > 0:
+              self._unindexSegment(segment)
               for syn in synsToDel: # remove some synapses on segment
                 segment.syns.remove(syn)
+              self._indexSegment(c, i, segment)
 
           for seg in segsToDel: # remove some segments of this cell
             self.cleanUpdatesList(c, i, seg)
+            self._unindexSegment(seg)
             self.cells[c][i].remove(seg)
 
     # Update the prediction score stats
@@ -2497,9 +2513,11 @@ class TP(ConsolePrinterMixin):
         segsToDel.append(segment) # will remove the whole segment
       else:
         if len(synsToDel) > 0:
+          self._unindexSegment(segment)
           for syn in synsToDel: # remove some synapses on segment
             segment.syns.remove(syn)
             nSynsRemoved += 1
+          self._indexSegment(colIdx, cellIdx, segment)
         if len(segment.syns) < minNumSyns:
           segsToDel.append(segment)
 
@@ -2508,6 +2526,7 @@ class TP(ConsolePrinterMixin):
     nSegsRemoved += len(segsToDel)
     for seg in segsToDel: # remove some segments of this cell
       self.cleanUpdatesList(colIdx, cellIdx, seg)
+      self._unindexSegment(seg)
       self.cells[colIdx][cellIdx].remove(seg)
       nSynsRemoved += len(seg.syns)
 
@@ -2754,6 +2773,112 @@ class TP(ConsolePrinterMixin):
                                    self.connectedPerm)
 
 
+  def _buildPresynapticIndex(self):
+    """ @internal
+    Build the presynaptic cell -> segments index from all the segments.
+    """
+    self._presynapticIndex = {}
+    for c, i in itertools.product(xrange(self.numberOfCols),
+                                  xrange(self.cellsPerColumn)):
+      for segment in self.cells[c][i]:
+        self._indexSegment(c, i, segment)
+
+
+  def _indexSegment(self, c, i, segment):
+    """ @internal
+    Add the synapses of a segment to the presynaptic index, if it is built.
+
+    @param c       column index of the cell owning the segment
+    @param i       index of the cell owning the segment within the column
+    @param segment Segment instance
+    """
+    if self._presynapticIndex is None:
+      return
+
+    for syn in segment.syns:
+      segments = self._presynapticIndex.setdefault((syn[0], syn[1]), {})
+      entry = segments.get(segment)
+      if entry is None:
+        segments[segment] = [c, i, 1]
+      else:
+        entry[2] += 1
+
+
+  def _unindexSegment(self, segment):
+    """ @internal
+    Remove the synapses of a segment from the presynaptic index, if it is
+    built. This must be called before the synapses of the segment change.
+
+    @param segment Segment instance
+    """
+    if self._presynapticIndex is None:
+      return
+
+    for syn in segment.syns:
+      key = (syn[0], syn[1])
+      segments = self._presynapticIndex[key]
+      entry = segments[segment]
+      entry[2] -= 1
+      if entry[2] == 0:
+        del segments[segment]
+        if len(segments) == 0:
+          del self._presynapticIndex[key]
+
+
+  def _computeSegmentActivity(self, activeState):
+    """ @internal
+    Compute the activity level of all the segments that have synapses from
+    active cells by propagating from the active cells through the presynaptic
+    index, instead of visiting every segment. The activity levels are the same
+    as getSegmentActivityLevel() with connectedSynapsesOnly=False.
+
+    @param activeState the active cells
+
+    @returns dict mapping each segment with an active synapse to
+             [column index, cell index, activity level]
+    """
+    if self._presynapticIndex is None:
+      self._buildPresynapticIndex()
+
+    segmentActivity = {}
+    activeCells = activeState.nonzero()
+    for c, i in itertools.izip(activeCells[0].tolist(),
+                               activeCells[1].tolist()):
+      segments = self._presynapticIndex.get((c, i))
+      if segments is None:
+        continue
+
+      value = int(activeState[c, i])
+      for segment, entry in segments.iteritems():
+        activity = segmentActivity.get(segment)
+        if activity is None:
+          segmentActivity[segment] = [entry[0], entry[1], entry[2] * value]
+        else:
+          activity[2] += entry[2] * value
+
+    return segmentActivity
+
+
+  def _getCellsWithActiveSegments(self, segmentActivity, threshold):
+    """ @internal
+    Return the cells owning a segment with at least threshold active synapses.
+
+    @param segmentActivity segment activity levels, as returned by
+                           _computeSegmentActivity()
+    @param threshold       minimum activity level
+
+    @returns sorted list of (column index, cell index)
+    """
+    if threshold <= 0:
+      # Segments without active synapses reach the threshold too
+      return list(itertools.product(xrange(self.numberOfCols),
+                                    xrange(self.cellsPerColumn)))
+
+    return sorted(set((activity[0], activity[1])
+                      for activity in segmentActivity.itervalues()
+                      if activity[2] >= threshold))
+
+
   def getBestMatchingCell(self, c, activeState, minThreshold):
     """
     Find weakly activated cell in column with at least minThreshold active
@@ -2895,6 +3020,7 @@ class TP(ConsolePrinterMixin):
              "segment" % (candidateSegment.segID, colIdx, candidateCellIdx))
       candidateSegment.debugPrint()
     self.cleanUpdatesList(colIdx, candidateCellIdx, candidateSegment)
+    self._unindexSegment(candidateSegment)
     self.cells[colIdx][candidateCellIdx].remove(candidateSegment)
     return candidateCellIdx
 
@@ -3125,13 +3251,18 @@ class TP(ConsolePrinterMixin):
       # syn is now a tuple (src col, src cell)
       synsToAdd = [syn for syn in activeSynapses if type(syn) != int]
       # If we have fixed resources, get rid of some old syns if necessary
-      if self.maxSynapsesPerSegment > 0 \
-          and len(synsToAdd) + len(segment.syns) > self.maxSynapsesPerSegment:
+      freeSyns = (self.maxSynapsesPerSegment > 0 and
+          len(synsToAdd) + len(segment.syns) > self.maxSynapsesPerSegment)
+      if freeSyns or len(synsToAdd) > 0:
+        self._unindexSegment(segment)
+      if freeSyns:
         numToFree = (len(segment.syns) + len(synsToAdd) -
                      self.maxSynapsesPerSegment)
         segment.freeNSynapses(numToFree, inactiveSynIndices, self.verbosity)
       for newSyn in synsToAdd:
         segment.addSynapse(newSyn[0], newSyn[1], self.initialPerm)
+      if freeSyns or len(synsToAdd) > 0:
+        self._indexSegment(c, i, segment)
 
       if self.verbosity >= 4:
         print "   after:",
@@ -3153,6 +3284,7 @@ class TP(ConsolePrinterMixin):
         newSegment.debugPrint()
 
       self.cells[c][i].append(newSegment)
+      self._indexSegment(c, i, newSegment)
 
     return trimSegment
 
@@ -0,0 +1,495 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Connections implementation backed by flat NumPy arrays.
+"""
+
+import collections
+
+import numpy
+
+from nupic.research.connections import Connections, SynapseData
+
+
+
+# Marks a free slot in the segment and synapse tables
+FREE = -1
+
+# Initial number of slots allocated for segments and synapses
+INITIAL_CAPACITY = 1024
+
+# Fraction of indexed synapses that may change before the presynaptic index
+# is rebuilt
+INDEX_REBUILD_FRACTION = 0.1
+
+
+
+class ArrayConnections(Connections):
+  """
+  Class to hold data representing the connectivity of a collection of cells.
+
+  Has the same public API as `Connections`, but stores segments and synapses
+  in growable NumPy tables instead of per-synapse Python objects:
+
+    - segment -> cell
+    - synapse -> segment, presynaptic cell, permanence
+
+  Slots of destroyed segments and synapses are kept on free lists and reused
+  by later creations, so indices of destroyed segments / synapses may be
+  handed out again.
+  """
+
+
+  def __init__(self, numCells):
+    """
+    @param numCells (int) Number of cells in collection
+    """
+
+    # Save member variables
+    self.numCells = numCells
+
+    # Tables
+    self._segmentCell = numpy.empty(INITIAL_CAPACITY, dtype="int32")
+    self._synapseSegment = numpy.empty(INITIAL_CAPACITY, dtype="int32")
+    self._synapsePresynapticCell = numpy.empty(INITIAL_CAPACITY, dtype="int32")
+    self._synapsePermanence = numpy.empty(INITIAL_CAPACITY, dtype="float64")
+
+    # Indexes into the tables (for performance)
+    self._segmentsForCell = dict()
+    self._synapsesForSegment = dict()
+    self._synapseIdsForPresynapticCell = dict()
+
+    # Number of slots in use (including freed ones) in each table
+    self._numSegmentSlots = 0
+    self._numSynapseSlots = 0
+
+    # Slots of destroyed segments / synapses, available for reuse
+    self._freeSegments = []
+    self._freeSynapses = []
+
+    # Compressed (CSR) presynaptic cell -> synapses index, used by
+    # `computeActivity`. Synapses created since the last rebuild are kept in
+    # `_unindexedSynapses`; slots destroyed since then are masked out through
+    # `_synapseIndexed`.
+    self._indexOffsets = numpy.zeros(numCells + 1, dtype="int64")
+    self._indexSynapses = numpy.empty(0, dtype="int32")
+    self._synapseIndexed = numpy.zeros(INITIAL_CAPACITY, dtype="bool")
+    self._unindexedSynapses = set()
+    self._numStaleIndexEntries = 0
+
+
+  def cellForSegment(self, segment):
+    """
+    Returns the cell that a segment belongs to.
+
+    @param segment (int) Segment index
+
+    @return (int) Cell index
+    """
+    if not self._isSegment(segment):
+      raise KeyError(segment)
+
+    return int(self._segmentCell[segment])
+
+
+  def dataForSynapse(self, synapse):
+    """
+    Returns the data for a synapse.
+
+    @param synapse (int) Synapse index
+
+    @return (SynapseData) Synapse data
+    """
+    self._validateSynapse(synapse)
+
+    return self._dataForSynapse(synapse)
+
+
+  def synapsesForPresynapticCell(self, presynapticCell):
+    """
+    Returns the synapses for the source cell that they synapse on.
+
+    @param presynapticCell (int) Source cell index
+
+    @return (Mapping) Read-only mapping from synapse indices to synapse data.
+                      It is a view of the synapse tables: synapse data is
+                      only built for the synapses that are looked up.
+    """
+    synapses = self._synapseIdsForPresynapticCell.get(presynapticCell, ())
+
+    return _SynapseTableView(self, synapses)
+
+
+  def createSegment(self, cell):
+    """
+    Adds a new segment on a cell.
+
+    @param cell (int) Cell index
+
+    @return (int) New segment index
+    """
+    self._validateCell(cell)
+
+    # Add data
+    if len(self._freeSegments):
+      segment = self._freeSegments.pop()
+    else:
+      segment = self._numSegmentSlots
+      self._numSegmentSlots += 1
+      self._segmentCell = self._ensureCapacity(self._segmentCell,
+                                               self._numSegmentSlots)
+
+    self._segmentCell[segment] = cell
+
+    # Update indexes
+    if not cell in self._segmentsForCell:
+      self._segmentsForCell[cell] = set()
+    self._segmentsForCell[cell].add(segment)
+
+    return segment
+
+
+  def destroySegment(self, segment):
+    """
+    Destroys a segment.
+
+    @param segment (int) Segment index
+    """
+    synapses = set(self.synapsesForSegment(segment))
+    for synapse in synapses:
+      self.destroySynapse(synapse)
+
+    cell = self.cellForSegment(segment)
+    self._segmentCell[segment] = FREE
+    self._freeSegments.append(segment)
+
+    # Update indexes
+    self._segmentsForCell[cell].remove(segment)
+    self._synapsesForSegment.pop(segment, None)
+
+
+  def createSynapse(self, segment, presynapticCell, permanence):
+    """
+    Creates a new synapse on a segment.
+
+    @param segment         (int)   Segment index
+    @param presynapticCell (int)   Source cell index
+    @param permanence      (float) Initial permanence
+
+    @return (int) Synapse index
+    """
+    self._validateSegment(segment)
+    self._validatePermanence(permanence)
+
+    # Add data
+    if len(self._freeSynapses):
+      synapse = self._freeSynapses.pop()
+    else:
+      synapse = self._numSynapseSlots
+      self._numSynapseSlots += 1
+      self._growSynapseTables(self._numSynapseSlots)
+
+    self._synapseSegment[synapse] = segment
+    self._synapsePresynapticCell[synapse] = presynapticCell
+    self._synapsePermanence[synapse] = permanence
+    self._synapseIndexed[synapse] = False
+    self._unindexedSynapses.add(synapse)
+
+    # Update indexes
+    if not segment in self._synapsesForSegment:
+      self._synapsesForSegment[segment] = set()
+    self._synapsesForSegment[segment].add(synapse)
+
+    if not presynapticCell in self._synapseIdsForPresynapticCell:
+      self._synapseIdsForPresynapticCell[presynapticCell] = set()
+    self._synapseIdsForPresynapticCell[presynapticCell].add(synapse)
+
+    return synapse
+
+
+  def destroySynapse(self, synapse):
+    """
+    Destroys a synapse.
+
+    @param synapse (int) Synapse index
+    """
+    if not self._isSynapse(synapse):
+      raise KeyError(synapse)
+
+    segment = int(self._synapseSegment[synapse])
+    presynapticCell = int(self._synapsePresynapticCell[synapse])
+    self._synapseSegment[synapse] = FREE
+    self._freeSynapses.append(synapse)
+
+    if self._synapseIndexed[synapse]:
+      self._synapseIndexed[synapse] = False
+      self._numStaleIndexEntries += 1
+    else:
+      self._unindexedSynapses.discard(synapse)
+
+    # Update indexes
+    self._synapsesForSegment[segment].remove(synapse)
+    self._synapseIdsForPresynapticCell[presynapticCell].remove(synapse)
+
+
+  def updateSynapsePermanence(self, synapse, permanence):
+    """
+    Updates the permanence for a synapse.
+
+    @param synapse    (int)   Synapse index
+    @param permanence (float) New permanence
+    """
+    self._validatePermanence(permanence)
+
+    if not self._isSynapse(synapse):
+      raise KeyError(synapse)
+
+    self._synapsePermanence[synapse] = permanence
+
+
+  def numSegments(self):
+    """
+    Returns the number of segments.
+    """
+    return self._numSegmentSlots - len(self._freeSegments)
+
+
+  def numSynapses(self):
+    """
+    Returns the number of synapses.
+    """
+    return self._numSynapseSlots - len(self._freeSynapses)
+
+
+  def cellsForSegments(self, segments):
+    """
+    Returns the cells that segments belong to.
+
+    @param segments (numpy.ndarray) Segment indices
+
+    @return (numpy.ndarray) Cell indices
+    """
+    return self._segmentCell[segments]
+
+
+  def computeActivity(self, activeCells, connectedPermanence):
+    """
+    Computes the number of synapses on each segment that are active due to
+    lateral input from active cells, using the presynaptic index and
+    scatter-adds instead of visiting synapses one by one.
+
+    @param activeCells         (set)   Indices of active cells
+    @param connectedPermanence (float) Permanence at or above which a synapse
+                                       is connected
+
+    @return (tuple) Contains (both indexed by segment):
+                      `numActiveConnectedSynapsesForSegment` (numpy.ndarray),
+                      `numActiveSynapsesForSegment`          (numpy.ndarray)
+    """
+    if (len(self._unindexedSynapses) + self._numStaleIndexEntries >
+        INDEX_REBUILD_FRACTION * self._indexSynapses.size):
+      self._rebuildPresynapticIndex()
+
+    cells = numpy.fromiter(activeCells, dtype="int64", count=len(activeCells))
+
+    # Gather the indexed synapses of all active cells
+    starts = self._indexOffsets[cells]
+    lengths = self._indexOffsets[cells + 1] - starts
+    ends = numpy.cumsum(lengths)
+    positions = (numpy.arange(ends[-1] if ends.size else 0) +
+                 numpy.repeat(starts - ends + lengths, lengths))
+    synapses = self._indexSynapses[positions]
+    synapses = synapses[self._synapseIndexed[synapses]]
+
+    # Add synapses created since the index was built
+    if len(self._unindexedSynapses):
+      unindexed = numpy.fromiter(self._unindexedSynapses, dtype="int32",
+                                 count=len(self._unindexedSynapses))
+      isActiveCell = numpy.zeros(self.numCells, dtype="bool")
+      isActiveCell[cells] = True
+      unindexed = unindexed[
+        isActiveCell[self._synapsePresynapticCell[unindexed]]]
+      synapses = numpy.concatenate((synapses, unindexed))
+
+    segments = self._synapseSegment[synapses]
+    permanences = self._synapsePermanence[synapses]
+
+    # (Older NumPy versions require a positive `minlength`)
+    numSegmentSlots = max(self._numSegmentSlots, 1)
+    numActiveConnectedSynapsesForSegment = numpy.bincount(
+      segments[permanences >= connectedPermanence],
+      minlength=numSegmentSlots)
+    numActiveSynapsesForSegment = numpy.bincount(
+      segments[permanences > 0],
+      minlength=numSegmentSlots)
+
+    return numActiveConnectedSynapsesForSegment, numActiveSynapsesForSegment
+
+
+  def _rebuildPresynapticIndex(self):
+    """
+    Rebuilds the compressed presynaptic cell -> synapses index from the
+    synapse tables.
+    """
+    numSlots = self._numSynapseSlots
+    synapses = numpy.flatnonzero(
+      self._synapseSegment[:numSlots] != FREE).astype("int32")
+    presynapticCells = self._synapsePresynapticCell[synapses]
+
+    order = numpy.argsort(presynapticCells, kind="mergesort")
+    self._indexSynapses = synapses[order]
+    self._indexOffsets[0] = 0
+    numpy.cumsum(numpy.bincount(presynapticCells, minlength=self.numCells),
+                 out=self._indexOffsets[1:])
+
+    self._synapseIndexed[:numSlots] = False
+    self._synapseIndexed[synapses] = True
+    self._unindexedSynapses = set()
+    self._numStaleIndexEntries = 0
+
+
+  def _dataForSynapse(self, synapse):
+    """
+    Builds the synapse data for a synapse from the tables.
+
+    @param synapse (int) Synapse index
+
+    @return (SynapseData) Synapse data
+    """
+    return SynapseData(int(self._synapseSegment[synapse]),
+                       int(self._synapsePresynapticCell[synapse]),
+                       float(self._synapsePermanence[synapse]))
+
+
+  def _growSynapseTables(self, size):
+    """
+    Makes sure all synapse tables can hold at least `size` synapses.
+
+    @param size (int) Required number of slots
+    """
+    self._synapseSegment = self._ensureCapacity(
+      self._synapseSegment, size)
+    self._synapsePresynapticCell = self._ensureCapacity(
+      self._synapsePresynapticCell, size)
+    self._synapsePermanence = self._ensureCapacity(
+      self._synapsePermanence, size)
+    self._synapseIndexed = self._ensureCapacity(
+      self._synapseIndexed, size)
+
+
+  @staticmethod
+  def _ensureCapacity(table, size):
+    """
+    Returns `table`, or a copy of it with doubled capacity if it cannot hold
+    `size` elements.
+
+    @param table (numpy.ndarray) Table to grow
+    @param size  (int)           Required number of slots
+
+    @return (numpy.ndarray) Table with room for `size` elements
+    """
+    if size <= table.size:
+      return table
+
+    grown = numpy.empty(max(size, 2 * table.size), dtype=table.dtype)
+    grown[:table.size] = table
+    return grown
+
+
+  def _isSegment(self, segment):
+    """
+    Returns whether a segment index refers to an existing segment.
+
+    @param segment (int) Segment index
+    """
+    return (0 <= segment < self._numSegmentSlots and
+            self._segmentCell[segment] != FREE)
+
+
+  def _isSynapse(self, synapse):
+    """
+    Returns whether a synapse index refers to an existing synapse.
+
+    @param synapse (int) Synapse index
+    """
+    return (0 <= synapse < self._numSynapseSlots and
+            self._synapseSegment[synapse] != FREE)
+
+
+  def _validateSegment(self, segment):
+    """
+    Raises an error if segment index is invalid.
+
+    @param segment (int) Segment index
+    """
+    if not self._isSegment(segment):
+      raise IndexError("Invalid segment")
+
+
+  def _validateSynapse(self, synapse):
+    """
+    Raises an error if synapse index is invalid.
+
+    @param synapse (int) Synapse index
+    """
+    if not self._isSynapse(synapse):
+      raise IndexError("Invalid synapse")
+
+
+
+class _SynapseTableView(collections.Mapping):
+  """
+  Read-only mapping from synapse indices to synapse data, backed by the
+  synapse tables of an `ArrayConnections`.
+  """
+
+
+  def __init__(self, connections, synapses):
+    """
+    @param connections (ArrayConnections) Owner of the synapse tables
+    @param synapses    (set)              Synapse indices in the view
+    """
+    self._connections = connections
+    self._synapses = synapses
+
+
+  def __getitem__(self, synapse):
+    if synapse not in self._synapses:
+      raise KeyError(synapse)
+
+    return self._connections._dataForSynapse(synapse)
+
+
+  def __iter__(self):
+    return iter(self._synapses)
+
+
+  def __len__(self):
+    return len(self._synapses)
+
+
+  def __contains__(self, synapse):
+    return synapse in self._synapses
+
+
+  def __repr__(self):
+    return repr(dict(self.iteritems()))
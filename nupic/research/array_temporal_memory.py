@@ -0,0 +1,94 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Temporal Memory implementation in Python.
+"""
+
+import numpy
+
+from nupic.research.array_connections import ArrayConnections
+from nupic.research.temporal_memory import TemporalMemory
+
+
+
+class ArrayTemporalMemory(TemporalMemory):
+  """
+  Class implementing the Temporal Memory algorithm.
+
+  Uses the array-backed ArrayConnections data structure, and computes segment
+  activity for all active cells at once.
+  """
+
+  connectionsClass = ArrayConnections
+
+
+  def computePredictiveCells(self, activeCells, connections):
+    """
+    Phase 4: Compute predictive cells due to lateral input
+    on distal dendrites.
+
+    Pseudocode:
+
+      - for each distal dendrite segment with activity >= activationThreshold
+        - mark the segment as active
+        - mark the cell as predictive
+
+      - if predictedSegmentDecrement > 0
+        - for each distal dendrite segment with unconnected
+          activity >=  minThreshold
+          - mark the segment as matching
+          - mark the cell as matching
+
+    Forward propagates activity from active cells to the synapses that touch
+    them in one batch (see `ArrayConnections.computeActivity`), to determine
+    which synapses are active.
+
+    @param activeCells (set)              Indices of active cells in `t`
+    @param connections (ArrayConnections) Connectivity of layer
+
+    @return (tuple) Contains:
+                      `activeSegments`   (set),
+                      `predictiveCells`  (set),
+                      `matchingSegments` (set),
+                      `matchingCells`    (set)
+    """
+    (numActiveConnectedSynapsesForSegment,
+     numActiveSynapsesForSegment) = connections.computeActivity(
+       activeCells, self.connectedPermanence)
+
+    segments = numpy.flatnonzero(
+      (numActiveConnectedSynapsesForSegment > 0) &
+      (numActiveConnectedSynapsesForSegment >= self.activationThreshold))
+    activeSegments = set(segments.tolist())
+    predictiveCells = set(connections.cellsForSegments(segments).tolist())
+
+    if self.predictedSegmentDecrement > 0:
+      segments = numpy.flatnonzero(
+        (numActiveSynapsesForSegment > 0) &
+        (numActiveSynapsesForSegment >= self.minThreshold))
+      matchingSegments = set(segments.tolist())
+      matchingCells = set(connections.cellsForSegments(segments).tolist())
+    else:
+      matchingSegments = set()
+      matchingCells = set()
+
+    return activeSegments, predictiveCells, matchingSegments, matchingCells
@@ -304,6 +304,9 @@ class SpatialPooler(object):
     # radius is updated every learning round. It grows and shrinks with the
     # average number of connected synapses per column.
     self._inhibitionRadius = 0
+    self._neighborhoodKey = None
+    self._neighbors = numpy.zeros((0, 0), dtype="int32")
+    self._numNeighbors = numpy.zeros(0, dtype="int32")
     self._updateInhibitionRadius()
 
     if self._spVerbosity > 0:
@@ -716,6 +719,64 @@ class SpatialPooler(object):
       activeArray[activeColumns] = 1
 
 
+  def computeBatch(self, inputMatrix, learn=False):
+    """
+    Runs a batch of input vectors through the spatial pooler and returns the
+    active columns for each of them. Equivalent to calling 'compute' on each
+    row of 'inputMatrix' in turn.
+
+    Without learning, the overlaps of all the inputs are computed at once with
+    a single sparse-dense matrix product, and inhibition is then applied to
+    each row. With learning, every input has to see the permanences left by
+    the previous one, so the inputs are fed through 'compute' one at a time.
+
+    @param inputMatrix: A 2-D numpy array of 0's and 1's with one input vector
+        per row. Each row is treated as a one dimensional array and must
+        contain as many bits as specified by the call to the constructor.
+    @param learn: A boolean value indicating whether learning should be
+        performed (see 'compute').
+
+    @return: A 2-D array with one row per input vector and one column per SP
+        column, with 1's at the active columns of each input and 0's
+        everywhere else.
+    """
+    if not isinstance(inputMatrix, numpy.ndarray):
+      raise TypeError("Input matrix must be a numpy array, not %s" %
+                      str(type(inputMatrix)))
+
+    numRecords = inputMatrix.shape[0] if inputMatrix.ndim else 0
+    if inputMatrix.ndim < 2 or inputMatrix.size != numRecords * self._numInputs:
+      raise ValueError(
+          "Input matrix dimensions don't match. Expecting rows of %s but got "
+          "%s" % (self._numInputs, inputMatrix.shape))
+
+    inputMatrix = numpy.array(inputMatrix, dtype=realDType).reshape(
+      numRecords, self._numInputs)
+    activeArrays = numpy.zeros((numRecords, self._numColumns), dtype=uintType)
+
+    if learn:
+      for inputVector, activeArray in itertools.izip(inputMatrix, activeArrays):
+        self.compute(inputVector, True, activeArray)
+      return activeArrays
+
+    if numRecords == 0:
+      return activeArrays
+
+    # inputs x columns overlaps = inputMatrix * transpose(connectedSynapses)
+    inputsToColumns = SparseMatrix(self._connectedSynapses)
+    inputsToColumns.transpose()
+    allOverlaps = inputsToColumns.leftDenseMatProd(inputMatrix)
+    allOverlaps[allOverlaps < self._stimulusThreshold] = 0
+
+    for overlaps, activeArray in itertools.izip(allOverlaps, activeArrays):
+      self._updateBookeepingVars(False)
+      activeColumns = self._inhibitColumns(overlaps)
+      if activeColumns.size > 0:
+        activeArray[activeColumns] = 1
+
+    return activeArrays
+
+
   def stripUnlearnedColumns(self, activeArray):
     """Removes the set of columns who have never been active from the set of
     active columns selected in the inhibition round. Such columns cannot
@@ -848,6 +909,7 @@ class SpatialPooler(object):
     radius = (diameter - 1) / 2.0
     radius = max(1.0, radius)
     self._inhibitionRadius = int(round(radius))
+    self._updateNeighborhoods()
 
 
   def _avgColumnsPerInput(self):
@@ -1365,12 +1427,20 @@ class SpatialPooler(object):
     #calculate num active per inhibition area
 
     numActive = int(density * self._numColumns)
-    activeColumns = numpy.zeros(self._numColumns)
-    winners = sorted(range(overlaps.size),
-                     key=lambda k: overlaps[k],
-                     reverse=True)[0:numActive]
-    activeColumns[winners] = 1
-    return numpy.where(activeColumns > 0)[0]
+    if numActive <= 0:
+      return numpy.zeros(0, dtype=int)
+    if numActive >= overlaps.size:
+      return numpy.arange(overlaps.size)
+
+    # Select the overlap score of the numActive-th best column in linear time.
+    # All columns scoring above it win; ties at that score go to the columns
+    # with the lowest indices, as with a stable descending sort.
+    threshold = numpy.partition(overlaps,
+                                overlaps.size - numActive)[-numActive]
+    activeColumns = overlaps > threshold
+    ties = numpy.where(overlaps == threshold)[0]
+    activeColumns[ties[:numActive - numpy.count_nonzero(activeColumns)]] = True
+    return numpy.where(activeColumns)[0]
 
 
   def _inhibitColumnsLocal(self, overlaps, density):
@@ -1392,19 +1462,114 @@ class SpatialPooler(object):
                     columns are picked in a local fashion, the exact fraction
                     of surviving columns is likely to vary.
     """
-    activeColumns = numpy.zeros(self._numColumns)
     addToWinners = max(overlaps)/1000.0
     overlaps = numpy.array(overlaps, dtype=realDType)
-    for i in xrange(self._numColumns):
-      maskNeighbors = self._getNeighborsND(i, self._columnDimensions,
-        self._inhibitionRadius)
-      overlapSlice = overlaps[maskNeighbors]
-      numActive = int(0.5 + density * (len(maskNeighbors) + 1))
-      numBigger = numpy.count_nonzero(overlapSlice > overlaps[i])
-      if numBigger < numActive:
-        activeColumns[i] = 1
-        overlaps[i] += addToWinners
-    return numpy.where(activeColumns > 0)[0]
+    self._getNeighborhoods()
+
+    # Columns are visited in index order, and each winner's overlap is bumped
+    # up by 'addToWinners' before the following columns compare against it.
+    # 'boosted' holds these bumped up overlaps.
+    boosted = (overlaps.astype(numpy.float64) +
+               addToWinners).astype(realDType)
+    paddedOverlaps = numpy.append(overlaps, -numpy.inf).astype(realDType)
+    paddedBoosted = numpy.append(boosted, -numpy.inf).astype(realDType)
+
+    numActive = (0.5 + density * (self._numNeighbors + 1)).astype(int)
+    numBigger = numpy.zeros(self._numColumns, dtype=int)
+    nearTies = dict()
+
+    # Process the neighborhood table in blocks of rows to bound memory use
+    numNeighbors = max(1, self._neighbors.shape[1])
+    blockSize = max(1, 2**20 / numNeighbors)
+    for start in xrange(0, self._numColumns, blockSize):
+      stop = min(start + blockSize, self._numColumns)
+      neighbors = self._neighbors[start:stop]
+      columnOverlaps = overlaps[start:stop, numpy.newaxis]
+      neighborOverlaps = paddedOverlaps[neighbors]
+
+      numBigger[start:stop] = (neighborOverlaps > columnOverlaps).sum(axis=1)
+
+      # Earlier neighbors that only beat a column once bumped up. Whether
+      # they do depends on whether they won.
+      isNearTie = ((neighbors < numpy.arange(start, stop)[:, numpy.newaxis]) &
+                   (neighborOverlaps <= columnOverlaps) &
+                   (paddedBoosted[neighbors] > columnOverlaps))
+      for row in numpy.where(isNearTie.any(axis=1))[0]:
+        nearTies[start + row] = neighbors[row][isNearTie[row]]
+
+    activeColumns = numBigger < numActive
+    for i in sorted(nearTies):
+      numBiggerWinners = numpy.count_nonzero(activeColumns[nearTies[i]])
+      activeColumns[i] = numBigger[i] + numBiggerWinners < numActive[i]
+
+    return numpy.where(activeColumns)[0]
+
+
+  def _getNeighborhoods(self):
+    """
+    Makes sure the precomputed neighborhood tables (see _updateNeighborhoods)
+    match the current inhibition radius and column dimensions, rebuilding them
+    otherwise.
+    """
+    key = (int(self._inhibitionRadius),) + tuple(
+      int(dim) for dim in self._columnDimensions)
+    if key != self._neighborhoodKey:
+      self._buildNeighborhoods(key)
+
+
+  def _updateNeighborhoods(self):
+    """
+    Precomputes the local inhibition neighborhood of every column for the
+    current inhibition radius, so that _inhibitColumnsLocal doesn't have to
+    call _getNeighborsND for each column on every compute. Nothing is stored
+    when inhibition is global.
+    """
+    if (self._globalInhibition or
+        self._inhibitionRadius > max(self._columnDimensions)):
+      self._neighborhoodKey = None
+      self._neighbors = numpy.zeros((0, 0), dtype="int32")
+      self._numNeighbors = numpy.zeros(0, dtype="int32")
+    else:
+      self._getNeighborhoods()
+
+
+  def _buildNeighborhoods(self, key):
+    """
+    Builds the neighborhood tables. Row 'i' of 'self._neighbors' contains the
+    same column indices as _getNeighborsND(i, columnDimensions,
+    inhibitionRadius), padded with 'self._numColumns' up to the size of the
+    largest neighborhood. 'self._numNeighbors[i]' is the number of neighbors
+    of column 'i'.
+
+    Parameters:
+    ----------------------------
+    @param key: the inhibition radius followed by the column dimensions the
+                tables are built for.
+    """
+    radius = key[0]
+    dimensions = numpy.array(key[1:])
+    numColumns = int(dimensions.prod())
+
+    offsets = numpy.array(list(itertools.product(range(-radius, radius + 1),
+                                                 repeat=dimensions.size)))
+    offsets = offsets[numpy.any(offsets != 0, axis=1)]
+
+    columnCoords = numpy.array(numpy.unravel_index(numpy.arange(numColumns),
+                                                   dimensions))
+    neighbors = numpy.empty((numColumns, len(offsets)), dtype="int32")
+    for k, offset in enumerate(offsets):
+      coords = columnCoords + offset[:, numpy.newaxis]
+      valid = numpy.all((coords >= 0) &
+                        (coords < dimensions[:, numpy.newaxis]), axis=0)
+      neighbors[:, k] = numpy.where(
+        valid,
+        numpy.ravel_multi_index(coords, dimensions, mode="clip"),
+        numColumns)
+
+    self._neighbors = neighbors
+    self._numNeighbors = numpy.sum(neighbors < numColumns,
+                                   axis=1).astype("int32")
+    self._neighborhoodKey = key
 
 
   @staticmethod
@@ -1579,6 +1744,17 @@ class SpatialPooler(object):
       self._random = NupicRandom()
 
 
+  def __getstate__(self):
+    """
+    Return serializable state. The neighborhood tables are left out: they are
+    rebuilt from the inhibition radius and column dimensions when loading.
+    """
+    state = self.__dict__.copy()
+    for name in ("_neighborhoodKey", "_neighbors", "_numNeighbors"):
+      state.pop(name, None)
+    return state
+
+
   def __setstate__(self, state):
     """
     Initialize class properties from stored values.
@@ -1591,6 +1767,8 @@ class SpatialPooler(object):
     # update version property to current SP version
     state['_version'] = VERSION
     self.__dict__.update(state)
+    self._neighborhoodKey = None
+    self._updateNeighborhoods()
 
 
   def write(self, proto):
@@ -1720,6 +1898,8 @@ class SpatialPooler(object):
                                             dtype=realDType)
     self._boostFactors = numpy.array(proto.boostFactors, dtype=realDType)
 
+    self._updateNeighborhoods()
+
 
   def printParameters(self):
     """
@@ -38,8 +38,13 @@ EPSILON = 0.0000001
 class TemporalMemory(object):
   """
   Class implementing the Temporal Memory algorithm.
+
+  The data structure used to store connectivity is given by `connectionsClass`
+  (e.g. `nupic.research.array_connections.ArrayConnections` for large models).
   """
 
+  connectionsClass = Connections
+
   def __init__(self,
                columnDimensions=(2048,),
                cellsPerColumn=32,
@@ -86,7 +91,7 @@ class TemporalMemory(object):
     self.permanenceDecrement = permanenceDecrement
     self.predictedSegmentDecrement = predictedSegmentDecrement
     # Initialize member variables
-    self.connections = Connections(self.numberOfCells())
+    self.connections = self.connectionsClass(self.numberOfCells())
     self._random = Random(seed)
 
     self.activeCells = set()
@@ -766,7 +771,7 @@ class TemporalMemory(object):
     tm.permanenceDecrement = proto.permanenceDecrement
     tm.predictedSegmentDecrement = proto.predictedSegmentDecrement
 
-    tm.connections = Connections.read(proto.connections)
+    tm.connections = cls.connectionsClass.read(proto.connections)
     tm._random = Random()
     tm._random.read(proto.random)
 
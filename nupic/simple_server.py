@@ -20,7 +20,8 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 """
-A simple web server for interacting with NuPIC.
+A simple web server for interacting with NuPIC. The models are hosted in the
+worker processes of a ModelHost.
 Note: Requires web.py to run (install using '$ pip install web.py')
 """
 import os
@@ -37,25 +38,53 @@ while True:
 
 import datetime
 import json
+import threading
 import web
 
-from nupic.frameworks.opf.modelfactory import ModelFactory
+from nupic.frameworks.opf.model_host import ModelHost, ModelHostError
 
 
 
-g_models = {}
+g_modelHost = None
+g_modelHostLock = threading.Lock()
 
 
 
 urls = (
     # Web UI
     "/models", "ModelHandler",
+    "/models/run", "BatchRunner",
+    "/stats", "StatsHandler",
     r"/models/([-\w]*)", "ModelHandler",
     r"/models/([-\w]*)/run", "ModelRunner",
 )
 
 
 
+def _getModelHost():
+  """ Start the model host on first use. web.py serves requests from several
+  threads, so only one of them may create it. """
+  global g_modelHost
+  with g_modelHostLock:
+    if g_modelHost is None:
+      g_modelHost = ModelHost()
+  return g_modelHost
+
+
+
+def _parseRecord(data):
+  data["timestamp"] = datetime.datetime.strptime(
+      data["timestamp"], "%m/%d/%y %H:%M")
+  return data
+
+
+
+def _formatResult(modelResult):
+  return {"predictionNumber": modelResult.predictionNumber,
+          "anomalyScore": modelResult.inferences["anomalyScore"]}
+
+
+
 class ModelHandler(object):
 
   def GET(self):
@@ -65,8 +94,7 @@ class ModelHandler(object):
     returns:
     [model1, model2, model3, ...] list of model names
     """
-    global g_models
-    return json.dumps({"models": g_models.keys()})
+    return json.dumps({"models": _getModelHost().getModelNames()})
 
 
   def POST(self, name):
@@ -82,18 +110,19 @@ class ModelHandler(object):
     returns:
     {"success":name}
     """
-    global g_models
+    modelHost = _getModelHost()
 
     data = json.loads(web.data())
     modelParams = data["modelParams"]
     predictedFieldName = data["predictedFieldName"]
 
-    if name in g_models.keys():
+    if modelHost.hasModel(name):
       raise web.badrequest("Model with name <%s> already exists" % name)
 
-    model = ModelFactory.create(modelParams)
-    model.enableInference({'predictedField': predictedFieldName})
-    g_models[name] = model
+    try:
+      modelHost.createModel(name, modelParams, predictedFieldName)
+    except ModelHostError as e:
+      raise web.badrequest(str(e))
 
     return json.dumps({"success": name})
 
@@ -119,21 +148,74 @@ class ModelRunner(object):
       "anomalyScore":anomalyScore
     }
     """
-    global g_models
+    modelHost = _getModelHost()
 
-    data = json.loads(web.data())
-    data["timestamp"] = datetime.datetime.strptime(
-        data["timestamp"], "%m/%d/%y %H:%M")
+    data = _parseRecord(json.loads(web.data()))
 
-    if name not in g_models.keys():
+    if not modelHost.hasModel(name):
       raise web.notfound("Model with name <%s> does not exist." % name)
 
-    modelResult = g_models[name].run(data)
-    predictionNumber = modelResult.predictionNumber
-    anomalyScore = modelResult.inferences["anomalyScore"]
+    try:
+      modelResult = modelHost.run(name, data)
+    except ModelHostError as e:
+      raise web.badrequest(str(e))
+
+    return json.dumps(_formatResult(modelResult))
+
+
+
+class BatchRunner(object):
 
-    return json.dumps({"predictionNumber": predictionNumber,
-                       "anomalyScore": anomalyScore})
+  def POST(self):
+    """
+    /models/run
+
+    schema:
+      {
+        modelName: [record, record, ...],
+        ...
+      }
+      where each record has the same schema as for /models/{name}/run
+
+    returns:
+    {
+      modelName: [{"predictionNumber":..., "anomalyScore":...}, ...],
+      failedModelName: {"error": message},
+      ...
+    }
+    where a model that failed to run its records is reported with the error
+    message from its worker, without affecting the results of the others.
+    """
+    modelHost = _getModelHost()
+
+    batch = json.loads(web.data())
+    for (name, records) in batch.iteritems():
+      if not modelHost.hasModel(name):
+        raise web.notfound("Model with name <%s> does not exist." % name)
+      for record in records:
+        _parseRecord(record)
+
+    response = {}
+    for (name, modelResults) in modelHost.runBatch(batch).iteritems():
+      if isinstance(modelResults, ModelHostError):
+        response[name] = {"error": str(modelResults)}
+      else:
+        response[name] = [_formatResult(r) for r in modelResults]
+
+    return json.dumps(response)
+
+
+
+class StatsHandler(object):
+
+  def GET(self):
+    """
+    /stats
+
+    returns: the throughput and latency counters of the model host, see
+             ModelHost.getStats()
+    """
+    return json.dumps(_getModelHost().getStats())
 
 
 
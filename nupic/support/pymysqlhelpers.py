@@ -24,6 +24,7 @@
 import inspect
 import logging
 from socket import error as socket_error
+import sqlite3
 
 import pymysql
 from pymysql.constants import ER
@@ -124,6 +125,12 @@ def retrySQL(timeoutSec=60*5, getLoggerCallback=logging.getLogger):
       if (e.args and
           inspect.isclass(e.args[0]) and issubclass(e.args[0], socket_error)):
         return True
+
+    elif isinstance(e, sqlite3.OperationalError):
+      # The SQLite backend of the cluster database timed out waiting for
+      # another process to release a lock
+      if "locked" in str(e):
+        return True
       
     return False
   
@@ -132,6 +139,7 @@ def retrySQL(timeoutSec=60*5, getLoggerCallback=logging.getLogger):
     pymysql.InternalError,
     pymysql.OperationalError,
     pymysql.Error,
+    sqlite3.OperationalError,
   ])
   
   return make_retry_decorator(
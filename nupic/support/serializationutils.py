@@ -24,8 +24,18 @@
 A series of functions useful to serializing data beyond json or pickle
 '''
 
+import cPickle as pickle
 import json
 import bz2
+import os
+import types
+
+import numpy
+
+
+
+# Numpy arrays smaller than this are cheaper to unpickle than to map
+MIN_MAPPED_ARRAY_BYTES = 4096
 
 
 
@@ -74,3 +84,122 @@ def sortedJSONDumpS(obj):
   else:
     return json.dumps(obj)
 
+
+
+def isMappableArray(value, minBytes=MIN_MAPPED_ARRAY_BYTES):
+  """
+  Return True if value is a numpy array that is worth storing as a raw .npy
+  file and memory-mapping back
+  """
+  return (isinstance(value, numpy.ndarray) and not value.dtype.hasobject and
+          value.nbytes >= minBytes)
+
+
+
+def loadMappedArray(filePath):
+  """
+  Memory-map a .npy file copy-on-write: pages are read from the file when
+  first touched, and writes go to private memory, never to the file
+  """
+  return numpy.load(filePath, mmap_mode="c")
+
+
+
+def dumpWithArrays(pyObject, f, arrayDir, minBytes=MIN_MAPPED_ARRAY_BYTES):
+  """
+  Pickle pyObject to the file f, storing each large numpy array in it as a
+  raw .npy file in arrayDir instead of in the pickle. Load with
+  loadWithArrays().
+  """
+  # id -> (file name, array); the arrays are kept so that their ids stay
+  # unique while pickling
+  arrayFiles = {}
+
+  def persistentId(obj):
+    if not isMappableArray(obj, minBytes):
+      return None
+    if id(obj) not in arrayFiles:
+      if not os.path.isdir(arrayDir):
+        os.makedirs(arrayDir)
+      fileName = "array%d.npy" % len(arrayFiles)
+      numpy.save(os.path.join(arrayDir, fileName), obj)
+      arrayFiles[id(obj)] = (fileName, obj)
+    return arrayFiles[id(obj)][0]
+
+  pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+  pickler.persistent_id = persistentId
+  pickler.dump(pyObject)
+
+
+
+def loadWithArrays(f, arrayDir):
+  """
+  Unpickle an object written by dumpWithArrays(), memory-mapping its large
+  arrays copy-on-write
+  """
+  arrays = {}
+
+  def persistentLoad(fileName):
+    if fileName not in arrays:
+      arrays[fileName] = loadMappedArray(os.path.join(arrayDir, fileName))
+    return arrays[fileName]
+
+  unpickler = pickle.Unpickler(f)
+  unpickler.persistent_load = persistentLoad
+  return unpickler.load()
+
+
+
+def findMappableArrays(pyObject, maxDepth=3, minBytes=MIN_MAPPED_ARRAY_BYTES):
+  """
+  Find the large numpy arrays held in the attributes of pyObject and of its
+  attribute objects, up to maxDepth levels down.
+
+  Returns a list of (attrPath, owner, attrName, array) tuples, where attrPath
+  is the dotted path of the attribute from pyObject (e.g.
+  "_sfdr._activeDutyCycles") and owner is the object holding it.
+  """
+  found = []
+  visited = set()
+
+  def visit(obj, prefix, depth):
+    if id(obj) in visited:
+      return
+    visited.add(id(obj))
+
+    attrs = sorted(vars(obj).items())
+
+    # Arrays that the object leaves out of its pickled state, e.g. tables it
+    # rebuilds on load, are not saved either. The state is only needed, and
+    # only computed, if the object holds arrays itself.
+    state = None
+    getState = getattr(type(obj), "__getstate__", None)
+    if getState is not None and any(isMappableArray(value, minBytes)
+                                    for (_, value) in attrs):
+      state = getState(obj)
+      if not isinstance(state, dict):
+        state = None
+
+    for (attrName, value) in attrs:
+      if isMappableArray(value, minBytes):
+        if state is None or attrName in state:
+          found.append((prefix + attrName, obj, attrName, value))
+      elif (depth < maxDepth and hasattr(value, "__dict__") and
+            not isinstance(value, (type, types.ClassType, types.ModuleType))):
+        visit(value, prefix + attrName + ".", depth + 1)
+
+  visit(pyObject, "", 1)
+  return found
+
+
+
+def resolveAttrPath(pyObject, attrPath):
+  """
+  Return the (owner, attrName) pair for a dotted attrPath from pyObject, as
+  returned by findMappableArrays()
+  """
+  names = attrPath.split(".")
+  owner = pyObject
+  for name in names[:-1]:
+    owner = getattr(owner, name)
+  return (owner, names[-1])
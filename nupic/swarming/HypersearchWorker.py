@@ -39,6 +39,7 @@ from nupic.support.configuration import Configuration
 from nupic.support.ExtendedLogger import ExtendedLogger
 from nupic.support.errorcodes import ErrorCodes
 from nupic.database.ClientJobsDAO import ClientJobsDAO
+from nupic.swarming import utils
 from HypersearchV2 import HypersearchV2
 
 
@@ -115,12 +116,13 @@ class HypersearchWorker(object):
     # This is a dict of modelID -> updateCounter
     self._modelIDCtrDict = dict()
 
-    # This is the above is a list of tuples: (modelID, updateCounter)
-    self._modelIDCtrList = []
-
     # This is just the set of modelIDs (keys)
     self._modelIDSet = set()
 
+    # The change sequence number of the last model change we received. Only
+    # the models changed after it are read from the database.
+    self._lastModelChangeSeq = 0
+
     # This will be filled in by run()
     self._workerID = None
 
@@ -131,44 +133,37 @@ class HypersearchWorker(object):
     """
 
 
-    # Get the latest update counters. This returns a list of tuples:
-    #  (modelID, updateCounter)
-    curModelIDCtrList = cjDAO.modelsGetUpdateCounters(self._options.jobID)
-    if len(curModelIDCtrList) == 0:
+    # Get the models changed since the last call. This returns a list of
+    #  tuples: (modelID, updateCounter, engChangeSeq), sorted by engChangeSeq
+    changes = cjDAO.modelsGetChangesSince(self._options.jobID,
+                                          self._lastModelChangeSeq)
+    if len(changes) == 0:
       return
 
-    self.logger.debug("current modelID/updateCounters: %s" \
-                      % (str(curModelIDCtrList)))
-    self.logger.debug("last modelID/updateCounters: %s" \
-                      % (str(self._modelIDCtrList)))
+    self.logger.debug("changed modelID/updateCounters since change %d: %s" \
+                      % (self._lastModelChangeSeq,
+                         str([(x[0], x[1]) for x in changes])))
+    self._lastModelChangeSeq = changes[-1].engChangeSeq
+
+    # A model may have changed several times; keep its latest counter
+    curModelIDCtrDict = dict((x.modelId, x.updateCounter) for x in changes)
 
     # --------------------------------------------------------------------
     # Find out which ones have changed update counters. Since these are models
     # that the Hypersearch implementation already knows about, we don't need to
     # send params or paramsHash
-    curModelIDCtrList = sorted(curModelIDCtrList)
-    numItems = len(curModelIDCtrList)
+    changedModelIDs = [modelID for (modelID, curCtr)
+                       in curModelIDCtrDict.iteritems()
+                       if modelID in self._modelIDSet
+                       and curCtr != self._modelIDCtrDict[modelID]]
 
-    # Each item in the list we are filtering contains:
-    #  (idxIntoModelIDCtrList, (modelID, curCtr), (modelID, oldCtr))
-    # We only want to keep the ones where the oldCtr != curCtr
-    changedEntries = filter(lambda x:x[1][1] != x[2][1],
-                      itertools.izip(xrange(numItems), curModelIDCtrList,
-                                     self._modelIDCtrList))
-
-    if len(changedEntries) > 0:
+    if len(changedModelIDs) > 0:
       # Update values in our cache
-      self.logger.debug("changedEntries: %s", str(changedEntries))
-      for entry in changedEntries:
-        (idx, (modelID, curCtr), (_, oldCtr)) = entry
-        self._modelIDCtrDict[modelID] = curCtr
-        assert (self._modelIDCtrList[idx][0] == modelID)
-        assert (curCtr != oldCtr)
-        self._modelIDCtrList[idx][1] = curCtr
-
+      self.logger.debug("changedModelIDs: %s", str(changedModelIDs))
+      for modelID in changedModelIDs:
+        self._modelIDCtrDict[modelID] = curModelIDCtrDict[modelID]
 
       # Tell Hypersearch implementation of the updated results for each model
-      changedModelIDs = [x[1][0] for x in changedEntries]
       modelResults = cjDAO.modelsGetResultAndStatus(changedModelIDs)
       for mResult in modelResults:
         results = mResult.results
@@ -186,13 +181,11 @@ class HypersearchWorker(object):
     # --------------------------------------------------------------------
     # Figure out which ones are newly arrived and add them to our
     #   cache
-    curModelIDSet = set([x[0] for x in curModelIDCtrList])
-    newModelIDs = curModelIDSet.difference(self._modelIDSet)
+    newModelIDs = set(curModelIDCtrDict).difference(self._modelIDSet)
     if len(newModelIDs) > 0:
 
       # Add new modelID and counters to our cache
       self._modelIDSet.update(newModelIDs)
-      curModelIDCtrDict = dict(curModelIDCtrList)
 
       # Get the results for each of these models and send them to the
       #  Hypersearch implementation.
@@ -209,7 +202,6 @@ class HypersearchWorker(object):
 
         # Update our cache of IDs and update counters
         self._modelIDCtrDict[modelID] = curModelIDCtrDict[modelID]
-        self._modelIDCtrList.append([modelID, curModelIDCtrDict[modelID]])
 
         # Tell the Hypersearch implementation of the new model
         results = mResult.results
@@ -226,12 +218,6 @@ class HypersearchWorker(object):
             numRecords = mResult.numRecords)
 
 
-
-
-      # Keep our list sorted
-      self._modelIDCtrList.sort()
-
-
   def run(self):
     """ Run this worker.
 
@@ -328,10 +314,10 @@ class HypersearchWorker(object):
             # -----------------------------------------------------------------
             # Get the latest results on all running models and send them to
             #  the Hypersearch implementation
-            # This calls cjDAO.modelsGetUpdateCounters(), compares the
-            # updateCounters with what we have cached, fetches the results for the
-            # changed and new models, and sends those to the Hypersearch
-            # implementation's self._hs.recordModelProgress() method.
+            # This calls cjDAO.modelsGetChangesSince() to get the models changed
+            # since the last call, fetches the results for the changed and new
+            # models, and sends those to the Hypersearch implementation's
+            # self._hs.recordModelProgress() method.
             self._processUpdatedModels(cjDAO)
   
             # --------------------------------------------------------------------
@@ -460,6 +446,11 @@ class HypersearchWorker(object):
           exit = True
         # ^^^ end while not exit
 
+      # The search is over, so no model of the job will read the input cache
+      # again
+      if options.modelID is None:
+        utils.removeInputCache(options.jobID)
+
     finally:
       # Provide Hypersearch instance an opportunity to clean up temporary files
       self._hs.close()
@@ -163,6 +163,10 @@ class OPFModelRunner(object):
     # Interface to write predictions to a persistent storage
     self._predictionLogger = None
 
+    # Background thread that completes the latest model checkpoint; set by
+    # __createModelCheckpoint()
+    self._checkpointThread = None
+
     # In-memory cache for predictions. Predictions are written here for speed
     # when they don't need to be written to a persistent store
     self.__predictionCache = deque()
@@ -232,8 +236,11 @@ class OPFModelRunner(object):
     from nupic.data.stream_reader import StreamReader
     readTimeout = 0
 
-    self._inputSource = StreamReader(streamDef, isBlocking=False,
-                                     maxTimeout=readTimeout)
+    if Configuration.getBool('nupic.hypersearch.inputCache.enabled'):
+      self._inputSource = self._openCachedInputSource(streamDef)
+    if self._inputSource is None:
+      self._inputSource = StreamReader(streamDef, isBlocking=False,
+                                       maxTimeout=readTimeout)
 
 
     # -----------------------------------------------------------------------
@@ -419,6 +426,8 @@ class OPFModelRunner(object):
     if self._predictionLogger:
       self._predictionLogger.close()
 
+    self.__waitForModelCheckpoint()
+
 
   def __createModelCheckpoint(self):
     """ Create a checkpoint from the current model, and store it in a dir named
@@ -436,14 +445,33 @@ class OPFModelRunner(object):
       checkpointSink=predictions,
       maxRows=int(Configuration.get('nupic.model.checkpoint.maxPredictionRows')))
 
-    self._model.save(os.path.join(self._experimentDir, str(self._modelCheckpointGUID)))
-    self._jobsDAO.modelSetFields(modelID,
+    # The model state is written right away; the rest of the checkpoint is
+    # completed in the background while the job results are updated
+    self.__waitForModelCheckpoint()
+    self._checkpointThread = self._model.save(
+      os.path.join(self._experimentDir, str(self._modelCheckpointGUID)),
+      background=True)
+    return
+
+
+  def __waitForModelCheckpoint(self):
+    """ Wait for the background completion of the latest model checkpoint,
+    and only then record it in the Models DB. Errors raised by the background
+    save are re-raised here. """
+    if self._checkpointThread is None:
+      return
+
+    thread = self._checkpointThread
+    self._checkpointThread = None
+    thread.join()
+
+    self._jobsDAO.modelSetFields(self._modelID,
                                  {'modelCheckpointId':str(self._modelCheckpointGUID)},
                                  ignoreUnchanged=True)
 
     self._logger.info("Checkpointed Hypersearch Model: modelID: %r, "
-                      "checkpointID: %r", self._modelID, checkpointID)
-    return
+                      "checkpointID: %r", self._modelID,
+                      self._modelCheckpointGUID)
 
 
   def __deleteModelCheckpoint(self, modelID):
@@ -458,6 +486,9 @@ class OPFModelRunner(object):
                   unique checkpointID
     """
 
+    # A checkpoint still being saved is only recorded once it completes
+    self.__waitForModelCheckpoint()
+
     checkpointID = \
         self._jobsDAO.modelsGetFields(modelID, ['modelCheckpointId'])[0]
 
@@ -527,6 +558,25 @@ class OPFModelRunner(object):
     return self.__metricMgr.getMetricLabels()
 
 
+  def _openCachedInputSource(self, streamDef):
+    """ Open the job-level cache of the records of streamDef, which is shared
+    by all the models of the job, building it if this is the first model to
+    read them.
+
+    Parameters:
+    -------------------------------------------------------------------------
+    streamDef:   the stream definition of the dataset
+    retval:      a CachedRecordStream, or None if the dataset can't be cached
+    """
+    from nupic.data.record_cache import openRecordCache, RecordCacheError
+
+    try:
+      return openRecordCache(streamDef, utils.getInputCacheDir(self._jobID))
+    except RecordCacheError as e:
+      self._logger.info("Reading the dataset without the input cache: %s", e)
+      return None
+
+
   def _getFieldStats(self):
     """
     Method which returns a dictionary of field statistics received from the
@@ -35,6 +35,7 @@ import uuid
 
 from nupic.database.ClientJobsDAO import (
     ClientJobsDAO, InvalidConnectionException)
+from nupic.support.configuration import Configuration
 
 
 class JobFailException(Exception):
@@ -559,3 +560,34 @@ def generatePersistentJobGUID():
 
   """
   return "JOB_UUID1-" + str(uuid.uuid1())
+
+
+
+def getInputCacheDir(jobID):
+  """Returns the directory of the input record caches shared by the models of
+  a job.
+
+  Parameters:
+  ----------------------------------------------------------------------
+  jobID:           ID of the job
+  retval:          Absolute directory path
+
+  """
+  cacheRoot = Configuration.get('nupic.hypersearch.inputCache.dir')
+  if not cacheRoot:
+    cacheRoot = os.path.join(tempfile.gettempdir(), 'nupic_input_cache')
+  return os.path.abspath(os.path.join(cacheRoot, 'job_%s' % (jobID,)))
+
+
+
+def removeInputCache(jobID):
+  """Deletes the input record caches of a job once its search is over. Models
+  still running keep reading the arrays they have memory-mapped. Every worker
+  of the job does this when it exits, so errors are ignored.
+
+  Parameters:
+  ----------------------------------------------------------------------
+  jobID:           ID of the job
+
+  """
+  shutil.rmtree(getInputCacheDir(jobID), ignore_errors=True)
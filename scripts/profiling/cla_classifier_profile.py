@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+## run python $NUPIC/scripts/profiling/cla_classifier_profile.py \
+##     [nSteps nRecords]
+##   to measure the throughput of the python classifiers predicting 1..nSteps
+##   steps ahead
+## run python -m cProfile --sort cumtime \
+##     $NUPIC/scripts/profiling/cla_classifier_profile.py [nSteps nRecords]
+##   for a profile of the same run
+
+import sys
+import timeit
+import numpy
+# chose desired classifier implementations to compare:
+from nupic.algorithms.CLAClassifier import CLAClassifier
+from nupic.algorithms.cla_classifier_dense import DenseCLAClassifier
+
+
+def profileClassifier(classifierClass, nSteps, nRecords, patterns):
+  """
+  profiling throughput of a CLA classifier learning and inferring 1..nSteps
+  step predictions on every record
+
+  @param classifierClass implementation of the classifier (py, dense, ..)
+  @param nSteps number of prediction steps (steps = 1..nSteps)
+  @param nRecords number of records to classify
+  @param patterns list of activation patterns, cycled through
+  """
+  classifier = classifierClass(steps=range(1, nSteps + 1))
+
+  for i in xrange(nRecords):
+    bucketIdx = i % 100
+    classification = {"bucketIdx": bucketIdx, "actValue": float(bucketIdx)}
+
+    # the actual function to profile!
+    classifier.compute(i, patterns[i % len(patterns)], classification,
+                       learn=True, infer=True)
+
+
+
+if __name__ == "__main__":
+  steps=24
+  records=1000
+  # read command line params
+  if len(sys.argv) == 3: # 2 args + name
+    steps=int(sys.argv[1])
+    records=int(sys.argv[2])
+
+  # TM-like activation patterns: 40 active columns of 2048, 32 cells each
+  numpy.random.seed(42)
+  patterns = [sorted(numpy.random.choice(2048 * 32, 40, replace=False))
+              for _ in xrange(500)]
+
+  print "steps: 1..%d, records: %d" % (steps, records)
+  for classifierClass in (CLAClassifier, DenseCLAClassifier):
+    seconds = timeit.timeit(
+      lambda: profileClassifier(classifierClass, steps, records, patterns),
+      number=1)
+    print "%-20s %8.1f records/s" % (classifierClass.__name__,
+                                    records / seconds)
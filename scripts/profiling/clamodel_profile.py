@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2016, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+## run python $NUPIC/scripts/profiling/clamodel_profile.py [nRecords]
+##   to compare the per-record latency of CLAModel.run on the hotgym records
+##   with default and with lean results, for the multi-step hotgym model and
+##   for the same model run as a temporal anomaly model
+
+import copy
+import csv
+import datetime
+import imp
+import os
+import sys
+import timeit
+
+from pkg_resources import resource_filename
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+
+_INPUT_FILE_PATH = resource_filename(
+  "nupic.datafiles", "extra/hotgym/rec-center-hourly.csv"
+)
+
+_MODEL_PARAMS_PATH = os.path.join(
+  os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+  "examples", "opf", "clients", "hotgym", "simple", "model_params.py"
+)
+
+
+
+def readRecords(nRecords):
+  """
+  read the first nRecords hotgym records, converted like the hotgym client
+
+  @param nRecords number of records to read
+  """
+  records = []
+  with open(_INPUT_FILE_PATH) as fin:
+    reader = csv.reader(fin)
+    headers = reader.next()
+    reader.next()
+    reader.next()
+    for record in reader:
+      modelInput = dict(zip(headers, record))
+      modelInput["consumption"] = float(modelInput["consumption"])
+      modelInput["timestamp"] = datetime.datetime.strptime(
+          modelInput["timestamp"], "%m/%d/%y %H:%M")
+      records.append(modelInput)
+      if len(records) == nRecords:
+        break
+  return records
+
+
+
+def profileModel(modelParams, records, leanResults):
+  """
+  time running the records through a fresh model
+
+  @param modelParams model params passed to the ModelFactory
+  @param records list of hotgym records
+  @param leanResults whether the model returns lean results
+  """
+  modelParams = copy.deepcopy(modelParams)
+  modelParams["modelParams"]["leanResults"] = leanResults
+  model = ModelFactory.create(modelParams)
+  model.enableInference({"predictedField": "consumption"})
+
+  def run():
+    for record in records:
+      model.run(record)
+
+  return timeit.timeit(run, number=1)
+
+
+
+if __name__ == "__main__":
+  records=1000
+  # read command line params
+  if len(sys.argv) == 2: # 1 arg + name
+    records=int(sys.argv[1])
+
+  multiStepParams = imp.load_source("model_params",
+                                    _MODEL_PARAMS_PATH).MODEL_PARAMS
+  anomalyParams = copy.deepcopy(multiStepParams)
+  anomalyParams["modelParams"]["inferenceType"] = "TemporalAnomaly"
+  inputRecords = readRecords(records)
+
+  print "records: %d" % len(inputRecords)
+  for (name, modelParams) in (("TemporalMultiStep", multiStepParams),
+                              ("TemporalAnomaly", anomalyParams)):
+    for leanResults in (False, True):
+      seconds = profileModel(modelParams, inputRecords, leanResults)
+      print "%-18s %-8s %8.1f us/record" % (
+        name, "lean" if leanResults else "default",
+        1e6 * seconds / len(inputRecords))
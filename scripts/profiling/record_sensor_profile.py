@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+## run python $NUPIC/scripts/profiling/record_sensor_profile.py [nRecords]
+##   to compare encoding the hotgym records with separate encodeIntoArray /
+##   getScalars / getEncodedValues calls against a single encodeAll call, and
+##   to measure the share of the RecordSensor in the per-record time of the
+##   hotgym CLA model
+
+import cProfile
+import csv
+import datetime
+import imp
+import os
+import pstats
+import sys
+import timeit
+
+import numpy
+from pkg_resources import resource_filename
+
+from nupic.encoders.multi import MultiEncoder
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+
+_INPUT_FILE_PATH = resource_filename(
+  "nupic.datafiles", "extra/hotgym/rec-center-hourly.csv"
+)
+
+_MODEL_PARAMS_PATH = os.path.join(
+  os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+  "examples", "opf", "clients", "hotgym", "simple", "model_params.py"
+)
+
+
+
+def readRecords(nRecords):
+  """
+  read the first nRecords hotgym records, converted like the hotgym client
+
+  @param nRecords number of records to read
+  """
+  records = []
+  with open(_INPUT_FILE_PATH) as fin:
+    reader = csv.reader(fin)
+    headers = reader.next()
+    reader.next()
+    reader.next()
+    for record in reader:
+      modelInput = dict(zip(headers, record))
+      modelInput["consumption"] = float(modelInput["consumption"])
+      modelInput["timestamp"] = datetime.datetime.strptime(
+          modelInput["timestamp"], "%m/%d/%y %H:%M")
+      records.append(modelInput)
+      if len(records) == nRecords:
+        break
+  return records
+
+
+
+def profileEncoder(modelParams, records):
+  """
+  time the encoding of records, as done by RecordSensor.compute, with and
+  without encodeAll
+
+  @param modelParams hotgym model params
+  @param records list of hotgym records
+  """
+  encoderParams = modelParams["modelParams"]["sensorParams"]["encoders"]
+
+  def separate():
+    encoder = MultiEncoder(encoderParams)
+    output = numpy.zeros(encoder.getWidth(), dtype="float32")
+    for record in records:
+      encoder.encodeIntoArray(record, output)
+      encoder.getScalars(record)
+      encoder.getEncodedValues(record)
+
+  def single():
+    encoder = MultiEncoder(encoderParams)
+    output = numpy.zeros(encoder.getWidth(), dtype="float32")
+    for record in records:
+      encoder.encodeAll(record, output)
+
+  for (name, run) in (("separate calls", separate), ("encodeAll", single)):
+    seconds = timeit.timeit(run, number=1)
+    print "%-20s %8.1f us/record" % (name, 1e6 * seconds / len(records))
+
+
+
+def profileModel(modelParams, records):
+  """
+  profile the hotgym model and report the share of the RecordSensor
+
+  @param modelParams hotgym model params
+  @param records list of hotgym records
+  """
+  model = ModelFactory.create(modelParams)
+  model.enableInference({"predictedField": "consumption"})
+
+  profiler = cProfile.Profile()
+  profiler.enable()
+  for record in records:
+    model.run(record)
+  profiler.disable()
+
+  stats = pstats.Stats(profiler).stats
+  def cumulativeTime(fileName, functionName):
+    return sum(ct for ((filename, _, name), (_, _, _, ct, _)) in stats.items()
+               if filename.endswith(fileName) and name == functionName)
+
+  runTime = cumulativeTime("clamodel.py", "run")
+  sensorTime = cumulativeTime("RecordSensor.py", "compute")
+  print "model.run            %8.1f us/record" % (1e6 * runTime / len(records))
+  print "RecordSensor.compute %8.1f us/record (%.1f%%)" % (
+    1e6 * sensorTime / len(records), 100.0 * sensorTime / runTime)
+
+
+
+if __name__ == "__main__":
+  records=1000
+  # read command line params
+  if len(sys.argv) == 2: # 1 arg + name
+    records=int(sys.argv[1])
+
+  modelParams = imp.load_source("model_params",
+                                _MODEL_PARAMS_PATH).MODEL_PARAMS
+  inputRecords = readRecords(records)
+
+  print "records: %d" % len(inputRecords)
+  profileEncoder(modelParams, inputRecords)
+  profileModel(modelParams, inputRecords)
@@ -21,8 +21,12 @@
 # ----------------------------------------------------------------------
 
 ## run python -m cProfile --sort cumtime $NUPIC/scripts/profiling/sp_profile.py [nColumns nEpochs]
+## run python $NUPIC/scripts/profiling/sp_profile.py inhibition \
+##     [nColumns nEpochs]
+##   to compare the sort-based and selection-based global inhibition
 
 import sys
+import timeit
 import numpy
 # chose desired SP implementation to compare:
 from nupic.research.spatial_pooler import SpatialPooler as PySP
@@ -82,12 +86,74 @@ def profileSP(spClass, spDim, nRuns):
 
 
 
+def inhibitColumnsGlobalSorted(sp, overlaps, density):
+  """
+  reference global inhibition, picking the winners with a full sort of all
+  columns (the implementation used before the selection-based one)
+  """
+  numActive = int(density * sp.getNumColumns())
+  activeColumns = numpy.zeros(sp.getNumColumns())
+  winners = sorted(range(overlaps.size),
+                   key=lambda k: overlaps[k],
+                   reverse=True)[0:numActive]
+  activeColumns[winners] = 1
+  return numpy.where(activeColumns > 0)[0]
+
+
+
+def profileGlobalInhibition(spDim, nRuns):
+  """
+  micro-benchmark of the global inhibition step of the python SP, comparing
+  the sort-based reference with SpatialPooler._inhibitColumnsGlobal and
+  checking that both pick the same winners
+
+  @param spDim number of columns in SP
+  @param nRuns number of overlap vectors to inhibit
+  """
+  sp = PySP(inputDimensions=[100],
+            columnDimensions=[spDim],
+            globalInhibition=True,
+            numActiveColumnsPerInhArea=int(0.02 * spDim),
+            seed=42)
+  density = 0.02
+
+  # integer overlaps plus the SP's tie breaker, as in SP._inhibitColumns
+  data = [numpy.random.randint(0, 20, spDim) + sp._tieBreaker
+          for _ in xrange(nRuns)]
+
+  for overlaps in data:
+    assert numpy.array_equal(inhibitColumnsGlobalSorted(sp, overlaps, density),
+                             sp._inhibitColumnsGlobal(overlaps, density))
+
+  sortedTime = timeit.timeit(
+    lambda: [inhibitColumnsGlobalSorted(sp, o, density) for o in data],
+    number=1)
+  selectTime = timeit.timeit(
+    lambda: [sp._inhibitColumnsGlobal(o, density) for o in data],
+    number=1)
+
+  print "columns: %d, runs: %d" % (spDim, nRuns)
+  print "sort-based:      %.3f ms/run" % (1000.0 * sortedTime / nRuns)
+  print "selection-based: %.3f ms/run" % (1000.0 * selectTime / nRuns)
+  print "speedup:         %.1fx" % (sortedTime / selectTime)
+
+
+
 if __name__ == "__main__":
   columns=2048
   epochs=10000
+  args = sys.argv[1:]
+  inhibition = len(args) > 0 and args[0] == "inhibition"
+  if inhibition:
+    args = args[1:]
+    columns=16384
+    epochs=100
   # read params from command line
-  if len(sys.argv) == 3: # 2 args + name
-    columns=int(sys.argv[1])
-    epochs=int(sys.argv[2])
+  if len(args) == 2:
+    columns=int(args[0])
+    epochs=int(args[1])
 
-  profileSP(CppSP, columns, epochs)
+  if inhibition:
+    profileGlobalInhibition(columns, epochs)
+  else:
+    profileSP(CppSP, columns, epochs)
@@ -605,5 +605,146 @@ class AnomalyLikelihoodTest(TestCaseBase):
 
 
 
+  def testBoundedMatchesUnbounded(self):
+    """
+    With a window that holds the whole stream, the bounded mode returns the
+    same likelihoods as the default mode
+    """
+    numpy.random.seed(42)
+    data = _generateSampleData(mean=0.2, variance=0.05)
+    data += _generateSampleData(mean=0.5, variance=0.1)[:200]
+
+    l1 = an.AnomalyLikelihood(claLearningPeriod=100, estimationSamples=100)
+    l2 = an.AnomalyLikelihood(claLearningPeriod=100, estimationSamples=100,
+                              historicWindowSize=2000)
+    for (timestamp, value, score) in data:
+      likelihood1 = l1.anomalyProbability(value, score, timestamp)
+      likelihood2 = l2.anomalyProbability(value, score, timestamp)
+      self.assertWithinEpsilon(likelihood1, likelihood2, epsilon=1e-6)
+
+
+  def testBoundedWindow(self):
+    """
+    The bounded mode estimates the distribution from the last
+    historicWindowSize averaged scores
+    """
+    numpy.random.seed(42)
+    data = _generateSampleData(mean=0.2, variance=0.05)
+    data += _generateSampleData(mean=0.6, variance=0.01)
+
+    l = an.AnomalyLikelihood(claLearningPeriod=100, estimationSamples=100,
+                             historicWindowSize=500)
+    for (timestamp, value, score) in data[:2800]:
+      l.anomalyProbability(value, score, timestamp)
+
+    self.assertIsNone(l._historicalScores)
+    self.assertEqual(len(l._averagedScores), 500)
+
+    # The distribution was last estimated at iteration 2700, from the 500
+    # records before it
+    averagedScores = [r[2] for r in an._anomalyScoreMovingAverage(data)[0]]
+    expected = an.estimateNormal(numpy.array(averagedScores[2200:2700]))
+    self.assertWithinEpsilon(l._distribution["mean"], expected["mean"], 1e-9)
+    self.assertWithinEpsilon(l._distribution["variance"],
+                             expected["variance"], 1e-9)
+
+
+  def testBoundedFlatMetric(self):
+    """Flat metric values are not anomalous in the bounded mode either"""
+    numpy.random.seed(42)
+    data = _generateSampleData(metricMean=10000.0, metricVariance=0.0)
+
+    l = an.AnomalyLikelihood(claLearningPeriod=100, estimationSamples=100,
+                             historicWindowSize=300)
+    for (timestamp, value, score) in data:
+      l.anomalyProbability(value, score, timestamp)
+    self.assertEqual(l._distribution, an.nullDistribution())
+
+
+  def testBoundedInvalidWindow(self):
+    with self.assertRaises(ValueError):
+      an.AnomalyLikelihood(estimationSamples=300, historicWindowSize=299)
+
+
+  def testBoundedSerialization(self):
+    l = an.AnomalyLikelihood(claLearningPeriod=2, estimationSamples=2,
+                             historicWindowSize=3)
+
+    l.anomalyProbability("hi", 0.1, timestamp=1) # burn in
+    l.anomalyProbability("hi", 0.1, timestamp=2)
+    l.anomalyProbability(5, 0.3, timestamp=3)
+    l.anomalyProbability(5, 0.3, timestamp=4)
+    l.anomalyProbability(7, 0.5, timestamp=5)
+
+    restored = pickle.loads(pickle.dumps(l))
+    self.assertEqual(l, restored)
+    self.assertEqual(l.anomalyProbability(5, 0.1, timestamp=6),
+                     restored.anomalyProbability(5, 0.1, timestamp=6))
+
+
+
+  def testMultiStreamMatchesAnomalyLikelihood(self):
+    """
+    Each stream of the engine returns the same likelihoods as a bounded
+    AnomalyLikelihood fed with the records of that stream
+    """
+    numpy.random.seed(42)
+    numStreams = 20
+    engine = an.MultiStreamAnomalyLikelihood(
+      numStreams, claLearningPeriod=30, estimationSamples=40,
+      historicWindowSize=150)
+    helpers = [an.AnomalyLikelihood(claLearningPeriod=30,
+                                    estimationSamples=40,
+                                    historicWindowSize=150)
+               for _ in xrange(numStreams)]
+
+    for _ in xrange(1000):
+      # Only some of the streams get a record in each tick
+      streamIds = numpy.flatnonzero(numpy.random.rand(numStreams) < 0.7)
+      scores = numpy.random.beta(1, 4, len(streamIds))
+      scores[numpy.random.rand(len(streamIds)) < 0.02] = 1.0
+      # Every 5th stream has a flat metric
+      values = numpy.where(streamIds % 5 == 0, 7.0,
+                           numpy.random.rand(len(streamIds)))
+
+      likelihoods = engine.update(streamIds, scores, values)
+      for (i, streamId) in enumerate(streamIds):
+        expected = helpers[streamId].anomalyProbability(values[i], scores[i])
+        self.assertWithinEpsilon(likelihoods[i], expected, epsilon=1e-9)
+
+
+  def testMultiStreamAddStreams(self):
+    engine = an.MultiStreamAnomalyLikelihood(2, claLearningPeriod=2,
+                                             estimationSamples=2,
+                                             historicWindowSize=10)
+    for _ in xrange(5):
+      engine.update([0, 1], [0.1, 0.2])
+
+    self.assertEqual(list(engine.addStreams(3)), [2, 3, 4])
+    self.assertEqual(engine.numStreams, 5)
+
+    # New streams start their probationary period
+    likelihoods = engine.update([0, 4], [0.9, 0.9])
+    self.assertNotEqual(likelihoods[0], 0.5)
+    self.assertEqual(likelihoods[1], 0.5)
+
+
+  def testMultiStreamBadParams(self):
+    engine = an.MultiStreamAnomalyLikelihood(3, historicWindowSize=300)
+
+    with self.assertRaises(ValueError):
+      engine.update([0, 1, 1], [0.1, 0.2, 0.3])
+    with self.assertRaises(ValueError):
+      engine.update([0, 1], [0.1])
+    with self.assertRaises(IndexError):
+      engine.update([3], [0.1])
+    with self.assertRaises(ValueError):
+      an.MultiStreamAnomalyLikelihood(3, estimationSamples=300,
+                                      historicWindowSize=299)
+
+    self.assertEqual(len(engine.update([], [])), 0)
+
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the DenseCLAClassifier.
+
+This test extends the test for the Python CLAClassifier to ensure that both
+classifiers and their tests stay in sync.
+"""
+
+import tempfile
+
+import unittest2 as unittest
+
+import numpy
+
+from nupic.algorithms.CLAClassifier import CLAClassifier
+from nupic.algorithms.cla_classifier_dense import DenseCLAClassifier
+from nupic.bindings.proto import ClaClassifier_capnp
+
+# Don't import the CLAClassifierTest directly or the unittest.main() will pick
+# it up and run it.
+import cla_classifier_test
+
+
+
+class DenseCLAClassifierTest(cla_classifier_test.CLAClassifierTest):
+  """Unit tests for DenseCLAClassifier class."""
+
+
+  def setUp(self):
+    self._classifier = DenseCLAClassifier
+
+
+  def _computeBoth(self, c1, c2, recordNum, patternNZ, bucketIdx, actValue):
+    classification = {"bucketIdx": bucketIdx, "actValue": actValue}
+    result1 = c1.compute(recordNum, patternNZ, classification, True, True)
+    result2 = c2.compute(recordNum, patternNZ, classification, True, True)
+
+    self.assertEqual(sorted(result1.keys()), sorted(result2.keys()))
+    self.assertEqual(result1["actualValues"], result2["actualValues"])
+    for nSteps in c1.steps:
+      self.assertEqual(len(result1[nSteps]), len(result2[nSteps]))
+      for (vote1, vote2) in zip(result1[nSteps], result2[nSteps]):
+        self.assertAlmostEqual(vote1, vote2, places=12)
+
+
+  def testEquivalentToBitHistories(self):
+    # A large alpha makes the duty cycles grow fast enough to get rescaled
+    c1 = CLAClassifier(steps=[0, 1, 3], alpha=0.5, actValueAlpha=0.3)
+    c2 = DenseCLAClassifier(steps=[0, 1, 3], alpha=0.5, actValueAlpha=0.3)
+
+    rng = numpy.random.RandomState(42)
+    for recordNum in xrange(400):
+      numActive = rng.randint(0, 20)
+      patternNZ = sorted(rng.choice(200, numActive, replace=False).tolist())
+      bucketIdx = int(rng.randint(0, 30))
+      self._computeBoth(c1, c2, recordNum, patternNZ, bucketIdx,
+                        float(bucketIdx) * 1.5)
+
+
+  def testDuplicateBits(self):
+    c1 = CLAClassifier(steps=[1], alpha=0.1)
+    c2 = DenseCLAClassifier(steps=[1], alpha=0.1)
+
+    self._computeBoth(c1, c2, 0, [1, 5, 5, 9], 4, 34.7)
+    self._computeBoth(c1, c2, 1, [1, 5, 9, 9, 9], 2, 20.1)
+    self._computeBoth(c1, c2, 2, [1, 5, 5, 9], 4, 34.7)
+
+
+  def testWriteReadBitHistories(self):
+    c1 = DenseCLAClassifier([1, 2], 0.1, 0.1, 0)
+    c2 = CLAClassifier([1, 2], 0.1, 0.1, 0)
+
+    self._computeBoth(c1, c2, 0, [1, 5, 9], 4, 34.7)
+    self._computeBoth(c1, c2, 1, [0, 6, 9, 11], 5, 41.7)
+    self._computeBoth(c1, c2, 2, [6, 9], 2, 44.9)
+
+    proto1 = ClaClassifier_capnp.ClaClassifierProto.new_message()
+    c1.write(proto1)
+
+    # Write the proto to a temp file and read it back into a new proto
+    with tempfile.TemporaryFile() as f:
+      proto1.write(f)
+      f.seek(0)
+      proto2 = ClaClassifier_capnp.ClaClassifierProto.read(f)
+
+    # The proto can be loaded by both classifiers
+    c3 = DenseCLAClassifier.read(proto2)
+    c4 = CLAClassifier.read(proto2)
+
+    self.assertEqual(sorted(c4._activeBitHistory.keys()),
+                     sorted(c2._activeBitHistory.keys()))
+    for key in c2._activeBitHistory:
+      self.assertEqual(c4._activeBitHistory[key]._stats,
+                       c2._activeBitHistory[key]._stats)
+      self.assertEqual(c4._activeBitHistory[key]._lastTotalUpdate,
+                       c2._activeBitHistory[key]._lastTotalUpdate)
+
+    self._computeBoth(c3, c4, 3, [1, 5, 9], 4, 42.9)
+    self._computeBoth(c3, c2, 4, [0, 6, 9, 11], 5, 41.7)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -24,6 +24,7 @@
 
 CL_VERBOSITY = 0
 
+from collections import deque
 import cPickle as pickle
 import types
 import unittest2 as unittest
@@ -249,6 +250,24 @@ class CLAClassifierTest(unittest.TestCase):
     self.assertAlmostEqual(result[1][5], 0.87699877, places=5)
 
 
+  def testUnpicklePatternNZHistoryDeque(self):
+    """Classifiers pickled with a deque pattern history can be loaded."""
+    c1 = CLAClassifier([1, 2], 0.1, 0.1, 0)
+    for recordNum in xrange(3):
+      self._compute(c1, recordNum, [1, recordNum + 5], recordNum, 10)
+
+    state = dict(c1.__getstate__())
+    state["_patternNZHistory"] = deque(c1._patternNZHistory, maxlen=3)
+    c2 = object.__new__(CLAClassifier)
+    c2.__setstate__(pickle.loads(pickle.dumps(state)))
+
+    self.assertEqual(c1._patternNZHistory, c2._patternNZHistory)
+    result1 = self._compute(c1, 3, [1, 6], 1, 10)
+    result2 = self._compute(c2, 3, [1, 6], 1, 10)
+    self.assertEqual(list(result1[1]), list(result2[1]))
+    self.assertEqual(list(result1[2]), list(result2[2]))
+
+
   def testWriteRead(self):
     c1 = CLAClassifier([1], 0.1, 0.1, 0)
 
@@ -406,6 +425,25 @@ class CLAClassifierTest(unittest.TestCase):
       self.assertAlmostEqual(retval[2][i], 0.0)
 
 
+  def testMultistepManySteps(self):
+    steps = range(1, 25)
+    classifier = self._classifier(steps=steps)
+
+    retval = []
+    recordNum = 0
+    for i in range(200):
+      retval = self._compute(classifier, recordNum=recordNum,
+                             pattern=[i % 30], bucket=i % 30,
+                             value=(i % 30) * 10)
+      recordNum += 1
+
+    # Each step should predict the bucket nSteps after the current one
+    for nSteps in steps:
+      expectedBucket = (199 + nSteps) % 30
+      self.assertAlmostEqual(retval[nSteps][expectedBucket], 1.0)
+      self.assertAlmostEqual(sum(retval[nSteps]), 1.0)
+
+
   def testMissingRecords(self):
     """ Test missing record support.
 
@@ -22,9 +22,28 @@
 
 """Unit tests for aggregator module."""
 
+from datetime import datetime, timedelta
+import filecmp
+import os
+import shutil
+import tempfile
+
+from pkg_resources import resource_filename
 import unittest2 as unittest
 
 from nupic.data import aggregator
+from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.record_stream import RecordsBatch, valuesToColumn
+
+
+
+_FIELDS = [("timestamp", "datetime", "T"),
+           ("sid", "string", "S"),
+           ("reset", "int", "R"),
+           ("count", "int", ""),
+           ("value", "float", ""),
+           ("category", "string", ""),
+           ("weight", "float", "")]
 
 
 class AggregatorTest(unittest.TestCase):
@@ -51,5 +70,163 @@ class AggregatorTest(unittest.TestCase):
     self.assertAlmostEqual(result, 1.0, places=7)
 
 
+
+class NextBlockTest(unittest.TestCase):
+  """Tests that Aggregator.nextBlock() aggregates like Aggregator.next()."""
+
+
+  def setUp(self):
+    self._tmpDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tmpDir)
+
+
+  @staticmethod
+  def _getRecords(numRecords, outOfOrder=False, missing=True, step=7,
+                  start=datetime(2014, 12, 1, 22, 10, 7, 500000)):
+    records = []
+    for i in xrange(numRecords):
+      t = start + timedelta(minutes=step * i + (i % 3))
+      if outOfOrder and i % 50 == 49:
+        t -= timedelta(hours=5)
+      records.append([t,
+                      "seq%d" % (i // 400),
+                      int(i % 200 == 0),
+                      i % 11 - 3 if not (missing and i % 13 == 0) else None,
+                      (i % 17) * 0.1 if not (missing and i % 7 == 0) else None,
+                      "abc"[(i * i) % 3] if not (missing and i % 5 == 0)
+                      else None,
+                      (i % 4) * 0.5])
+    return records
+
+
+  @staticmethod
+  def _aggregateRecords(aggregationInfo, records):
+    agg = aggregator.Aggregator(aggregationInfo, _FIELDS)
+    outRecords = []
+    for record in records + [None]:
+      (outRecord, _) = agg.next(record, None)
+      if outRecord is not None:
+        outRecords.append(outRecord)
+    return outRecords
+
+
+  @staticmethod
+  def _getBatch(records):
+    return RecordsBatch([name for (name, _, _) in _FIELDS],
+                        [valuesToColumn(fieldType, [r[i] for r in records])
+                         for (i, (_, fieldType, _)) in enumerate(_FIELDS)],
+                        {})
+
+
+  def _aggregateBlocks(self, aggregationInfo, records, blockSize):
+    agg = aggregator.Aggregator(aggregationInfo, _FIELDS)
+    outRecords = []
+    for i in xrange(0, len(records), blockSize):
+      outRecords.extend(agg.nextBlock(self._getBatch(records[i:i + blockSize])))
+    outRecords.extend(agg.nextBlock(None))
+    return outRecords
+
+
+  def _checkBlocks(self, aggregationInfo, records):
+    # repr() tells apart ints and floats, and 0.0 and -0.0
+    expected = repr(self._aggregateRecords(aggregationInfo, records))
+    for blockSize in (1, 7, 100, 10000):
+      self.assertEqual(
+        repr(self._aggregateBlocks(aggregationInfo, records, blockSize)),
+        expected)
+
+
+  def testFunctions(self):
+    records = self._getRecords(800)
+    for (valueFunc, countFunc) in (("sum", "mean"), ("mean", "sum"),
+                                   ("first", "last"), ("max", "min"),
+                                   ("mode", "mode")):
+      self._checkBlocks({"minutes": 30,
+                         "fields": [("count", countFunc),
+                                    ("value", valueFunc),
+                                    ("category", "mode"),
+                                    ("weight", "last")]},
+                        records)
+
+
+  def testWeightedMean(self):
+    records = self._getRecords(1000, missing=False)
+    self._checkBlocks({"hours": 2,
+                       "fields": [("value", "wmean:weight"),
+                                  ("count", "wmean:count")]},
+                      records)
+
+
+  def testPeriods(self):
+    records = self._getRecords(1000, step=131)
+    for period in ({"seconds": 90}, {"days": 1, "hours": 3}, {"weeks": 1},
+                   {"months": 1}, {"months": 5}, {"years": 1, "months": 1}):
+      aggregationInfo = dict(period, fields=[("value", "sum")])
+      self._checkBlocks(aggregationInfo, records)
+
+
+  def testOutOfOrderRecords(self):
+    records = self._getRecords(1000, outOfOrder=True)
+    self._checkBlocks({"minutes": 45, "fields": [("value", "mean")]},
+                      records)
+
+
+  def testMonthsStartingLate(self):
+    # Months periods starting on the 29th are aggregated record by record
+    records = self._getRecords(800, step=131, start=datetime(2015, 1, 29, 8))
+    for period in ({"months": 2}, {"years": 1}):
+      self._checkBlocks(dict(period, fields=[("value", "sum")]), records)
+
+
+  def testMixedCalls(self):
+    aggregationInfo = {"minutes": 30, "fields": [("value", "mean")]}
+    records = self._getRecords(500)
+
+    agg = aggregator.Aggregator(aggregationInfo, _FIELDS)
+    outRecords = []
+    for i in xrange(0, len(records), 20):
+      if i % 40:
+        outRecords.extend(agg.nextBlock(self._getBatch(records[i:i + 20])))
+      else:
+        for record in records[i:i + 20]:
+          (outRecord, _) = agg.next(record, None)
+          if outRecord is not None:
+            outRecords.append(outRecord)
+    outRecords.extend(agg.nextBlock(None))
+
+    self.assertEqual(repr(outRecords),
+                     repr(self._aggregateRecords(aggregationInfo, records)))
+
+
+  def testGenerateDataset(self):
+    inputPath = os.path.join(self._tmpDir, "input.csv")
+    records = self._getRecords(12000)
+    with FileRecordStream(inputPath, write=True, fields=_FIELDS) as stream:
+      stream.appendRecords(records)
+
+    aggregationInfo = {"hours": 1,
+                       "fields": [("count", "sum"), ("value", "mean"),
+                                  ("category", "mode"),
+                                  ("weight", "wmean:weight")]}
+
+    outputPath = os.path.join(self._tmpDir, "output.csv")
+    self.assertEqual(
+      aggregator.generateDataset(
+        aggregationInfo,
+        os.path.relpath(inputPath, resource_filename("nupic.datafiles", "")),
+        outputPath),
+      outputPath)
+
+    expectedPath = os.path.join(self._tmpDir, "expected.csv")
+    with FileRecordStream(expectedPath, write=True, fields=_FIELDS) as stream:
+      stream.appendRecords(self._aggregateRecords(aggregationInfo, records))
+
+    self.assertTrue(filecmp.cmp(outputPath, expectedPath, shallow=False))
+
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the binary record stream."""
+
+from datetime import datetime, timedelta
+import os
+import pickle
+import shutil
+import tempfile
+
+import unittest2 as unittest
+
+from nupic.data.binary_record_stream import (BinaryRecordStream,
+                                             BINARY_FILE_EXTENSION,
+                                             convertCsvToBinary)
+from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.stream_reader import StreamReader
+
+
+
+_FIELDS = [("timestamp", "datetime", "T"),
+           ("name", "string", ""),
+           ("integer", "int", ""),
+           ("real", "float", ""),
+           ("flag", "bool", ""),
+           ("sdr", "sdr", ""),
+           ("values", "list", ""),
+           ("reset", "int", "R"),
+           ("sid", "string", "S")]
+
+
+
+class BinaryRecordStreamTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._tmpDir = tempfile.mkdtemp()
+    self._csvPath = os.path.join(self._tmpDir, "data.csv")
+    self._binaryPath = os.path.join(self._tmpDir,
+                                    "data" + BINARY_FILE_EXTENSION)
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tmpDir)
+
+
+  def _getRecords(self, numRecords):
+    start = datetime(2015, 3, 1, 12, 30, 15, 250000)
+    return [[start + timedelta(minutes=5 * i),
+             "name,%d\n" % (i % 3) if i % 7 else "",
+             i * 7 - 20 if i % 6 else None,
+             i * 0.25 if i % 4 else None,
+             bool(i % 2),
+             [i % 2, 1, 0],
+             [i, i + 1],
+             int(i % 5 == 0),
+             "seq%d" % (i // 5)]
+            for i in xrange(numRecords)]
+
+
+  def _writeCsv(self, records):
+    with FileRecordStream(self._csvPath, write=True, fields=_FIELDS) as stream:
+      for record in records:
+        stream.appendRecord(record)
+
+
+  def _readCsv(self):
+    with FileRecordStream(self._csvPath) as stream:
+      return list(stream)
+
+
+  def testConvertedRecordsMatchCsv(self):
+    self._writeCsv(self._getRecords(10000))
+
+    self.assertEqual(convertCsvToBinary(self._csvPath, self._binaryPath),
+                     10000)
+
+    expected = self._readCsv()
+    with BinaryRecordStream(self._binaryPath) as stream:
+      self.assertEqual(stream.getFields(), FileRecordStream(
+        self._csvPath).getFields())
+      self.assertEqual(stream.getDataRowCount(), 10000)
+      self.assertEqual(list(stream), expected)
+      self.assertIsNone(stream.getNextRecord())
+
+      stream.rewind()
+      self.assertEqual(stream.getNextRecord(), expected[0])
+
+
+  def testRecordDicts(self):
+    self._writeCsv(self._getRecords(20))
+    convertCsvToBinary(self._csvPath, self._binaryPath)
+
+    csvStream = FileRecordStream(self._csvPath)
+    stream = BinaryRecordStream(self._binaryPath)
+    for _ in xrange(20):
+      self.assertEqual(stream.getNextRecordDict(),
+                       csvStream.getNextRecordDict())
+    self.assertIsNone(stream.getNextRecordDict())
+
+
+  def testStats(self):
+    self._writeCsv(self._getRecords(100))
+    convertCsvToBinary(self._csvPath, self._binaryPath)
+
+    # Only int and float fields have stats, missing values are ignored
+    stream = BinaryRecordStream(self._binaryPath)
+    self.assertEqual(stream.getStats(),
+                     {"min": [None, None, -13, 0.25, None, None, None, 0, None],
+                      "max": [None, None, 673, 24.75, None, None, None, 1,
+                              None]})
+    self.assertEqual(stream.getFieldMin("integer"), -13)
+    self.assertEqual(stream.getFieldMax("real"), 24.75)
+
+
+  def testWriteAndRead(self):
+    records = self._getRecords(10)
+    with BinaryRecordStream(self._binaryPath, write=True,
+                            fields=_FIELDS) as stream:
+      stream.appendRecords(records)
+
+    with BinaryRecordStream(self._binaryPath) as stream:
+      self.assertEqual(list(stream), records)
+
+
+  def testEmptyStream(self):
+    with BinaryRecordStream(self._binaryPath, write=True, fields=_FIELDS):
+      pass
+
+    with BinaryRecordStream(self._binaryPath) as stream:
+      self.assertEqual(stream.getDataRowCount(), 0)
+      self.assertIsNone(stream.getNextRecord())
+
+
+  def testBookmarks(self):
+    records = self._getRecords(5000)
+    with BinaryRecordStream(self._binaryPath, write=True,
+                            fields=_FIELDS) as stream:
+      stream.appendRecords(records)
+
+    stream = BinaryRecordStream(self._binaryPath)
+    for _ in xrange(4500):
+      stream.getNextRecord()
+    bookmark = stream.getBookmark()
+    self.assertTrue(stream.recordsExistAfter(bookmark))
+
+    stream = BinaryRecordStream(self._binaryPath, bookmark=bookmark)
+    self.assertEqual(stream.getNextRecordIdx(), 4500)
+    self.assertEqual(list(stream), records[4500:])
+    self.assertFalse(stream.recordsExistAfter(stream.getBookmark()))
+
+    stream = BinaryRecordStream(self._binaryPath, firstRecord=10)
+    self.assertEqual(stream.getNextRecord(), records[10])
+
+    bookmark = stream.seekFromEnd(3)
+    self.assertEqual(list(stream), records[-3:])
+    stream = BinaryRecordStream(self._binaryPath, bookmark=bookmark)
+    self.assertEqual(list(stream), records[-3:])
+
+
+  def testAutoRewind(self):
+    records = self._getRecords(3)
+    with BinaryRecordStream(self._binaryPath, write=True,
+                            fields=_FIELDS) as stream:
+      stream.appendRecords(records)
+
+    stream = BinaryRecordStream(self._binaryPath)
+    stream.setAutoRewind(True)
+    self.assertEqual([stream.getNextRecord() for _ in xrange(5)],
+                     records + records[:2])
+
+
+  def testPickle(self):
+    records = self._getRecords(3)
+    with BinaryRecordStream(self._binaryPath, write=True,
+                            fields=_FIELDS) as stream:
+      stream.appendRecords(records)
+
+    stream = pickle.loads(pickle.dumps(BinaryRecordStream(self._binaryPath)))
+    self.assertEqual(list(stream), records)
+
+
+  def testStreamReader(self):
+    self._writeCsv(self._getRecords(50))
+    convertCsvToBinary(self._csvPath, self._binaryPath)
+
+    def readAll(path):
+      reader = StreamReader({
+        "version": 1,
+        "info": "binary record stream test",
+        "streams": [{"source": "file://%s" % path,
+                     "info": os.path.basename(path),
+                     "columns": ["*"]}],
+      })
+      return [reader.getNextRecordDict() for _ in xrange(51)]
+
+    records = readAll(self._binaryPath)
+    self.assertIsNone(records[-1])
+    self.assertEqual(records, readAll(self._csvPath))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
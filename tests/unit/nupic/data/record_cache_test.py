@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the record cache."""
+
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+
+import unittest2 as unittest
+
+from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.record_cache import (CachedRecordStream, RecordCacheError,
+                                     getCacheKey, openRecordCache)
+from nupic.data.stream_reader import StreamReader
+
+
+
+_FIELDS = [("timestamp", "datetime", "T"),
+           ("name", "string", ""),
+           ("integer", "int", ""),
+           ("real", "float", ""),
+           ("reset", "int", "R"),
+           ("sid", "string", "S")]
+
+
+
+class RecordCacheTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._tmpDir = tempfile.mkdtemp()
+    self._cacheRoot = os.path.join(self._tmpDir, "cache")
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tmpDir)
+
+
+  def _writeDataset(self, fields, records):
+    path = os.path.join(self._tmpDir, "data.csv")
+    with FileRecordStream(path, write=True, fields=fields) as stream:
+      for record in records:
+        stream.appendRecord(record)
+    return path
+
+
+  def _getStreamDef(self, path, aggregation=None):
+    streamDef = {
+      "version": 1,
+      "info": "record cache test",
+      "streams": [{"source": "file://%s" % path,
+                   "info": "data.csv",
+                   "columns": ["*"]}],
+    }
+    if aggregation is not None:
+      streamDef["aggregation"] = aggregation
+      streamDef["timeField"] = "timestamp"
+    return streamDef
+
+
+  def _readAll(self, stream):
+    records = []
+    while True:
+      record = stream.getNextRecordDict()
+      if record is None:
+        return records
+      records.append(record)
+
+
+  def _getRecords(self, numRecords):
+    start = datetime(2015, 3, 1, 12, 30, 15, 250000)
+    return [[start + timedelta(minutes=5 * i),
+             "name%d" % (i % 3),
+             i * 7 - 20,
+             i * 0.25 if i % 4 else None,
+             int(i % 5 == 0),
+             "seq%d" % (i // 5)]
+            for i in xrange(numRecords)]
+
+
+  def testRecordsMatchStreamReader(self):
+    streamDef = self._getStreamDef(
+        self._writeDataset(_FIELDS, self._getRecords(2500)))
+
+    expected = self._readAll(StreamReader(streamDef, isBlocking=False))
+    stream = openRecordCache(streamDef, self._cacheRoot)
+
+    self.assertEqual(stream.getNumRecords(), 2500)
+    self.assertEqual(self._readAll(stream), expected)
+    self.assertIsNone(stream.getNextRecordDict())
+
+    stream.rewind()
+    self.assertEqual(stream.getNextRecordDict(), expected[0])
+
+
+  def testAggregatedRecordsMatchStreamReader(self):
+    fields = [("timestamp", "datetime", "T"), ("real", "float", "")]
+    records = [[datetime(2015, 3, 1) + timedelta(minutes=10 * i), i * 1.5]
+               for i in xrange(100)]
+    streamDef = self._getStreamDef(
+        self._writeDataset(fields, records),
+        aggregation={"hours": 1, "fields": [("real", "mean")]})
+
+    reader = StreamReader(streamDef, isBlocking=False)
+    expected = self._readAll(reader)
+    stream = openRecordCache(streamDef, self._cacheRoot)
+
+    self.assertEqual(self._readAll(stream), expected)
+    self.assertEqual(stream.getAggregationMonthsAndSeconds(),
+                     reader.getAggregationMonthsAndSeconds())
+
+
+  def testFieldStats(self):
+    streamDef = self._getStreamDef(
+        self._writeDataset(_FIELDS, self._getRecords(20)))
+
+    reader = StreamReader(streamDef, isBlocking=False)
+    stream = openRecordCache(streamDef, self._cacheRoot)
+
+    self.assertEqual(stream.getFieldNames(), reader.getFieldNames())
+    self.assertEqual(stream.getFields(), reader.getFields())
+    for name in reader.getFieldNames():
+      self.assertEqual(stream.getFieldMin(name), reader.getFieldMin(name))
+      self.assertEqual(stream.getFieldMax(name), reader.getFieldMax(name))
+
+
+  def testFieldStatsMissing(self):
+    streamDef = self._getStreamDef(
+        self._writeDataset(_FIELDS, self._getRecords(20)))
+    stream = openRecordCache(streamDef, self._cacheRoot)
+
+    stream._stats = {}
+    self.assertIsNone(stream.getFieldMin("integer"))
+    self.assertIsNone(stream.getFieldMax("integer"))
+    stream._stats = None
+    self.assertIsNone(stream.getFieldMin("integer"))
+
+
+  def testCacheIsReused(self):
+    streamDef = self._getStreamDef(
+        self._writeDataset(_FIELDS, self._getRecords(20)))
+    openRecordCache(streamDef, self._cacheRoot)
+
+    cacheDir = os.path.join(self._cacheRoot, getCacheKey(streamDef))
+    headerStat = os.stat(os.path.join(cacheDir, "header.json"))
+
+    stream = openRecordCache(streamDef, self._cacheRoot)
+    self.assertEqual(len(self._readAll(stream)), 20)
+    self.assertEqual(os.listdir(self._cacheRoot), [os.path.basename(cacheDir)])
+    self.assertEqual(os.stat(os.path.join(cacheDir, "header.json")),
+                     headerStat)
+
+
+  def testDeletedCacheRaisesRecordCacheError(self):
+    streamDef = self._getStreamDef(
+        self._writeDataset(_FIELDS, self._getRecords(20)))
+    openRecordCache(streamDef, self._cacheRoot)
+
+    # Another worker deletes the arrays while the cache is being opened
+    cacheDir = os.path.join(self._cacheRoot, getCacheKey(streamDef))
+    os.remove(os.path.join(cacheDir, "column0.npy"))
+    with self.assertRaises(RecordCacheError):
+      openRecordCache(streamDef, self._cacheRoot)
+
+
+  def testKeyChangesWithSource(self):
+    path = self._writeDataset(_FIELDS, self._getRecords(20))
+    streamDef = self._getStreamDef(path)
+    key = getCacheKey(streamDef)
+
+    self._writeDataset(_FIELDS, self._getRecords(30))
+    self.assertNotEqual(getCacheKey(streamDef), key)
+
+
+  def testUncachableStream(self):
+    fields = [("timestamp", "datetime", "T"), ("values", "list", "")]
+    records = [[datetime(2015, 3, 1) + timedelta(minutes=i), [i, i + 1]]
+               for i in xrange(10)]
+    streamDef = self._getStreamDef(self._writeDataset(fields, records))
+
+    with self.assertRaises(RecordCacheError):
+      openRecordCache(streamDef, self._cacheRoot)
+
+    # The failure is recorded, so the stream is not read again
+    cacheDir = os.path.join(self._cacheRoot, getCacheKey(streamDef))
+    self.assertTrue(os.path.isdir(cacheDir))
+    with self.assertRaises(RecordCacheError):
+      CachedRecordStream(cacheDir)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
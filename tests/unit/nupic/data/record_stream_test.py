@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the batch reading API of the record streams."""
+
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+
+import numpy
+import unittest2 as unittest
+
+from nupic.data.binary_record_stream import (BinaryRecordStream,
+                                             BINARY_FILE_EXTENSION)
+from nupic.data.file_record_stream import FileRecordStream
+from nupic.data.record_stream import valuesToColumn
+from nupic.data.stream_reader import StreamReader
+
+
+
+class RecordsBatchTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._tmpDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self._tmpDir)
+
+
+  def _writeFile(self, streamClass, extension, specials, numRecords):
+    """ Write a file with a timestamp, sequence id, reset and learning field,
+    and the given specials for them.
+    """
+    path = os.path.join(self._tmpDir, "data" + extension)
+    fields = [("timestamp", "datetime", specials[0]),
+              ("sid", "string", specials[1]),
+              ("reset", "int", specials[2]),
+              ("learn", "int", specials[3]),
+              ("category", "int", specials[4]),
+              ("value", "float", ""),
+              ("sdr", "sdr", "")]
+    start = datetime(2014, 12, 1, 22, 10, 7, 500000)
+    with streamClass(path, write=True, fields=fields) as stream:
+      for i in xrange(numRecords):
+        stream.appendRecord([start + timedelta(minutes=37 * i),
+                             "seq%d" % (i // 7),
+                             int(i % 7 == 0),
+                             i % 2,
+                             i % 3,
+                             i * 0.5 if i % 5 else None,
+                             [i % 2, 0]])
+    return path
+
+
+  def _readDicts(self, stream):
+    records = []
+    while True:
+      record = stream.getNextRecordDict()
+      if record is None:
+        return records
+      records.append(record)
+
+
+  def _readBatches(self, stream, batchSize):
+    records = []
+    while True:
+      batch = stream.getNextRecordsBatch(batchSize)
+      if batch is None:
+        return records
+      self.assertLessEqual(len(batch), batchSize)
+      records.extend(batch.getRecordDicts())
+
+
+  def _checkBatches(self, openStream):
+    expected = self._readDicts(openStream())
+    self.assertGreater(len(expected), 0)
+    for batchSize in (1, 7, 1000):
+      self.assertEqual(self._readBatches(openStream(), batchSize), expected)
+
+    # Batches and dicts can be mixed
+    stream = openStream()
+    records = [stream.getNextRecordDict()]
+    records.extend(stream.getNextRecordsBatch(10).getRecordDicts())
+    records.extend(self._readDicts(stream))
+    self.assertEqual(records, expected)
+
+
+  def testSpecials(self):
+    for specials in (["T", "S", "R", "L", "C"],
+                     ["T", "S", "", "", ""],
+                     ["T", "", "R", "", ""],
+                     ["", "", "", "", ""]):
+      for (streamClass, extension) in ((FileRecordStream, ".csv"),
+                                       (BinaryRecordStream,
+                                        BINARY_FILE_EXTENSION)):
+        path = self._writeFile(streamClass, extension, specials, 50)
+        self._checkBatches(lambda: streamClass(path))
+
+
+  def testColumns(self):
+    path = self._writeFile(BinaryRecordStream, BINARY_FILE_EXTENSION,
+                           ["T", "S", "R", "L", "C"], 10)
+    batch = BinaryRecordStream(path).getNextRecordsBatch(5)
+
+    self.assertEqual(len(batch), 5)
+    self.assertEqual(batch["timestamp"].dtype, numpy.dtype("datetime64[us]"))
+    self.assertEqual(batch["category"].tolist(), [0, 1, 2, 0, 1])
+    self.assertEqual(batch["_category"].tolist(), [0, 1, 2, 0, 1])
+    self.assertEqual(batch["_reset"].tolist(), [1, 0, 0, 0, 0])
+    self.assertEqual(batch["_learning"].tolist(), [0, 1, 0, 1, 0])
+    # Missing values are kept in object arrays
+    self.assertEqual(batch["value"].tolist(), [None, 0.5, 1.0, 1.5, 2.0])
+    self.assertEqual(batch["sdr"].tolist(), [[0, 0], [1, 0], [0, 0], [1, 0],
+                                             [0, 0]])
+
+
+  def testTimestampRecordIdx(self):
+    # Spans 3 months
+    path = self._writeFile(FileRecordStream, ".csv", ["T", "", "", "", ""],
+                           3500)
+
+    for aggregation in ({"minutes": 15, "fields": [("value", "sum")]},
+                        {"months": 2, "fields": [("value", "sum")]},
+                        {"days": 1, "hours": 1, "fields": [("value", "sum")]}):
+      streamDef = {
+        "version": 1,
+        "info": "records batch test",
+        "streams": [{"source": "file://%s" % path,
+                     "info": "data.csv",
+                     "columns": ["timestamp", "value"]}],
+        "aggregation": aggregation,
+      }
+      self._checkBatches(lambda: StreamReader(streamDef))
+
+
+  def testValuesToColumn(self):
+    self.assertEqual(valuesToColumn("int", [1, 2]).dtype.kind, "i")
+    self.assertEqual(valuesToColumn("float", [1.5, 2.0]).dtype.kind, "f")
+    self.assertEqual(valuesToColumn("bool", [True, False]).dtype.kind, "b")
+    self.assertEqual(valuesToColumn("int", [1, None]).dtype, object)
+    self.assertEqual(valuesToColumn("int", [10 ** 30]).tolist(), [10 ** 30])
+    self.assertEqual(valuesToColumn("list", [[1, 2], [3, 4]]).shape, (2,))
+    self.assertEqual(valuesToColumn("string", []).shape, (0,))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the SQLite backend of the cluster database."""
+
+import json
+import shutil
+import tempfile
+import time
+
+import unittest2 as unittest
+
+from nupic.database.ClientJobsDAO import ClientJobsDAO
+from nupic.database.Connection import ConnectionFactory
+from nupic.database.SQLiteConnection import (SQLiteConnectionPolicy,
+                                             _translateCreateTable,
+                                             _translateParams)
+
+
+
+class SQLiteTranslationTest(unittest.TestCase):
+
+
+  def testTranslateParams(self):
+    (query, params) = _translateParams(
+      "SELECT a FROM t WHERE b=%s AND c IN %s AND d LIKE 'x%%'",
+      ["b", (1, 2, 3)])
+    self.assertEqual(query,
+                     "SELECT a FROM t WHERE b=? AND c IN (?,?,?) AND d LIKE 'x%'")
+    self.assertEqual(params, ["b", 1, 2, 3])
+
+
+  def testTranslateParamsWithoutParams(self):
+    self.assertEqual(_translateParams("SELECT '%%'", None), ("SELECT '%%'", ()))
+
+
+  def testTranslateCreateTable(self):
+    statements = _translateCreateTable(
+      "db", "jobs",
+      'job_id INT UNSIGNED NOT NULL AUTO_INCREMENT, '
+      'status VARCHAR(16) DEFAULT "notStarted", '
+      'job_hash BINARY(16) DEFAULT NULL, '
+      'cancel BOOLEAN DEFAULT FALSE, '
+      'PRIMARY KEY (job_id), '
+      'UNIQUE INDEX (status, job_hash), '
+      'INDEX (status)',
+      "AUTO_INCREMENT=1000")
+
+    self.assertEqual(statements[0],
+                     "CREATE TABLE IF NOT EXISTS db.jobs ("
+                     "job_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "status VARCHAR(16) DEFAULT 'notStarted', "
+                     "job_hash BLOB DEFAULT NULL, "
+                     "cancel BOOLEAN DEFAULT 0, "
+                     "UNIQUE (status, job_hash))")
+    self.assertEqual(statements[1],
+                     "CREATE INDEX IF NOT EXISTS db.jobs_status ON jobs "
+                     "(status)")
+    self.assertIn("999", statements[2])
+
+
+
+class SQLiteClientJobsDAOTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self._dataDir = tempfile.mkdtemp()
+    ConnectionFactory.setConnectionPolicyProvider(
+      lambda: SQLiteConnectionPolicy(dataDir=self._dataDir, timeout=10))
+    self._dao = ClientJobsDAO()
+    self._dao.connect()
+
+
+  def tearDown(self):
+    ConnectionFactory.close()
+    ConnectionFactory.setConnectionPolicyProvider(
+      ConnectionFactory._createDefaultPolicy)
+    shutil.rmtree(self._dataDir)
+
+
+  def _insertRunningJob(self):
+    jobID = self._dao.jobInsert(client="test", cmdLine="echo",
+                                params=json.dumps({"a": 1}),
+                                jobType=ClientJobsDAO.JOB_TYPE_HS)
+    self.assertEqual(self._dao.jobStartNext(), jobID)
+    return jobID
+
+
+  def testJobLifecycle(self):
+    jobID = self._dao.jobInsert(client="test", cmdLine="echo")
+    self.assertEqual(jobID, 1000)
+
+    info = self._dao.jobInfo(jobID)
+    self.assertEqual(info.status, ClientJobsDAO.STATUS_NOTSTARTED)
+    self.assertEqual(info.cancel, 0)
+    self.assertIsNone(info.startTime)
+
+    self.assertEqual(self._dao.jobStartNext(), jobID)
+    (status, startTime) = self._dao.jobGetFields(jobID,
+                                                 ["status", "startTime"])
+    self.assertEqual(status, ClientJobsDAO.STATUS_RUNNING)
+    self.assertIsNotNone(startTime)
+
+    self._dao.jobCancel(jobID)
+    self.assertEqual(self._dao.jobCountCancellingJobs(), 1)
+
+    self._dao.jobSetCompleted(jobID, ClientJobsDAO.CMPL_REASON_CANCELLED, "",
+                              useConnectionID=False)
+    self._dao.jobResume(jobID)
+    # Resuming restores the column defaults
+    self.assertEqual(self._dao.jobGetFields(jobID, ["status", "cancel",
+                                                    "completionReason"]),
+                     [ClientJobsDAO.STATUS_NOTSTARTED, 0, None])
+
+
+  def testJobFields(self):
+    jobID = self._insertRunningJob()
+
+    self._dao.jobSetFields(jobID, {"engStatus": "working"},
+                           useConnectionID=False)
+    self.assertTrue(self._dao.jobSetFieldIfEqual(jobID, "engWorkerState",
+                                                 "state1", None))
+    self.assertFalse(self._dao.jobSetFieldIfEqual(jobID, "engWorkerState",
+                                                  "state2", None))
+    self._dao.jobIncrementIntField(jobID, "numFailedWorkers",
+                                   useConnectionID=False)
+
+    self.assertEqual(
+      self._dao.jobGetFields(jobID, ["engStatus", "engWorkerState",
+                                     "numFailedWorkers"]),
+      ["working", "state1", 1])
+
+
+  def testJobInsertUnique(self):
+    jobHash = "\xff" * ClientJobsDAO.HASH_MAX_LEN
+    jobID = self._dao.jobInsertUnique("test", "echo", jobHash)
+    self.assertEqual(self._dao.jobInsertUnique("test", "echo", jobHash), jobID)
+    self.assertEqual(self._dao.jobInfo(jobID).jobHash, jobHash)
+
+
+  def testModels(self):
+    jobID = self._insertRunningJob()
+
+    (modelID, isNew) = self._dao.modelInsertAndStart(jobID, "params1",
+                                                     "a" * 16, "\xfe" * 16)
+    self.assertTrue(isNew)
+    # Models with the same params are detected
+    self.assertEqual(self._dao.modelInsertAndStart(jobID, "params1",
+                                                   "a" * 16, "\xfe" * 16),
+                     (modelID, False))
+
+    self._dao.modelUpdateResults(modelID, results="results", metricValue=1.5,
+                                 numRecords=10)
+    self.assertEqual(
+      self._dao.modelsGetFields([modelID], ["results", "optimizedMetric",
+                                            "numRecords", "updateCounter"]),
+      [(modelID, ["results", 1.5, 10, 1])])
+
+    self._dao.modelSetCompleted(modelID, ClientJobsDAO.CMPL_REASON_EOF, "")
+    (result,) = self._dao.modelsGetResultAndStatus([modelID])
+    self.assertEqual(result.status, ClientJobsDAO.STATUS_COMPLETED)
+    self.assertEqual(result.engParamsHash, "a" * 16)
+
+    self.assertEqual(len(self._dao.jobInfoWithModels(jobID)), 1)
+
+
+  def testModelsGetChangesSince(self):
+    jobID = self._insertRunningJob()
+    (modelID1, _) = self._dao.modelInsertAndStart(jobID, "params1", "c" * 16)
+    (modelID2, _) = self._dao.modelInsertAndStart(jobID, "params2", "d" * 16)
+
+    changes = self._dao.modelsGetChangesSince(jobID, 0)
+    self.assertEqual([(c.modelId, c.updateCounter) for c in changes],
+                     [(modelID1, 0), (modelID2, 0)])
+    lastSeq = changes[-1].engChangeSeq
+    self.assertEqual(self._dao.modelsGetChangesSince(jobID, lastSeq), [])
+
+    # Only the models changed since the last read are returned, in the order
+    # of their changes
+    self._dao.modelUpdateResults(modelID2, results="results")
+    self._dao.modelSetFields(modelID1, {"engMatured": True})
+    self._dao.modelUpdateResults(modelID2, numRecords=5)
+    changes = self._dao.modelsGetChangesSince(jobID, lastSeq)
+    self.assertEqual([(c.modelId, c.updateCounter) for c in changes],
+                     [(modelID1, 1), (modelID2, 2)])
+    self.assertGreater(changes[0].engChangeSeq, lastSeq)
+    self.assertGreater(changes[1].engChangeSeq, changes[0].engChangeSeq)
+
+    lastSeq = changes[-1].engChangeSeq
+    self._dao.modelSetCompleted(modelID1, ClientJobsDAO.CMPL_REASON_EOF, "")
+    self.assertEqual([c.modelId for c in
+                      self._dao.modelsGetChangesSince(jobID, lastSeq)],
+                     [modelID1])
+
+    # Each job has its own sequence
+    otherJobID = self._insertRunningJob()
+    self.assertEqual(self._dao.modelsGetChangesSince(otherJobID, 0), [])
+
+
+  def testModelAdoptNextOrphan(self):
+    jobID = self._insertRunningJob()
+    (modelID, _) = self._dao.modelInsertAndStart(jobID, "params", "b" * 16)
+
+    self.assertIsNone(self._dao.modelAdoptNextOrphan(jobID, 60))
+    # Timestamps have a resolution of one second
+    time.sleep(1.1)
+    self.assertEqual(self._dao.modelAdoptNextOrphan(jobID, 0), modelID)
+
+
+  def testRecreate(self):
+    self._insertRunningJob()
+    self._dao.connect(recreate=True)
+    self.assertEqual(self._dao.getJobs(["jobId"]), ())
+
+
+
+if __name__ == "__main__":
+  unittest.main()
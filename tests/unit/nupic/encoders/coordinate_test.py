@@ -21,6 +21,7 @@
 # ----------------------------------------------------------------------
 
 import capnp  # For import hook
+import cPickle as pickle
 import numpy as np
 import tempfile
 import unittest
@@ -166,6 +167,35 @@ class CoordinateEncoderTest(unittest.TestCase):
     self.assertTrue(np.array_equal(output2, output1))
 
 
+  def testEncodeIntoArrayUncached(self):
+    """The cached encoding equals picking the top W coordinates directly."""
+    n = 999
+    w = 21
+    encoder = CoordinateEncoder(name="coordinate", n=n, w=w)
+    encoder.cacheSize = 100
+
+    position = np.array([100, 200])
+    for offset in ([0, 0], [1, 0], [1, 2], [-3, 5], [50, 50], [0, 0]):
+      coordinate = position + np.array(offset)
+      output = encode(encoder, coordinate, 5)
+      self.assertLessEqual(len(encoder._coordinateCache), 121)
+
+      neighbors = encoder._neighbors(coordinate, 5)
+      winners = encoder._topWCoordinates(neighbors, w)
+      expected = np.zeros(n, dtype=defaultDtype)
+      expected[[encoder._bitForCoordinate(c, n) for c in winners]] = 1
+      self.assertTrue(np.array_equal(output, expected))
+
+
+  def testPickleDropsCache(self):
+    output1 = encode(self.encoder, np.array([100, 200]), 5)
+    encoder = pickle.loads(pickle.dumps(self.encoder))
+
+    self.assertEqual(len(encoder._coordinateCache), 0)
+    output2 = encode(encoder, np.array([100, 200]), 5)
+    self.assertTrue(np.array_equal(output1, output2))
+
+
   def testEncodeSaturateArea(self):
     n = 1999
     w = 25
@@ -173,6 +173,58 @@ class DateEncoderTest(unittest.TestCase):
         self.assertNotEqual(d.weekday(), 0)
 
 
+  def testCachedEncoding(self):
+    """Cached encodings match freshly computed ones, also after evictions"""
+    e = DateEncoder(season=3, dayOfWeek=1, weekend=1, holiday=5, timeOfDay=5,
+                    forced=True)
+    e.cacheSize = 64
+    reference = DateEncoder(season=3, dayOfWeek=1, weekend=1, holiday=5,
+                            timeOfDay=5, forced=True)
+
+    d = datetime.datetime(2010, 12, 20, 0, 0)
+    for _ in xrange(2 * 24 * 30):
+      d += datetime.timedelta(minutes=30)
+      reference._initCache()
+      self.assertTrue(numpy.array_equal(e.encode(d), reference.encode(d)))
+      self.assertLessEqual(len(e._encodingCache), e.cacheSize)
+
+    # Sub-fields with the same values share their cache entries
+    e = DateEncoder(dayOfWeek=1, timeOfDay=5)
+    e.encode(datetime.datetime(2010, 11, 4, 14, 55))
+    e.encode(datetime.datetime(2010, 11, 11, 14, 58))
+    e.encode(datetime.datetime(2010, 11, 12, 14, 55))
+    self.assertEqual(len(e._encodingCache), 4)
+
+
+  def testSharedDecomposition(self):
+    """The values of the last input are reused for scalars and encodings"""
+    d = datetime.datetime(2010, 11, 4, 14, 55)
+    self._e.encode(d)
+    self.assertIs(self._e._lastInput, d)
+
+    values = self._e.getEncodedValues(d)
+    self.assertEqual(values, [307, 3, 0, 14 + 55 / 60.0])
+    values.append(1)
+    self.assertEqual(self._e.getEncodedValues(d), [307, 3, 0, 14 + 55 / 60.0])
+    self.assertTrue(numpy.array_equal(self._e.getScalars(d),
+                                      [307, 3, 0, 14 + 55 / 60.0]))
+
+    other = datetime.datetime(2010, 11, 6, 14, 55)
+    self.assertEqual(self._e.getEncodedValues(other)[:3], [309, 5, 1])
+
+
+  def testPickleDropsCache(self):
+    import cPickle as pickle
+
+    self._e.encode(self._d)
+    self.assertEqual(len(self._e._encodingCache), 4)
+
+    e = pickle.loads(pickle.dumps(self._e))
+    self.assertEqual(len(e._encodingCache), 0)
+    self.assertIsNone(e._lastInput)
+    self.assertTrue(numpy.array_equal(e.encode(self._d), self._expected))
+
+
   def testReadWrite(self):
     originalTS = datetime.datetime(1997, 8, 29, 2, 14)
     originalValue = self._e.encode(originalTS)
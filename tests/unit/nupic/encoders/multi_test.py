@@ -22,12 +22,14 @@
 
 """Unit tests for multi- encoder"""
 
+import datetime
 import numpy
 import tempfile
 import unittest2 as unittest
 
+from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
 from nupic.encoders.multi import MultiEncoder
-from nupic.encoders import ScalarEncoder, SDRCategoryEncoder
+from nupic.encoders import DateEncoder, ScalarEncoder, SDRCategoryEncoder
 from nupic.data.dictutils import DictObj
 
 from nupic.encoders.multi_capnp import MultiEncoderProto
@@ -86,6 +88,32 @@ class MultiEncoderTest(unittest.TestCase):
     self.assertEqual(topDownOut[2].encoding.sum(), 3)
 
 
+  def testEncodeAll(self):
+    """encodeAll matches encodeIntoArray, getScalars and getEncodedValues"""
+    e = MultiEncoder()
+    e.addEncoder("myval",
+                 ScalarEncoder(w=5, resolution=1, minval=1, maxval=10,
+                               periodic=False, name="aux", forced=True))
+    e.addEncoder("timestamp",
+                 DateEncoder(dayOfWeek=3, timeOfDay=5, name="timestamp"))
+    e.addEncoder("myCat",
+                 SDRCategoryEncoder(n=7, w=3, name="myCat", forced=True))
+
+    records = [DictObj(myval=3, myCat="run",
+                       timestamp=datetime.datetime(2010, 11, 4, 14, 55)),
+               DictObj(myval=7.5, myCat="pass",
+                       timestamp=datetime.datetime(2010, 11, 6, 2, 10)),
+               DictObj(myval=7.5, myCat="run",
+                       timestamp=SENTINEL_VALUE_FOR_MISSING_DATA)]
+    for record in records:
+      output = numpy.zeros(e.getWidth(), dtype="uint8")
+      (scalars, encodedValues) = e.encodeAll(record, output)
+
+      self.assertTrue(numpy.array_equal(output, e.encode(record)))
+      self.assertTrue(numpy.array_equal(scalars, e.getScalars(record)))
+      self.assertEqual(scalars.dtype, e.getScalars(record).dtype)
+      self.assertEqual(encodedValues, e.getEncodedValues(record))
+
 
   def testReadWrite(self):
     original = MultiEncoder()
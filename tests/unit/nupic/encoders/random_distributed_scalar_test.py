@@ -21,6 +21,7 @@
 # ----------------------------------------------------------------------
 
 from cStringIO import StringIO
+import cPickle as pickle
 import sys
 import tempfile
 import unittest2 as unittest
@@ -444,6 +445,70 @@ class RandomDistributedScalarEncoderTest(unittest.TestCase):
                      "zero verbosity doesn't lead to zero output")
 
 
+  def testNewBitsOK(self):
+    """
+    Test that the bits accepted through the occupancy matrix are exactly those
+    for which _newRepresentationOK holds.
+    """
+    encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
+                                             w=5, n=5*20, seed=getSeed())
+    encoder.encode(-30.0)
+    encoder.encode(30.0)
+
+    for (index, newIndex) in ((encoder.minIndex, encoder.minIndex - 1),
+                              (encoder.maxIndex, encoder.maxIndex + 1)):
+      ri = newIndex % encoder.w
+      newBitsOK = encoder._newBitsOK(index, newIndex, ri)
+      for newBit in xrange(encoder.n):
+        newRepresentation = encoder.bucketMap[index].copy()
+        newRepresentation[ri] = newBit
+        expected = (newBit not in encoder.bucketMap[index] and
+                    encoder._newRepresentationOK(newRepresentation, newIndex))
+        self.assertEqual(newBitsOK[newBit], expected,
+                         "Wrong result for bit %d" % newBit)
+
+
+  def testPrecomputeBuckets(self):
+    """
+    Test that precomputeBuckets creates all the buckets of a range, and that
+    they are valid.
+    """
+    encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
+                                             w=21, n=400, seed=getSeed())
+    encoder.precomputeBuckets(-100.0, 200.0)
+
+    self.assertEqual(encoder._offset, 50.0)
+    self.assertEqual(encoder.maxIndex - encoder.minIndex, 300)
+    self.assertEqual(len(encoder.bucketMap), 301)
+    self.assertTrue(validateEncoder(encoder, subsampling=3),
+                    "Precomputed buckets are not valid")
+
+    numBuckets = len(encoder.bucketMap)
+    encoder.encode(-100.0)
+    encoder.encode(75.3)
+    encoder.encode(200.0)
+    self.assertEqual(len(encoder.bucketMap), numBuckets)
+
+    with self.assertRaises(ValueError):
+      encoder.precomputeBuckets(1.0, 0.0)
+
+
+  def testPickleRebuildsOccupancy(self):
+    encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
+                                             w=21, n=400, seed=getSeed())
+    encoder.encode(0.0)
+    encoder.encode(50.0)
+
+    state = encoder.__getstate__()
+    self.assertNotIn("_bucketOccupancy", state)
+
+    unpickled = pickle.loads(pickle.dumps(encoder))
+    self.assertTrue(numpy.array_equal(unpickled._bucketOccupancy,
+                                      encoder._bucketOccupancy))
+    self.assertTrue(numpy.array_equal(unpickled.encode(-20.0),
+                                      encoder.encode(-20.0)))
+
+
   def testEncodeInvalidInputType(self):
     encoder = RandomDistributedScalarEncoder(name="encoder", resolution=1.0,
                                              verbosity=0)
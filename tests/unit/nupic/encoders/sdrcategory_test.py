@@ -313,6 +313,78 @@ class SDRCategoryEncoderTest(unittest.TestCase):
     self.assertTrue(numpy.array_equal(t.encode("GS"), gs))
 
 
+  def testCompact(self):
+    """Compact encoders produce the same encodings and decodings as dense
+    ones."""
+    fieldWidth = 100
+    bitsOn = 10
+
+    dense = SDRCategoryEncoder(n=fieldWidth, w=bitsOn, name="foo",
+                               forced=True)
+    compact = SDRCategoryEncoder(n=fieldWidth, w=bitsOn, name="foo",
+                                 forced=True, compact=True)
+    self.assertIsNone(compact.sdrs)
+
+    categories = ["cat%d" % i for i in xrange(40)]
+    for category in categories:
+      encoded = compact.encode(category)
+      self.assertTrue(numpy.array_equal(encoded, dense.encode(category)))
+      self.assertEqual(encoded.sum(), bitsOn)
+
+      # The top down mapping grows along with the categories
+      self.assertEqual(compact.topDownCompute(encoded).value, category)
+
+    self.assertEqual(compact._sdrIndices.shape, (64, bitsOn))
+    self.assertEqual(len(compact._sdrSignatures), len(categories) + 1)
+
+    for category in categories + ["<UNKNOWN>"]:
+      encoded = dense.encode(category)
+      self.assertEqual(compact.decode(encoded), dense.decode(encoded))
+      bucketIndices = compact.getBucketIndices(category)
+      self.assertTrue(numpy.array_equal(
+        compact.getBucketInfo(bucketIndices)[0].encoding, encoded))
+
+    missing = compact.encode(SENTINEL_VALUE_FOR_MISSING_DATA)
+    self.assertEqual(missing.sum(), 0)
+
+
+  def testCompactPickle(self):
+    import cPickle as pickle
+
+    s = SDRCategoryEncoder(n=100, w=10, name="foo", forced=True, compact=True)
+    es = s.encode("ES")
+    us = s.encode("US")
+
+    t = pickle.loads(pickle.dumps(s))
+    self.assertTrue(numpy.array_equal(t.encode("ES"), es))
+    self.assertTrue(numpy.array_equal(t.encode("US"), us))
+    self.assertTrue(numpy.array_equal(t.encode("GS"), s.encode("GS")))
+
+
+  def testCompactReadWrite(self):
+    original = SDRCategoryEncoder(n=100, w=10, name="foo", forced=True,
+                                  compact=True)
+    es = original.encode("ES")
+    us = original.encode("US")
+
+    proto1 = SDRCategoryEncoderProto.new_message()
+    original.write(proto1)
+
+    # Write the proto to a temp file and read it back into a new proto
+    with tempfile.TemporaryFile() as f:
+      proto1.write(f)
+      f.seek(0)
+      proto2 = SDRCategoryEncoderProto.read(f)
+
+    encoder = SDRCategoryEncoder.read(proto2)
+
+    self.assertTrue(encoder._compact)
+    self.assertIsNone(encoder.sdrs)
+    self.assertTrue(numpy.array_equal(encoder.encode("ES"), es))
+    self.assertTrue(numpy.array_equal(encoder.encode("US"), us))
+    self.assertEqual(encoder.topDownCompute(us).value, "US")
+
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -22,12 +22,108 @@
 
 """Unit tests for the clamodel module."""
 
+import copy
 import datetime
+import shutil
+import tempfile
+
+import numpy
 import unittest2 as unittest
 
 from nupic.frameworks.opf.clamodel import CLAModel
+from nupic.frameworks.opf.model import Model
 from nupic.frameworks.opf.modelfactory import ModelFactory
-from nupic.frameworks.opf.opfutils import ModelResult
+from nupic.frameworks.opf.opfutils import InferenceElement, ModelResult
+from nupic.support.serializationutils import (findMappableArrays,
+                                              resolveAttrPath)
+
+
+
+def _getModelConfig(inferenceType, implementation):
+  """ Returns the config of a small CLA model of the "c0" timestamps and "c1"
+  values of _getRecords(), with a classifier predicting "c1" one step ahead.
+
+  inferenceType:  the inference type of the model, e.g. "TemporalAnomaly"
+  implementation: "cpp" or "py", for the SP and TP regions
+  """
+  timeOfDayEncoder = {"fieldname": "c0",
+                      "name": "c0",
+                      "timeOfDay": [21, 9.49122334747737],
+                      "type": "DateEncoder"}
+  valueEncoder = {"fieldname": "c1",
+                  "name": "c1",
+                  "resolution": 0.8771929824561403,
+                  "seed": 42,
+                  "type": "RandomDistributedScalarEncoder"}
+  spParams = {"potentialPct": 0.8,
+              "columnCount": 2048,
+              "globalInhibition": 1,
+              "inputWidth": 0,
+              "maxBoost": 1.0,
+              "numActiveColumnsPerInhArea": 40,
+              "seed": 1956,
+              "spVerbosity": 0,
+              "spatialImp": implementation,
+              "synPermActiveInc": 0.0015,
+              "synPermConnected": 0.1,
+              "synPermInactiveDec": 0.0005}
+  tpParams = {"activationThreshold": 13,
+              "cellsPerColumn": 32,
+              "columnCount": 2048,
+              "globalDecay": 0.0,
+              "initialPerm": 0.21,
+              "inputWidth": 2048,
+              "maxAge": 0,
+              "maxSegmentsPerCell": 128,
+              "maxSynapsesPerSegment": 32,
+              "minThreshold": 10,
+              "newSynapseCount": 20,
+              "outputType": "normal",
+              "pamLength": 3,
+              "permanenceDec": 0.1,
+              "permanenceInc": 0.1,
+              "seed": 1960,
+              "temporalImp": implementation,
+              "verbosity": 0}
+  modelParams = {"anomalyParams": {"anomalyCacheRecords": None,
+                                   "autoDetectThreshold": None,
+                                   "autoDetectWaitRecords": 5030},
+                 "clEnable": True,
+                 "clParams": {"alpha": 0.035828933612158,
+                              "clVerbosity": 0,
+                              "regionName": "CLAClassifierRegion",
+                              "steps": "1"},
+                 "inferenceType": inferenceType,
+                 "sensorParams": {"encoders": {"c0_timeOfDay":
+                                                 timeOfDayEncoder,
+                                               "c1": valueEncoder},
+                                  "sensorAutoReset": None,
+                                  "verbosity": 0},
+                 "spEnable": True,
+                 "spParams": spParams,
+                 "tpEnable": True,
+                 "tpParams": tpParams,
+                 "trainSPNetOnlyIfRequested": False}
+  return {"model": "CLA",
+          "modelParams": modelParams,
+          "predictAheadTime": None,
+          "version": 1}
+
+
+
+def _getRecords():
+  """ Returns the input records of the models of _getModelConfig() """
+  records = []
+  for i, value in enumerate([5.0, 6.0, 7.0]):
+    timestamp = datetime.datetime(2013, 12, 5 + i)
+    records.append({"_category": None,
+                    "_reset": 0,
+                    "_sequenceId": 0,
+                    "_timestamp": timestamp,
+                    "_timestampRecordIdx": None,
+                    "c0": timestamp,
+                    "c1": value})
+  return records
 
 
 
@@ -192,5 +288,85 @@ class CLAModelTest(unittest.TestCase):
       self.assertIsInstance(result, ModelResult)
 
 
+  def testRegionArraysSurviveSaveAndLoad(self):
+    """ The python region arrays set aside while the network is saved are
+    restored in the saved model, and memory-mapped back on load.
+    """
+    model = ModelFactory.create(
+        modelConfig=_getModelConfig("TemporalMultiStep", "py"))
+    model.enableInference({"predictedField": "c1",
+                           "predictionSteps": [1]})
+    for record in _getRecords():
+      model.run(record)
+
+    def regionArrays(claModel):
+      arrays = {}
+      for (regionName, region) in claModel._netInfo.net.regions.items():
+        if region.type.startswith("py."):
+          for (attrPath, _, _, array) in findMappableArrays(region.getSelf()):
+            arrays[(regionName, attrPath)] = array
+      return arrays
+
+    savedArrays = regionArrays(model)
+    self.assertGreater(len(savedArrays), 0)
+
+    checkpointDir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, checkpointDir)
+    model.save(checkpointDir)
+
+    # Saving detaches the arrays, so check they were put back in the model
+    self.assertItemsEqual(regionArrays(model).keys(), savedArrays.keys())
+
+    loadedModel = Model.load(checkpointDir)
+    regions = loadedModel._netInfo.net.regions
+    for ((regionName, attrPath), array) in savedArrays.iteritems():
+      (owner, attrName) = resolveAttrPath(regions[regionName].getSelf(),
+                                          attrPath)
+      loadedArray = getattr(owner, attrName)
+      self.assertIsNotNone(loadedArray, "%s.%s" % (regionName, attrPath))
+      numpy.testing.assert_array_equal(loadedArray, array)
+
+    self.assertTrue(any(isinstance(array, numpy.memmap)
+                        for array in regionArrays(loadedModel).itervalues()))
+
+
+  def testLeanResults(self):
+    """ Lean results keep the anomaly score and the best predictions, but skip
+    the likelihood dicts and the copies of the sensor input.
+    """
+    modelConfig = _getModelConfig("TemporalAnomaly", "cpp")
+    leanConfig = copy.deepcopy(modelConfig)
+    leanConfig["modelParams"]["leanResults"] = True
+
+    inferenceArgs = {"inputPredictedField": "auto",
+                     "predictedField": "c1",
+                     "predictionSteps": [1]}
+
+    model = ModelFactory.create(modelConfig=modelConfig)
+    model.enableInference(inferenceArgs)
+    leanModel = ModelFactory.create(modelConfig=leanConfig)
+    leanModel.enableInference(inferenceArgs)
+    self.assertFalse(model.isLeanResults())
+    self.assertTrue(leanModel.isLeanResults())
+
+    for row in _getRecords():
+      result = model.run(row)
+      leanResult = leanModel.run(row)
+
+      self.assertIs(leanResult.sensorInput.dataDict, row)
+      self.assertIsNone(leanResult.sensorInput.dataRow)
+      self.assertIsNone(leanResult.sensorInput.dataEncodings)
+      self.assertEqual(leanResult.sensorInput.sequenceReset,
+                       result.sensorInput.sequenceReset)
+
+      self.assertNotIn(InferenceElement.multiStepPredictions,
+                       leanResult.inferences)
+      self.assertEqual(
+          leanResult.inferences[InferenceElement.multiStepBestPredictions],
+          result.inferences[InferenceElement.multiStepBestPredictions])
+      self.assertEqual(leanResult.inferences[InferenceElement.anomalyScore],
+                       result.inferences[InferenceElement.anomalyScore])
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the model_host module."""
+
+import threading
+
+import unittest2 as unittest
+
+from nupic.data.dictutils import DictObj
+from nupic.frameworks.opf.model_host import ModelHost, ModelHostError
+from nupic.frameworks.opf.modelfactory import ModelFactory
+from nupic.frameworks.opf.opfutils import InferenceElement
+
+
+
+_MODEL_PARAMS = {
+  "model": "TwoGram",
+  "modelParams": {
+    "inferenceType": "TemporalNextStep",
+    "encoderParams": {"a": {"fieldname": "a",
+                            "maxval": 9,
+                            "minval": 0,
+                            "n": 10,
+                            "w": 1,
+                            "clipInput": True,
+                            "forced": True,
+                            "type": "ScalarEncoder"}},
+  },
+}
+
+
+
+class ModelHostTest(unittest.TestCase):
+  """Unit tests for ModelHost."""
+
+
+  def setUp(self):
+    self.host = ModelHost(numWorkers=2)
+
+
+  def tearDown(self):
+    self.host.close()
+
+
+  def testRunBatchMatchesLocalModels(self):
+    names = ["model%d" % i for i in xrange(6)]
+    localModels = {}
+    for name in names:
+      self.host.createModel(name, _MODEL_PARAMS, "a")
+      localModels[name] = ModelFactory.create(_MODEL_PARAMS)
+      localModels[name].enableInference({"predictedField": "a"})
+    self.assertItemsEqual(self.host.getModelNames(), names)
+
+    batch = dict((name, [DictObj({"a": (i + j) % 10}) for j in xrange(5)])
+                 for (i, name) in enumerate(names))
+    results = self.host.runBatch(batch)
+
+    self.assertItemsEqual(results.keys(), names)
+    for name in names:
+      self.assertEqual(len(results[name]), 5)
+      for (record, result) in zip(batch[name], results[name]):
+        expected = localModels[name].run(record)
+        self.assertEqual(result.predictionNumber, expected.predictionNumber)
+        self.assertEqual(result.inferences[InferenceElement.prediction],
+                         expected.inferences[InferenceElement.prediction])
+
+    # Models keep their state in the workers between calls
+    result = self.host.run(names[0], DictObj({"a": 0}))
+    self.assertEqual(result.predictionNumber, 5)
+
+    stats = self.host.getStats()
+    self.assertEqual(stats["numModels"], 6)
+    self.assertEqual(stats["numBatches"], 2)
+    self.assertEqual(stats["numRecords"], 31)
+    self.assertEqual(sum(stats["workerRecords"]), 31)
+    self.assertGreater(stats["maxBatchLatency"], 0.0)
+
+
+  def testCreateAndDeleteModel(self):
+    self.host.createModel("a", _MODEL_PARAMS, "a")
+    with self.assertRaises(KeyError):
+      self.host.createModel("a", _MODEL_PARAMS, "a")
+
+    self.host.deleteModel("a")
+    self.assertFalse(self.host.hasModel("a"))
+    with self.assertRaises(KeyError):
+      self.host.run("a", DictObj({"a": 1}))
+
+
+  def testWorkerError(self):
+    with self.assertRaises(ModelHostError):
+      self.host.createModel("bad", {"model": "Unknown", "modelParams": {}},
+                            "a")
+    self.assertFalse(self.host.hasModel("bad"))
+
+    # The worker keeps serving after an error
+    self.host.createModel("good", _MODEL_PARAMS, "a")
+    self.host.run("good", DictObj({"a": 1}))
+
+
+
+  def testRunBatchReturnsPerModelErrors(self):
+    names = ["model%d" % i for i in xrange(4)]
+    for name in names:
+      self.host.createModel(name, _MODEL_PARAMS, "a")
+
+    batch = dict((name, [DictObj({"a": 1})]) for name in names)
+    batch["model0"] = [DictObj({"b": 1})]
+    results = self.host.runBatch(batch)
+
+    self.assertIsInstance(results["model0"], ModelHostError)
+    for name in names[1:]:
+      self.assertEqual(results[name][0].predictionNumber, 0)
+
+    with self.assertRaises(ModelHostError):
+      self.host.run("model0", DictObj({"b": 1}))
+
+
+  def testRunBatchSendFailure(self):
+    names = ["model%d" % i for i in xrange(6)]
+    for name in names:
+      self.host.createModel(name, _MODEL_PARAMS, "a")
+
+    # Records that can't be sent to the last worker of the batch
+    for badName in names:
+      batch = dict((name, [DictObj({"a": 1})]) for name in names)
+      batch[badName] = [DictObj({"a": lambda: 1})]
+      with self.assertRaises(Exception):
+        self.host.runBatch(batch)
+
+    # The replies of the workers that did get their records were discarded,
+    # so every model returns the result of its own record
+    for name in names:
+      result = self.host.run(name, DictObj({"a": 5}))
+      self.assertEqual(result.sensorInput.dataRow, [5])
+
+
+  def testConcurrentRuns(self):
+    names = ["model%d" % i for i in xrange(4)]
+    for name in names:
+      self.host.createModel(name, _MODEL_PARAMS, "a")
+
+    predictionNumbers = dict((name, []) for name in names)
+
+    def runModel(name):
+      for i in xrange(50):
+        result = self.host.run(name, DictObj({"a": i % 10}))
+        predictionNumbers[name].append(result.predictionNumber)
+
+    threads = [threading.Thread(target=runModel, args=(name,))
+               for name in names]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    # Each thread got the results of its own model, in order
+    for name in names:
+      self.assertEqual(predictionNumbers[name], range(50))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
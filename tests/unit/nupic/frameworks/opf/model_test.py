@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the checkpoints of the OPF Model base class."""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from mock import patch
+import numpy
+import unittest2 as unittest
+
+from nupic.frameworks.opf.model import Model
+from nupic.frameworks.opf.opfutils import InferenceType
+
+
+
+class _ChunkedModel(Model):
+  """ Minimal model with one extra data file that never changes and one that
+  changes on every run.
+  """
+
+  def __init__(self):
+    super(_ChunkedModel, self).__init__(InferenceType.TemporalNextStep)
+    self.value = 0
+
+  def run(self, inputRecord):
+    result = super(_ChunkedModel, self).run(inputRecord)
+    self.value = inputRecord["a"]
+    return result
+
+  def finishLearning(self):
+    pass
+
+  def resetSequenceStates(self):
+    pass
+
+  def getFieldInfo(self, includeClassifierOnlyField=False):
+    return ()
+
+  def setFieldStatistics(self, fieldStats):
+    pass
+
+  def getRuntimeStats(self):
+    return {}
+
+  def _getLogger(self):
+    return logging.getLogger(__name__)
+
+  def _serializeExtraData(self, extraDataDir):
+    os.makedirs(extraDataDir)
+    with open(os.path.join(extraDataDir, "static"), "w") as f:
+      f.write("static state")
+    with open(os.path.join(extraDataDir, "dynamic"), "w") as f:
+      f.write("value %d" % self.value)
+
+
+
+class ModelCheckpointTest(unittest.TestCase):
+  """Unit tests for Model.save and Model.load."""
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.checkpointDir = os.path.join(self.tmpDir, "checkpoint")
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _getInode(self, *path):
+    return os.stat(os.path.join(self.checkpointDir, *path)).st_ino
+
+
+  def testSaveAndLoad(self):
+    model = _ChunkedModel()
+    model.run({"a": 3})
+    self.assertIsNone(model.save(self.checkpointDir))
+
+    loadedModel = Model.load(self.checkpointDir)
+    self.assertEqual(loadedModel.value, 3)
+    self.assertItemsEqual(os.listdir(self.tmpDir), ["checkpoint"])
+    self.assertTrue(os.path.isfile(
+        Model._getCheckpointManifestPath(self.checkpointDir)))
+
+
+  def testUnchangedChunksAreShared(self):
+    model = _ChunkedModel()
+    model.run({"a": 1})
+    model.save(self.checkpointDir)
+    staticInode = self._getInode("modelextradata", "static")
+    dynamicInode = self._getInode("modelextradata", "dynamic")
+
+    model.run({"a": 2})
+    model.save(self.checkpointDir)
+
+    if hasattr(os, "link"):
+      self.assertEqual(self._getInode("modelextradata", "static"), staticInode)
+    self.assertNotEqual(self._getInode("modelextradata", "dynamic"),
+                        dynamicInode)
+    with open(os.path.join(self.checkpointDir, "modelextradata",
+                           "dynamic")) as f:
+      self.assertEqual(f.read(), "value 2")
+    self.assertEqual(Model.load(self.checkpointDir).value, 2)
+
+
+  def testBackgroundSave(self):
+    model = _ChunkedModel()
+    model.run({"a": 1})
+    thread = model.save(self.checkpointDir, background=True)
+    # The model state is already written, so the model may change
+    model.run({"a": 2})
+    thread.join()
+
+    self.assertEqual(Model.load(self.checkpointDir).value, 1)
+
+
+  def testBackgroundSaveErrorIsRaisedOnJoin(self):
+    model = _ChunkedModel()
+    with patch.object(Model, "_commitCheckpoint",
+                      side_effect=IOError("disk full")):
+      thread = model.save(self.checkpointDir, background=True)
+      with self.assertRaises(IOError):
+        thread.join()
+
+
+  def testSaveWaitsForPendingBackgroundSave(self):
+    commitCheckpoint = Model._commitCheckpoint
+    released = threading.Event()
+
+    def slowCommitCheckpoint(saveModelDir, logger):
+      released.wait()
+      commitCheckpoint(saveModelDir, logger)
+
+    model = _ChunkedModel()
+    model.run({"a": 1})
+    with patch.object(Model, "_commitCheckpoint",
+                      side_effect=slowCommitCheckpoint):
+      thread = model.save(self.checkpointDir, background=True)
+
+      # The second save would delete the temporary directory of the first one
+      # if it did not wait for it
+      model.run({"a": 2})
+      threading.Timer(0.1, released.set).start()
+      model.save(self.checkpointDir)
+      thread.join()
+
+    self.assertEqual(Model.load(self.checkpointDir).value, 2)
+    self.assertItemsEqual(os.listdir(self.tmpDir), ["checkpoint"])
+
+
+  def testLoadWaitsForPendingBackgroundSave(self):
+    commitCheckpoint = Model._commitCheckpoint
+    released = threading.Event()
+
+    def slowCommitCheckpoint(saveModelDir, logger):
+      released.wait()
+      commitCheckpoint(saveModelDir, logger)
+
+    model = _ChunkedModel()
+    model.run({"a": 1})
+    model.save(self.checkpointDir)
+    model.run({"a": 2})
+    with patch.object(Model, "_commitCheckpoint",
+                      side_effect=slowCommitCheckpoint):
+      thread = model.save(self.checkpointDir, background=True)
+
+      # The load would find the checkpoint half replaced, or the previous one,
+      # if it did not wait for the background save
+      threading.Timer(0.1, released.set).start()
+      self.assertEqual(Model.load(self.checkpointDir).value, 2)
+      thread.join()
+
+
+  def testLoadRecoversInterruptedSwap(self):
+    model = _ChunkedModel()
+    model.run({"a": 1})
+    model.save(self.checkpointDir)
+    model.run({"a": 2})
+    model.save(self.checkpointDir)
+
+    # Simulate a crash after the old checkpoint was moved out of the way
+    os.rename(self.checkpointDir, self.checkpointDir + ".tmp")
+    self.assertEqual(Model.load(self.checkpointDir).value, 2)
+    self.assertTrue(os.path.isdir(self.checkpointDir))
+
+
+  def testLargeArraysAreMapped(self):
+    model = _ChunkedModel()
+    model.array = numpy.arange(10000, dtype="float32")
+    model.save(self.checkpointDir)
+
+    loadedModel = Model.load(self.checkpointDir)
+    self.assertIsInstance(loadedModel.array, numpy.memmap)
+    numpy.testing.assert_array_equal(loadedModel.array, model.array)
+
+    # The mapped array can be changed and saved again over its own checkpoint
+    loadedModel.array[0] = 42
+    loadedModel.save(self.checkpointDir)
+    self.assertEqual(Model.load(self.checkpointDir).array[0], 42)
+
+
+  def testSaveRefusesToReplaceOtherDirectory(self):
+    os.makedirs(self.checkpointDir)
+    with self.assertRaises(Exception):
+      _ChunkedModel().save(self.checkpointDir)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
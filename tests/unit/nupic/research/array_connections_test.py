@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for ArrayConnections.
+
+This test extends the test for the Python Connections to ensure that both
+implementations and their tests stay in sync.
+"""
+
+import unittest
+
+from nupic.research.array_connections import ArrayConnections
+
+# Don't import the ConnectionsTest directly or the unittest.main() will pick
+# it up and run it.
+import connections_test
+
+
+
+class ArrayConnectionsTest(connections_test.ConnectionsTest):
+  """Unit tests for ArrayConnections class."""
+
+
+  def setUp(self):
+    self._connectionsClass = ArrayConnections
+    self.connections = self._connectionsClass(2048 * 32)
+
+
+  def testReuseDestroyedSlots(self):
+    connections = self.connections
+
+    self.assertEqual(connections.createSegment(0), 0)
+    self.assertEqual(connections.createSegment(5), 1)
+    self.assertEqual(connections.createSynapse(0, 254, 0.1173), 0)
+    self.assertEqual(connections.createSynapse(1, 477, 0.3253), 1)
+
+    connections.destroySegment(0)
+    self.assertEqual(connections.numSegments(), 1)
+    self.assertEqual(connections.numSynapses(), 1)
+
+    self.assertEqual(connections.createSegment(7), 0)
+    self.assertEqual(connections.cellForSegment(0), 7)
+    self.assertEqual(connections.synapsesForSegment(0), set())
+
+    self.assertEqual(connections.createSynapse(0, 12, 0.5), 0)
+    self.assertEqual(connections.dataForSynapse(0), (0, 12, 0.5))
+    self.assertEqual(connections.synapsesForPresynapticCell(12),
+                     {0: (0, 12, 0.5)})
+    self.assertEqual(connections.numSegments(), 2)
+    self.assertEqual(connections.numSynapses(), 2)
+
+
+  def testSynapsesForPresynapticCellIsView(self):
+    connections = self.connections
+    segment = connections.createSegment(0)
+    synapse = connections.createSynapse(segment, 12, 0.5)
+
+    synapses = connections.synapsesForPresynapticCell(12)
+    self.assertNotIsInstance(synapses, dict)
+    self.assertEqual(len(synapses), 1)
+    self.assertIn(synapse, synapses)
+    self.assertNotIn(synapse + 1, synapses)
+    with self.assertRaises(KeyError):
+      synapses[synapse + 1]
+
+    # Permanence changes are seen through the view
+    connections.updateSynapsePermanence(synapse, 0.25)
+    self.assertEqual(synapses[synapse], (segment, 12, 0.25))
+
+
+  def testGrowTables(self):
+    connections = self._connectionsClass(100)
+
+    for i in xrange(3000):
+      segment = connections.createSegment(i % 100)
+      connections.createSynapse(segment, (i * 7) % 100, (i % 10) / 10.0)
+
+    self.assertEqual(connections.numSegments(), 3000)
+    self.assertEqual(connections.numSynapses(), 3000)
+    self.assertEqual(connections.cellForSegment(2999), 99)
+    self.assertEqual(connections.dataForSynapse(2999), (2999, 93, 0.9))
+
+
+  def testComputeActivity(self):
+    connections = self.connections
+
+    connections.createSegment(0)
+    connections.createSegment(10)
+    connections.createSynapse(0, 20, 0.6)
+    connections.createSynapse(0, 30, 0.2)
+    connections.createSynapse(1, 20, 0.5)
+    connections.createSynapse(1, 40, 0.7)
+
+    (numActiveConnected,
+     numActive) = connections.computeActivity(set([20, 30]), 0.5)
+    self.assertEqual(list(numActiveConnected), [1, 1])
+    self.assertEqual(list(numActive), [2, 1])
+
+    # Changes after the presynaptic index was built
+    connections.destroySynapse(0)
+    connections.createSynapse(1, 30, 0.9)
+    connections.updateSynapsePermanence(1, 0.8)
+
+    (numActiveConnected,
+     numActive) = connections.computeActivity(set([20, 30]), 0.5)
+    self.assertEqual(list(numActiveConnected), [1, 2])
+    self.assertEqual(list(numActive), [1, 2])
+
+    (numActiveConnected,
+     numActive) = connections.computeActivity(set(), 0.5)
+    self.assertEqual(list(numActiveConnected), [0, 0])
+    self.assertEqual(list(numActive), [0, 0])
+
+
+
+if __name__ == '__main__':
+  unittest.main()
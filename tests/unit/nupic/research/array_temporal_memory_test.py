@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for ArrayTemporalMemory.
+
+Checks that it produces the same results as the Python TemporalMemory.
+"""
+
+import unittest
+
+from nupic.data.generators.pattern_machine import PatternMachine
+from nupic.data.generators.sequence_machine import SequenceMachine
+from nupic.research.array_temporal_memory import ArrayTemporalMemory
+from nupic.research.temporal_memory import TemporalMemory
+
+
+
+class ArrayTemporalMemoryTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.params = {
+      "columnDimensions": [100],
+      "cellsPerColumn": 4,
+      "initialPermanence": 0.3,
+      "connectedPermanence": 0.5,
+      "minThreshold": 2,
+      "activationThreshold": 3,
+      "maxNewSynapseCount": 6,
+      "permanenceIncrement": 0.1,
+      "permanenceDecrement": 0.05,
+      "predictedSegmentDecrement": 0.02,
+      "seed": 42
+    }
+    patternMachine = PatternMachine(100, 4)
+    sequenceMachine = SequenceMachine(patternMachine)
+    self.sequence = sequenceMachine.generateFromNumbers(range(10))
+
+
+  def testComputePredictiveCells(self):
+    tm = ArrayTemporalMemory(**self.params)
+
+    for _ in range(5):
+      for pattern in self.sequence:
+        tm.compute(pattern)
+
+        self.assertEqual(
+          tm.computePredictiveCells(tm.activeCells, tm.connections),
+          TemporalMemory.computePredictiveCells(tm, tm.activeCells,
+                                                tm.connections))
+
+
+  def testComputePredictiveCellsNoPredictedSegmentDecrement(self):
+    self.params["predictedSegmentDecrement"] = 0.0
+    tm = ArrayTemporalMemory(**self.params)
+
+    for _ in range(3):
+      for pattern in self.sequence:
+        tm.compute(pattern)
+
+        (activeSegments,
+         predictiveCells,
+         matchingSegments,
+         matchingCells) = tm.computePredictiveCells(tm.activeCells,
+                                                    tm.connections)
+        self.assertEqual(
+          (activeSegments, predictiveCells, matchingSegments, matchingCells),
+          TemporalMemory.computePredictiveCells(tm, tm.activeCells,
+                                                tm.connections))
+        self.assertEqual(matchingSegments, set())
+
+
+  def testCompute(self):
+    tm1 = TemporalMemory(**self.params)
+    tm2 = ArrayTemporalMemory(**self.params)
+
+    for _ in range(5):
+      for pattern in self.sequence:
+        tm1.compute(pattern)
+        tm2.compute(pattern)
+
+        self.assertEqual(tm1.activeCells, tm2.activeCells)
+        self.assertEqual(tm1.predictiveCells, tm2.predictiveCells)
+        self.assertEqual(tm1.activeSegments, tm2.activeSegments)
+        self.assertEqual(tm1.matchingCells, tm2.matchingCells)
+
+    self.assertEqual(tm1.connections.numSegments(),
+                     tm2.connections.numSegments())
+    self.assertEqual(tm1.connections.numSynapses(),
+                     tm2.connections.numSynapses())
+    self.assertEqual(tm1, tm2)
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -38,7 +38,8 @@ class ConnectionsTest(unittest.TestCase):
 
 
   def setUp(self):
-    self.connections = Connections(2048 * 32)
+    self._connectionsClass = Connections
+    self.connections = self._connectionsClass(2048 * 32)
 
 
   def testCreateSegment(self):
@@ -217,7 +218,7 @@ class ConnectionsTest(unittest.TestCase):
 
 
   def testWrite(self):
-    c1 = Connections(1024)
+    c1 = self._connectionsClass(1024)
 
     # Add data before serializing
     c1.createSegment(0)
@@ -247,7 +248,7 @@ class ConnectionsTest(unittest.TestCase):
       proto2 = ConnectionsProto_capnp.ConnectionsProto.read(f)
 
     # Load the deserialized proto
-    c2 = Connections.read(proto2)
+    c2 = self._connectionsClass.read(proto2)
 
     # Check that the two connections objects are functionally equal
     self.assertEqual(c1, c2)
@@ -23,6 +23,7 @@
 # Disable since test code accesses private members in the class to be tested
 # pylint: disable=W0212
 
+import cPickle as pickle
 import numbers
 import tempfile
 import unittest
@@ -146,6 +147,49 @@ class SpatialPoolerTest(unittest.TestCase):
       self.assertEqual(list(perm), list(potential))
 
 
+  def testComputeBatch(self):
+    """Checks that computing a batch of inputs gives the same active columns
+    and state as calling compute on each input in turn"""
+
+    params = dict(self._params)
+    params.update({"inputDimensions": [20],
+                   "columnDimensions": [16],
+                   "stimulusThreshold": 1})
+    numpy.random.seed(getSeed())
+    inputMatrix = (numpy.random.random((12, 20)) > 0.6).astype(realDType)
+
+    for globalInhibition in [False, True]:
+      params["globalInhibition"] = globalInhibition
+
+      for learn in [False, True]:
+        sp1 = SpatialPooler(**params)
+        sp2 = SpatialPooler(**params)
+
+        activeArrays = sp2.computeBatch(inputMatrix, learn=learn)
+        self.assertEqual(activeArrays.shape, (12, 16))
+
+        for inputVector, batchActiveArray in zip(inputMatrix, activeArrays):
+          activeArray = numpy.zeros(16)
+          sp1.compute(inputVector, learn, activeArray)
+          self.assertListEqual(list(activeArray), list(batchActiveArray))
+
+        self.assertEqual(sp1.getIterationNum(), sp2.getIterationNum())
+        self.assertEqual(sp1.getIterationLearnNum(),
+                         sp2.getIterationLearnNum())
+        for i in xrange(16):
+          self.assertListEqual(list(sp1._permanences.getRow(i)),
+                               list(sp2._permanences.getRow(i)))
+
+
+  def testComputeBatchInvalidInput(self):
+    sp = self._sp
+
+    self.assertRaises(TypeError, sp.computeBatch, [[1, 0, 1, 0, 1]])
+    self.assertRaises(ValueError, sp.computeBatch, numpy.ones(5))
+    self.assertRaises(ValueError, sp.computeBatch, numpy.ones((2, 6)))
+    self.assertEqual(sp.computeBatch(numpy.ones((0, 5))).shape, (0, 5))
+
+
   def testExactOutput(self):
     """
     Given a specific input and initialization params the SP should return this
@@ -1300,6 +1344,27 @@ class SpatialPoolerTest(unittest.TestCase):
     self.assertListEqual(trueActive, active)
 
 
+  def testInhibitColumnsGlobalTies(self):
+    """
+    Tests that global inhibition breaks ties at the cutoff score in favor of
+    the columns with the lowest indices.
+    """
+    sp = self._sp
+    density = 0.4
+    sp._numColumns = 10
+    overlaps = numpy.array([3, 5, 3, 1, 3, 0, 3, 5, 2, 3])
+    active = list(sp._inhibitColumnsGlobal(overlaps, density))
+    self.assertListEqual([0, 1, 2, 7], active)
+
+    density = 0.05
+    active = list(sp._inhibitColumnsGlobal(overlaps, density))
+    self.assertListEqual([], active)
+
+    density = 1.0
+    active = list(sp._inhibitColumnsGlobal(overlaps, density))
+    self.assertListEqual(range(10), active)
+
+
   def testInhibitColumnsLocal(self):
     sp = self._sp
     density = 0.5
@@ -1334,6 +1399,77 @@ class SpatialPoolerTest(unittest.TestCase):
     self.assertListEqual(trueActive, active)
 
 
+  def testInhibitColumnsLocal2D(self):
+    """
+    Tests that local inhibition with precomputed neighborhoods picks the same
+    columns as visiting the _getNeighborsND neighborhood of each column in
+    turn.
+    """
+    sp = self._sp
+    sp._numColumns = 48
+    sp._columnDimensions = numpy.array([6, 8])
+    sp._inhibitionRadius = 2
+    numpy.random.seed(42)
+
+    for density in [0.1, 0.3333, 0.5]:
+      # Integer overlaps, with and without tie breaking noise
+      for noise in [0, 0.01]:
+        overlaps = (numpy.random.randint(0, 4, sp._numColumns) +
+                    noise * numpy.random.random(sp._numColumns))
+
+        trueActive = []
+        addToWinners = max(overlaps) / 1000.0
+        scores = numpy.array(overlaps, dtype=realDType)
+        for i in xrange(sp._numColumns):
+          neighbors = sp._getNeighborsND(i, sp._columnDimensions,
+                                         sp._inhibitionRadius)
+          numActive = int(0.5 + density * (len(neighbors) + 1))
+          if numpy.count_nonzero(scores[neighbors] > scores[i]) < numActive:
+            trueActive.append(i)
+            scores[i] += addToWinners
+
+        active = list(sp._inhibitColumnsLocal(overlaps, density))
+        self.assertListEqual(trueActive, active)
+
+
+  def testNeighborhoodsFollowInhibitionRadius(self):
+    sp = self._sp
+    sp._numColumns = 10
+    sp._columnDimensions = numpy.array([10])
+    sp._inhibitionRadius = 2
+    sp._getNeighborhoods()
+    self.assertListEqual(
+      sorted(sp._neighbors[4][:sp._numNeighbors[4]]), [2, 3, 5, 6])
+    self.assertEqual(sp._numNeighbors[0], 2)
+
+    neighbors = sp._neighbors
+    sp._getNeighborhoods()
+    self.assertIs(neighbors, sp._neighbors)
+
+    sp._inhibitionRadius = 3
+    sp._getNeighborhoods()
+    self.assertListEqual(
+      sorted(sp._neighbors[4][:sp._numNeighbors[4]]), [1, 2, 3, 5, 6, 7])
+
+
+  def testNeighborhoodsAreNotPickled(self):
+    sp = SpatialPooler(inputDimensions=[10, 10],
+                       columnDimensions=[8, 8],
+                       potentialRadius=3,
+                       globalInhibition=False,
+                       numActiveColumnsPerInhArea=5)
+    sp._inhibitionRadius = 2
+    sp._getNeighborhoods()
+
+    state = sp.__getstate__()
+    self.assertNotIn("_neighbors", state)
+    self.assertNotIn("_numNeighbors", state)
+
+    sp2 = pickle.loads(pickle.dumps(sp))
+    numpy.testing.assert_array_equal(sp2._neighbors, sp._neighbors)
+    numpy.testing.assert_array_equal(sp2._numNeighbors, sp._numNeighbors)
+
+
   def testGetNeighbors1D(self):
     """
     Test that _getNeighbors static method correctly computes
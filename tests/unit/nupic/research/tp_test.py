@@ -37,6 +37,10 @@ from pkg_resources import resource_filename
 from nupic.research import fdrutilities
 from nupic.research.TP import TP
 
+# The Python TP, which tp10x2_test replaces in TP to run these tests against
+# the TP10X2
+PY_TP = TP
+
 COL_SET = set(range(500))
 
 VERBOSITY = 0
@@ -184,6 +188,53 @@ class TPTest(unittest.TestCase):
     self.assertTPsEqual(tp2, tp4)
 
 
+  def testPresynapticIndex(self):
+    """The incrementally maintained presynaptic index matches a rebuild."""
+    if TP is not PY_TP:
+      self.skipTest("Only the Python TP keeps a presynaptic index")
+
+    tp = TP(numberOfCols=100, cellsPerColumn=4, maxSegmentsPerCell=5,
+            maxSynapsesPerSegment=12, newSynapseCount=12, maxAge=0,
+            globalDecay=0.0, verbosity=VERBOSITY)
+    sequences = [self.generateSequence() for _ in xrange(5)]
+    for bottomUpInput in itertools.chain.from_iterable(sequences * 2):
+      if bottomUpInput is None:
+        tp.reset()
+      else:
+        tp.compute(bottomUpInput, True, True)
+
+    self.assertGreater(tp.getNumSegments(), 0)
+    self.assertPresynapticIndexValid(tp)
+
+    tp.trimSegments(minPermanence=0.5)
+    self.assertPresynapticIndexValid(tp)
+
+    # The segment activity levels match those computed segment by segment
+    segmentActivity = tp._computeSegmentActivity(tp.lrnActiveState['t'])
+    for c, i in itertools.product(xrange(tp.numberOfCols),
+                                  xrange(tp.cellsPerColumn)):
+      for segment in tp.cells[c][i]:
+        expected = tp.getSegmentActivityLevel(segment,
+                                              tp.lrnActiveState['t'])
+        activity = segmentActivity.get(segment, [c, i, 0])
+        self.assertEqual(activity, [c, i, expected])
+
+    # The index is not serialized, but rebuilt on demand
+    tp2 = pickle.loads(pickle.dumps(tp))
+    self.assertIsNone(tp2._presynapticIndex)
+    tp2._buildPresynapticIndex()
+    self.assertEqual(len(tp2._presynapticIndex), len(tp._presynapticIndex))
+
+
+  def assertPresynapticIndexValid(self, tp):
+    """Asserts that the presynaptic index of a TP matches a full rebuild."""
+    index = dict((key, dict((segment, list(entry))
+                            for segment, entry in segments.iteritems()))
+                 for key, segments in tp._presynapticIndex.iteritems())
+    tp._buildPresynapticIndex()
+    self.assertEqual(index, tp._presynapticIndex)
+
+
   def assertTPsEqual(self, tp1, tp2):
     """Asserts that two TP instances are the same.
 
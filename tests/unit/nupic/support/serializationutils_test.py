@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""Unit tests for the nupic.support.serializationutils module."""
+
+import os
+import shutil
+import StringIO
+import tempfile
+
+import numpy
+import unittest2 as unittest
+
+from nupic.support import serializationutils
+
+
+
+class _Holder(object):
+
+  def __init__(self, **kwargs):
+    self.__dict__.update(kwargs)
+
+
+
+class _HolderWithCache(_Holder):
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state["cache"]
+    return state
+
+
+
+class ArraySerializationTest(unittest.TestCase):
+  """Unit tests for the array helpers of serializationutils."""
+
+
+  def setUp(self):
+    self.arrayDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.arrayDir)
+
+
+  def testDumpAndLoadWithArrays(self):
+    large = numpy.arange(10000, dtype="float32")
+    small = numpy.arange(10, dtype="float32")
+    obj = {"large": large, "shared": large, "small": small, "value": 3}
+
+    f = StringIO.StringIO()
+    serializationutils.dumpWithArrays(obj, f, self.arrayDir)
+    # Shared arrays are stored once, small arrays stay in the pickle
+    self.assertEqual(os.listdir(self.arrayDir), ["array0.npy"])
+
+    f.seek(0)
+    loaded = serializationutils.loadWithArrays(f, self.arrayDir)
+    self.assertIsInstance(loaded["large"], numpy.memmap)
+    self.assertIs(loaded["shared"], loaded["large"])
+    self.assertNotIsInstance(loaded["small"], numpy.memmap)
+    numpy.testing.assert_array_equal(loaded["large"], large)
+    numpy.testing.assert_array_equal(loaded["small"], small)
+    self.assertEqual(loaded["value"], 3)
+
+    # Writes are copy-on-write and never reach the file
+    loaded["large"][0] = 42
+    f.seek(0)
+    reloaded = serializationutils.loadWithArrays(f, self.arrayDir)
+    self.assertEqual(reloaded["large"][0], 0)
+
+
+  def testFindMappableArrays(self):
+    large = numpy.zeros(2048, dtype="float32")
+    deep = _Holder(array=numpy.zeros(2048),
+                   tooDeep=_Holder(array=numpy.zeros(2048)))
+    obj = _Holder(a=large,
+                  small=numpy.zeros(2),
+                  objects=numpy.zeros(2048, dtype=object),
+                  child=_Holder(b=large, grandChild=deep))
+
+    found = serializationutils.findMappableArrays(obj, maxDepth=3)
+    self.assertEqual([attrPath for (attrPath, _, _, _) in found],
+                     ["a", "child.b", "child.grandChild.array"])
+    for (attrPath, owner, attrName, array) in found:
+      self.assertEqual(serializationutils.resolveAttrPath(obj, attrPath),
+                       (owner, attrName))
+      self.assertIs(getattr(owner, attrName), array)
+
+
+
+  def testFindMappableArraysSkipsUnpickledArrays(self):
+    obj = _HolderWithCache(array=numpy.zeros(2048),
+                           cache=numpy.zeros(2048))
+
+    found = serializationutils.findMappableArrays(obj)
+    self.assertEqual([attrPath for (attrPath, _, _, _) in found], ["array"])
+
+
+
+if __name__ == "__main__":
+  unittest.main()